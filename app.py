@@ -13,10 +13,20 @@ from datetime import datetime, date, timedelta
 load_dotenv()
 
 # --- Import Utility Functions & Blueprints ---
-from db import get_db_connection
+from db import get_db_connection, get_pool, init_db_pool
 from utils.decorators import MANAGERIAL_PORTAL_ROLES
 from utils.directory_configs import configure_directories
 from utils.template_helpers import register_template_helpers
+from utils.template_cache import init_template_cache, warm_up_templates
+from utils.schema_options import init_schema_options
+from utils.leaderboard import init_leaderboard
+from utils.telemetry import init_telemetry, record_error
+from utils.search import init_search
+from utils.interview_slots import init_interview_slots
+from utils.group_utils import init_session_backfill
+from utils.upload_storage import init_upload_storage
+from utils.media_worker import init_media_worker
+from utils.static_assets import init_static_assets
 
 from routes.admin.admin_routes import admin_bp
 from routes.Auth.login_routes import login_bp, init_login_manager
@@ -57,20 +67,7 @@ from routes.Recruiter_Team_Portal.organization_routes import (
     UNIT_AND_ORG_MANAGEMENT_ROLES
 )
 
-app = Flask(__name__)
-
-# --- Core App Configuration ---
-app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY')
-if not app.config['SECRET_KEY']:
-    raise ValueError("FATAL ERROR: FLASK_SECRET_KEY environment variable not set.")
-
-app.config['PERMANENT_SESSION_LIFETIME'] = int(os.environ.get('FLASK_SESSION_LIFETIME', 3600))
-app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024 # 50MB limit
-
 # --- Jinja Filter Definitions ---
-@app.template_filter('humanize_date')
 def humanize_date(dt, default=None):
     if not isinstance(dt, (datetime, date)):
         return default
@@ -79,7 +76,6 @@ def humanize_date(dt, default=None):
         dt = datetime.combine(dt, datetime.min.time(), tzinfo=now.tzinfo)
     return humanize.naturaltime(now - dt)
 
-@app.template_filter('format_timedelta_to_time')
 def format_timedelta_to_time(td_object, time_format='%I:%M %p'):
     if not isinstance(td_object, timedelta):
         return td_object
@@ -87,57 +83,7 @@ def format_timedelta_to_time(td_object, time_format='%I:%M %p'):
     result_time = (dummy_date + td_object).time()
     return result_time.strftime(time_format)
 
-app.jinja_env.filters['humanize_date'] = humanize_date
-app.jinja_env.filters['format_timedelta_to_time'] = format_timedelta_to_time
-
-# [# <-- KEY FOR DASHBOARD] This logging configuration is essential for the admin dashboard.
-if not app.debug:
-    log_file = os.environ.get('LOG_FILE_PATH', 'app.log')
-    file_handler = RotatingFileHandler(log_file, maxBytes=1024 * 1024, backupCount=5)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s [in %(pathname)s:%(lineno)d]')
-    file_handler.setFormatter(formatter)
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
-    app.logger.info('Mosla Pioneers App startup')
-
-# --- Configure Custom Features, Extensions, and Blueprints ---
-configure_directories(app)
-register_template_helpers(app)
-init_login_manager(app)
-
-app.register_blueprint(admin_bp, url_prefix='/admin')
-app.register_blueprint(login_bp, url_prefix='/auth')
-app.register_blueprint(register_bp, url_prefix='/auth')
-app.register_blueprint(managerial_dashboard_bp, url_prefix='/staff-portal')
-app.register_blueprint(package_mgmt_bp, url_prefix='/staff-portal/packages')
-app.register_blueprint(announcement_bp, url_prefix='/staff-portal/announcements')
-app.register_blueprint(job_offer_mgmt_bp, url_prefix='/staff-portal/job-offers')
-app.register_blueprint(company_assignment_bp, url_prefix='/staff-portal/company-assignments')
-app.register_blueprint(staff_candidate_bp, url_prefix='/staff-portal/candidates')
-app.register_blueprint(inquiry_mgmt_bp, url_prefix='/staff-portal/inquiries')
-app.register_blueprint(staff_perf_bp)
-app.register_blueprint(reporting_bp)
-app.register_blueprint(client_dashboard_bp , url_prefix='/client-portal')
-app.register_blueprint(client_offers_bp, url_prefix='/client-portal')
-app.register_blueprint(account_manager_bp, url_prefix='/account-manager-portal')
-app.register_blueprint(am_offer_mgmt_bp, url_prefix='/account-manager-portal/offer-management')
-app.register_blueprint(am_schedule_mgmt_bp, url_prefix='/account-manager-portal/schedule-management')
-app.register_blueprint(am_interview_mgmt_bp, url_prefix='/account-manager-portal/interview-management')
-app.register_blueprint(am_org_bp, url_prefix='/account-manager-portal/organization')
-app.register_blueprint(public_routes_bp)
-app.register_blueprint(job_board_bp)
-app.register_blueprint(candidate_bp)
-app.register_blueprint(courses_page_bp)
-app.register_blueprint(client_mgmt_bp)
-app.register_blueprint(group_mgmt_bp)
-app.register_blueprint(dashboard_bp)
-app.register_blueprint(organization_bp)
-app.register_blueprint(staff_bp)
-app.register_blueprint(jobs_bp)
-app.register_blueprint(instructor_portal_bp, url_prefix='/instructor') # Corrected Prefix
-
 # --- Context Processors ---
-@app.context_processor
 def inject_global_template_variables():
     unread_count = 0
     if current_user.is_authenticated and hasattr(current_user, 'role_type') and current_user.role_type in MANAGERIAL_PORTAL_ROLES:
@@ -160,7 +106,6 @@ def inject_global_template_variables():
 
     return {'unread_message_count': unread_count, 'blueprint_exists': blueprint_exists}
 
-@app.context_processor
 def inject_role_constants():
     return dict(
         RECRUITER_PORTAL_ROLES=RECRUITER_PORTAL_ROLES,
@@ -170,7 +115,6 @@ def inject_role_constants():
         UNIT_AND_ORG_MANAGEMENT_ROLES=UNIT_AND_ORG_MANAGEMENT_ROLES
     )
 
-@app.context_processor
 def inject_current_time():
     return {'now': datetime.now}
 
@@ -212,7 +156,6 @@ def log_error_to_db(e):
     except Exception:
         request_data_str = "Could not serialize request data."
 
-    conn = None
     try:
         user_id = current_user.id if current_user.is_authenticated else None
         
@@ -221,36 +164,13 @@ def log_error_to_db(e):
         else:
             ip_address = request.remote_addr
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Updated SQL to include Portal
-        sql = """
-            INSERT INTO ErrorLog 
-            (UserID, IPAddress, Portal, Route, RequestMethod, RequestData, ErrorMessage, Traceback)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        # Updated params tuple
-        params = (
-            user_id,
-            ip_address,
-            portal, # <-- Add the detected portal name
-            request.path,
-            request.method,
-            request_data_str,
-            str(e),
-            tb_str
-        )
-        cursor.execute(sql, params)
-        conn.commit()
+        # Queued for the background telemetry writer; the request does not wait for the INSERT.
+        record_error(user_id, ip_address, portal, request.path, request.method, request_data_str, str(e), tb_str)
     except Exception as log_e:
-        app.logger.critical("--- DATABASE LOGGING FAILED ---")
-        app.logger.error(f"Original Error: {e}\n{tb_str}")
-        app.logger.error(f"DB Logging Error: {log_e}\n{traceback.format_exc()}")
-    finally:
-        if conn and conn.is_connected(): conn.close()
+        current_app.logger.critical("--- DATABASE LOGGING FAILED ---")
+        current_app.logger.error(f"Original Error: {e}\n{tb_str}")
+        current_app.logger.error(f"DB Logging Error: {log_e}\n{traceback.format_exc()}")
 
-@app.errorhandler(Exception)
 def handle_exception(e):
     """Global handler to catch all unhandled exceptions."""
     log_error_to_db(e)
@@ -271,34 +191,28 @@ def handle_exception(e):
     
     return render_template("Errors/500.html"), 500 # Fallback to a generic error page
 
-@app.errorhandler(400)
 def bad_request(e):
     description = e.description or "The server could not process the request due to a client error."
-    app.logger.warning(f"400 Bad Request: {description} - URL: {request.path}")
+    current_app.logger.warning(f"400 Bad Request: {description} - URL: {request.path}")
     return render_template("Errors/400.html", title="Bad Request", error_description=description), 400
 
-@app.errorhandler(401)
 def unauthorized(e):
-    app.logger.info(f"401 Unauthorized: Access attempt to {request.path} by unauthenticated user.")
+    current_app.logger.info(f"401 Unauthorized: Access attempt to {request.path} by unauthenticated user.")
     return render_template("Errors/401.html", title="Unauthorized"), 401
 
-@app.errorhandler(403)
 def forbidden(e):
-    app.logger.warning(f"403 Forbidden: Access denied for path {request.path} by user '{current_user.id if current_user.is_authenticated else 'Anonymous'}'")
+    current_app.logger.warning(f"403 Forbidden: Access denied for path {request.path} by user '{current_user.id if current_user.is_authenticated else 'Anonymous'}'")
     return render_template("Errors/403.html", title="Access Forbidden"), 403
 
-@app.errorhandler(404)
 def page_not_found(e):
-    app.logger.warning(f"404 Not Found: {request.path}")
+    current_app.logger.warning(f"404 Not Found: {request.path}")
     return render_template("Errors/404.html", title="Page Not Found"), 404
 
-@app.errorhandler(429)
 def ratelimit_handler(e):
-    app.logger.warning(f"429 Too Many Requests: Rate limit exceeded for {request.remote_addr} on path {request.path}")
+    current_app.logger.warning(f"429 Too Many Requests: Rate limit exceeded for {request.remote_addr} on path {request.path}")
     return render_template("Errors/429.html", title="Too Many Requests"), 429
 
 # --- Other Routes ---
-@app.route('/set_theme', methods=['POST'])
 def set_theme():
     data = request.get_json()
     if data and 'theme' in data:
@@ -306,7 +220,122 @@ def set_theme():
         return jsonify(success=True, theme=session['theme'])
     return jsonify(success=False, error="Invalid theme data"), 400
 
-@app.route('/health')
 def health_check():
     """A simple endpoint to check if the application is alive."""
-    return "OK", 200
\ No newline at end of file
+    return "OK", 200
+
+
+def create_app():
+    """
+    Builds and configures the application. gunicorn runs it once in the master
+    with `--preload "app:create_app()"`, so workers fork with every module
+    imported and every template compiled; `from app import app` still works.
+    """
+    app = Flask(__name__)
+
+    # --- Core App Configuration ---
+    app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY')
+    if not app.config['SECRET_KEY']:
+        raise ValueError("FATAL ERROR: FLASK_SECRET_KEY environment variable not set.")
+
+    app.config['PERMANENT_SESSION_LIFETIME'] = int(os.environ.get('FLASK_SESSION_LIFETIME', 3600))
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024 # 50MB limit
+
+    app.jinja_env.filters['humanize_date'] = humanize_date
+    app.jinja_env.filters['format_timedelta_to_time'] = format_timedelta_to_time
+
+    # [# <-- KEY FOR DASHBOARD] This logging configuration is essential for the admin dashboard.
+    if not app.debug:
+        log_file = os.environ.get('LOG_FILE_PATH', 'app.log')
+        file_handler = RotatingFileHandler(log_file, maxBytes=1024 * 1024, backupCount=5)
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s [in %(pathname)s:%(lineno)d]')
+        file_handler.setFormatter(formatter)
+        app.logger.addHandler(file_handler)
+        app.logger.setLevel(logging.INFO)
+        app.logger.info('Mosla Pioneers App startup')
+
+    # --- Configure Custom Features, Extensions, and Blueprints ---
+    init_db_pool(app)
+    init_schema_options(app)
+    init_leaderboard(app)
+    init_telemetry(app)
+    init_search(app)
+    init_interview_slots(app)
+    init_session_backfill(app)
+    init_upload_storage(app)
+    init_media_worker(app)
+    init_static_assets(app)
+    configure_directories(app)
+    register_template_helpers(app)
+    init_template_cache(app)
+    init_login_manager(app)
+
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(login_bp, url_prefix='/auth')
+    app.register_blueprint(register_bp, url_prefix='/auth')
+    app.register_blueprint(managerial_dashboard_bp, url_prefix='/staff-portal')
+    app.register_blueprint(package_mgmt_bp, url_prefix='/staff-portal/packages')
+    app.register_blueprint(announcement_bp, url_prefix='/staff-portal/announcements')
+    app.register_blueprint(job_offer_mgmt_bp, url_prefix='/staff-portal/job-offers')
+    app.register_blueprint(company_assignment_bp, url_prefix='/staff-portal/company-assignments')
+    app.register_blueprint(staff_candidate_bp, url_prefix='/staff-portal/candidates')
+    app.register_blueprint(inquiry_mgmt_bp, url_prefix='/staff-portal/inquiries')
+    app.register_blueprint(staff_perf_bp)
+    app.register_blueprint(reporting_bp)
+    app.register_blueprint(client_dashboard_bp , url_prefix='/client-portal')
+    app.register_blueprint(client_offers_bp, url_prefix='/client-portal')
+    app.register_blueprint(account_manager_bp, url_prefix='/account-manager-portal')
+    app.register_blueprint(am_offer_mgmt_bp, url_prefix='/account-manager-portal/offer-management')
+    app.register_blueprint(am_schedule_mgmt_bp, url_prefix='/account-manager-portal/schedule-management')
+    app.register_blueprint(am_interview_mgmt_bp, url_prefix='/account-manager-portal/interview-management')
+    app.register_blueprint(am_org_bp, url_prefix='/account-manager-portal/organization')
+    app.register_blueprint(public_routes_bp)
+    app.register_blueprint(job_board_bp)
+    app.register_blueprint(candidate_bp)
+    app.register_blueprint(courses_page_bp)
+    app.register_blueprint(client_mgmt_bp)
+    app.register_blueprint(group_mgmt_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(organization_bp)
+    app.register_blueprint(staff_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(instructor_portal_bp, url_prefix='/instructor') # Corrected Prefix
+
+    for context_processor in (inject_global_template_variables, inject_role_constants, inject_current_time):
+        app.context_processor(context_processor)
+
+    app.register_error_handler(Exception, handle_exception)
+    app.register_error_handler(400, bad_request)
+    app.register_error_handler(401, unauthorized)
+    app.register_error_handler(403, forbidden)
+    app.register_error_handler(404, page_not_found)
+    app.register_error_handler(429, ratelimit_handler)
+
+    app.add_url_rule('/set_theme', view_func=set_theme, methods=['POST'])
+    app.add_url_rule('/health', view_func=health_check)
+
+    # --- Template Warm-up ---
+    # Last, so every filter, global and blueprint template folder is registered before compiling.
+    warm_up_templates(app)
+
+    # No background threads run yet (they start per process on first use), so every
+    # connection opened by the startup queries is idle; close them so preloaded
+    # workers never inherit (and later close) the master's sockets.
+    get_pool().close_all()
+    return app
+
+
+_app = None
+
+
+def __getattr__(name):
+    # `gunicorn app:app`, `flask run` and wsgi.py look up `app.app`; build it on first access
+    # so that importing this module (e.g. for import profiling) has no side effects.
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
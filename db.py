@@ -4,16 +4,28 @@ import mysql.connector
 from mysql.connector import Error
 import logging
 import time
+import threading
 from dotenv import load_dotenv # ADDED: To load environment variables from .env file
 
 # ADDED: Load environment variables from a .env file at the project root
-load_dotenv() 
+load_dotenv()
 
 # Configure logging (this is good, no changes needed here)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
+# --- Connection Pool Settings ---
+# The pool lives inside each gunicorn worker process, so DB_POOL_SIZE is the
+# per-worker cap. Total server connections = workers * DB_POOL_SIZE.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', 10))  # seconds to wait for a free connection
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))       # recycle connections older than this
+DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', 30))       # ping idle connections before reuse
+DB_CONNECT_RETRIES = int(os.getenv('DB_CONNECT_RETRIES', 5))
+DB_CONNECT_RETRY_DELAY = float(os.getenv('DB_CONNECT_RETRY_DELAY', 5))
+
+
+def _open_raw_connection():
     """
     Establishes a connection to the MySQL database using environment variables
     loaded from a .env file, suitable for VPS deployment.
@@ -24,9 +36,6 @@ def get_db_connection():
     DB_USER = os.getenv('DB_USER')
     DB_PASSWORD = os.getenv('DB_PASSWORD')
 
-    # Log the credentials being used (except the password) for debugging
-    logger.info(f"Attempting to connect to database: host={DB_HOST}, user={DB_USER}, db={DB_NAME}")
-
     if not all([DB_HOST, DB_NAME, DB_USER, DB_PASSWORD]):
         # Log which specific variable is missing for easier debugging
         if not DB_HOST: logger.error("FATAL: DB_HOST environment variable not set. Check your .env file.")
@@ -35,9 +44,12 @@ def get_db_connection():
         if not DB_PASSWORD: logger.error("FATAL: DB_PASSWORD environment variable not set. Check your .env file.")
         return None
 
+    # Log the credentials being used (except the password) for debugging
+    logger.info(f"Opening new pooled database connection: host={DB_HOST}, user={DB_USER}, db={DB_NAME}")
+
     # Retry mechanism is still very useful, especially if the database is on a separate server
     # or takes a moment to start up.
-    for i in range(5):
+    for i in range(DB_CONNECT_RETRIES):
         try:
             connection = mysql.connector.connect(
                 host=DB_HOST,
@@ -48,12 +60,265 @@ def get_db_connection():
             )
 
             if connection.is_connected():
-                logger.info(">>>> DATABASE CONNECTION SUCCESSFUL <<<<")
                 return connection
 
         except Error as e:
-            logger.error(f"Attempt {i+1}/5: Error connecting to MySQL database: {e}")
-            time.sleep(5)
-    
+            logger.error(f"Attempt {i+1}/{DB_CONNECT_RETRIES}: Error connecting to MySQL database: {e}")
+            if i + 1 < DB_CONNECT_RETRIES:
+                time.sleep(DB_CONNECT_RETRY_DELAY)
+
     logger.error("FATAL: Could not connect to the database after several retries.")
-    return None
\ No newline at end of file
+    return None
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a raw mysql.connector connection checked out of the pool.
+    Everything is delegated to the raw connection except close(), which hands the
+    connection back to the pool instead of tearing down the socket.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._autocommit_changed = False
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise Error(msg="Connection has already been returned to the pool.")
+        return getattr(raw, name)
+
+    @property
+    def autocommit(self):
+        return self._raw.autocommit
+
+    @autocommit.setter
+    def autocommit(self, value):
+        self._raw.autocommit = value
+        self._autocommit_changed = True
+
+    def is_connected(self):
+        # A checked-out connection was validated by the pool; avoid the server
+        # round-trip that mysql.connector's is_connected() performs.
+        return self._raw is not None
+
+    def close(self):
+        """Returns the connection to the pool. Safe to call more than once."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw, self._created_at, self._autocommit_changed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of MySQL connections for a single process.
+
+    - Connections are opened lazily up to `size`.
+    - Checkout waits at most `checkout_timeout` seconds when the pool is exhausted.
+    - Idle connections are pinged before reuse once they have been idle longer
+      than `ping_interval`, and are recycled after `max_lifetime` seconds.
+    """
+
+    def __init__(self, size=DB_POOL_SIZE, checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT,
+                 max_lifetime=DB_POOL_MAX_LIFETIME, ping_interval=DB_POOL_PING_INTERVAL):
+        self.size = max(1, size)
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+        self._idle = []  # list of (raw, created_at, last_used_at); used as a LIFO stack
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'reused': 0,
+            'created': 0,
+            'create_failures': 0,
+            'recycled': 0,
+            'health_check_failures': 0,
+            'exhausted': 0,
+            'wait_time_total': 0.0,
+        }
+
+    # --- Internal helpers ---
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, created_at, now):
+        return self.max_lifetime > 0 and (now - created_at) >= self.max_lifetime
+
+    def _is_healthy(self, raw, created_at, last_used_at):
+        """Recycles old connections and pings ones that have been idle for a while."""
+        now = time.monotonic()
+        if self._is_expired(created_at, now):
+            self._note('recycled')
+            return False
+        if now - last_used_at >= self.ping_interval:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._note('health_check_failures')
+                return False
+        return True
+
+    def _note(self, key, amount=1):
+        with self._cond:
+            self._stats[key] += amount
+
+    def _give_back_slot(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    # --- Public API ---
+    def get_connection(self):
+        """Checks out a connection, or returns None if none could be obtained in time."""
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+
+        # Invariant: checked-out (_in_use) + idle connections never exceed self.size.
+        with self._cond:
+            while not self._idle and self._in_use >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['exhausted'] += 1
+                    logger.error(f"Database pool exhausted: {self._in_use}/{self.size} connections in use "
+                                 f"after waiting {self.checkout_timeout}s.")
+                    return None
+                self._cond.wait(remaining)
+            candidate = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += time.monotonic() - started
+
+        # Health checks happen outside the lock; a failed candidate keeps our slot.
+        while candidate:
+            raw, created_at, last_used_at = candidate
+            if self._is_healthy(raw, created_at, last_used_at):
+                self._note('reused')
+                return PooledConnection(self, raw, created_at)
+            self._discard(raw)
+            with self._cond:
+                candidate = self._idle.pop() if self._idle else None
+
+        raw = _open_raw_connection()
+        if raw is None:
+            self._note('create_failures')
+            self._give_back_slot()
+            return None
+        self._note('created')
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _release(self, raw, created_at, autocommit_changed=False):
+        """Resets session state and puts the connection back on the idle stack."""
+        try:
+            if raw.unread_result:
+                raw.consume_results()
+            # End any implicit transaction so the next user starts with a fresh snapshot.
+            raw.rollback()
+            if autocommit_changed:
+                raw.autocommit = False
+            reusable = not self._is_expired(created_at, time.monotonic())
+            if not reusable:
+                self._note('recycled')
+        except Exception as e:
+            logger.warning(f"Discarding pooled connection that could not be reset: {e}")
+            reusable = False
+
+        if not reusable:
+            self._discard(raw)
+            self._give_back_slot()
+            return
+
+        with self._cond:
+            self._idle.append((raw, created_at, time.monotonic()))
+            self._in_use -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Closes every idle connection. Checked-out connections are closed when released."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for raw, _, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({'size': self.size, 'in_use': self._in_use, 'idle': len(self._idle)})
+        stats['wait_time_total'] = round(stats['wait_time_total'], 4)
+        return stats
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns this process's pool, creating a fresh one after a fork."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                # Connections inherited from a parent process must not be reused here.
+                _pool = ConnectionPool()
+                _pool_pid = pid
+    return _pool
+
+
+def get_pool_stats():
+    """Returns a snapshot of pool counters (checkouts, reuse, exhaustion, etc.)."""
+    return get_pool().stats()
+
+
+def get_db_connection():
+    """
+    Checks a connection out of the per-process pool.
+
+    Callers keep using the familiar pattern (`conn = get_db_connection()` ...
+    `conn.close()`); close() now returns the connection to the pool. Inside a
+    request, every checked-out connection is also tracked on `flask.g` so that
+    any connection a view forgets to close is returned in the teardown hook.
+    Returns None if no connection could be obtained.
+    """
+    conn = get_pool().get_connection()
+    if conn is None:
+        return None
+
+    try:
+        from flask import g, has_app_context
+        if has_app_context():
+            g.setdefault('_db_connections', []).append(conn)
+    except ImportError:
+        pass
+    return conn
+
+
+def release_request_connections(exception=None):
+    """Teardown hook: returns any connections the request left checked out."""
+    from flask import g
+    connections = g.pop('_db_connections', None)
+    if not connections:
+        return
+    for conn in connections:
+        if conn.is_connected():
+            logger.debug("Returning a connection that was not closed by its view.")
+            conn.close()
+
+
+def init_db_pool(app):
+    """Registers the request teardown hook that returns leaked connections to the pool."""
+    app.teardown_appcontext(release_request_connections)
+    app.logger.info(f"Database connection pool configured (size per worker: {DB_POOL_SIZE}).")
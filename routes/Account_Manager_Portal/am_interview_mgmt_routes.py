@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import current_user
 from utils.decorators import login_required_with_role
 from db import get_db_connection
+from utils.interview_slots import refresh_company_slots
 import datetime
 
 AM_PORTAL_ACCESS_ROLES = ['AccountManager', 'SeniorAccountManager', 'HeadAccountManager', 'CEO', 'Founder', 'Admin']
@@ -106,6 +107,7 @@ def add_schedule(company_id):
                 VALUES (%s, %s, %s, %s)
             """, (company_id, day_of_week, start_time, end_time))
             conn.commit()
+            refresh_company_slots(company_id)
             flash("New interview availability added successfully.", "success")
     except Exception as e:
         if conn: conn.rollback()
@@ -155,6 +157,7 @@ def edit_schedule(schedule_id):
             else:
                 cursor.execute("UPDATE CompanyInterviewSchedules SET DayOfWeek = %s, StartTime = %s, EndTime = %s WHERE ScheduleID = %s", (day_of_week, start_time, end_time, schedule_id))
                 conn.commit()
+                refresh_company_slots(company_id)
                 flash("Schedule slot updated successfully.", "success")
             return redirect(url_for('.view_schedules', company_id=company_id))
 
@@ -201,6 +204,7 @@ def delete_schedule(schedule_id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM CompanyInterviewSchedules WHERE ScheduleID = %s AND CompanyID = %s", (schedule_id, company_id))
         conn.commit()
+        refresh_company_slots(company_id)
         flash("Schedule slot deleted successfully.", "success")
     except Exception as e:
         if conn: conn.rollback()
@@ -1,20 +1,17 @@
 # routes/Account_Manager_Portal/am_offer_mgmt_routes.py
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, make_response
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
 from flask_login import current_user
 from utils.decorators import login_required_with_role
 from db import get_db_connection
+from utils.public_content import invalidate_public_content
+from utils.job_eligibility import refresh_job_offer
+from utils.search import invalidate_search
+from utils.schema_options import get_table_options
 import datetime
 import decimal
 import re
-import io
-import csv
 from collections import OrderedDict
 
-# Imports for styled Excel generation
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
-
 # Roles that can manage offers within the AM portal
 AM_OFFER_MANAGEMENT_ROLES = ['HeadAccountManager', 'CEO', 'Founder', 'Admin']
 CLIENT_CONTACT_ROLE_NAME = 'ClientContact' # Needed for client submission route if you add it here
@@ -23,96 +20,18 @@ am_offer_mgmt_bp = Blueprint('am_offer_mgmt_bp', __name__,
                               template_folder='../../../templates',
                               url_prefix='/am-portal/offer-management')
 
-# --- Helper Functions (Copied from job_offer_mgmt_routes.py) ---
-def _create_styled_excel(report_data, title, header_mapping):
-    """Generates a styled Excel report using only OpenPyXL."""
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Report"
-    title_font = Font(name='Calibri', size=18, bold=True, color='1F2937')
-    header_font = Font(name='Calibri', size=12, bold=True, color='FFFFFF')
-    center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    left_align = Alignment(horizontal='left', vertical='center', wrap_text=True)
-    header_fill = PatternFill(start_color='4F46E5', end_color='4F46E5', fill_type='solid')
-    
-    worksheet.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(header_mapping))
-    title_cell = worksheet.cell(row=1, column=1, value=title)
-    title_cell.font = title_font
-    title_cell.alignment = center_align
-    worksheet.row_dimensions[1].height = 30
-    
-    worksheet.merge_cells(start_row=2, start_column=1, end_row=2, end_column=len(header_mapping))
-    subtitle_cell = worksheet.cell(row=2, column=1, value=f"Report generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    subtitle_cell.font = Font(italic=True, color='6B7280')
-    subtitle_cell.alignment = center_align
-    worksheet.row_dimensions[2].height = 20
-    
-    headers = list(header_mapping.keys())
-    for col_num, header_title in enumerate(headers, 1):
-        cell = worksheet.cell(row=4, column=col_num, value=header_title)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_align
-    worksheet.row_dimensions[4].height = 20
-    
-    data_keys = list(header_mapping.values())
-    for row_num, row_data in enumerate(report_data, 5):
-        for col_num, key in enumerate(data_keys, 1):
-            cell_value = row_data.get(key, 'N/A')
-            if isinstance(cell_value, (datetime.datetime, datetime.date)):
-                cell_value = cell_value.strftime('%Y-%m-%d')
-            worksheet.cell(row=row_num, column=col_num, value=cell_value).alignment = left_align
-    
-    column_widths = {}
-    for col_num, header_title in enumerate(headers, 1):
-        column_widths[col_num] = len(header_title)
-    for row_data in report_data:
-        for col_num, key in enumerate(data_keys, 1):
-            cell_len = len(str(row_data.get(key, '')))
-            if cell_len > column_widths[col_num]:
-                column_widths[col_num] = cell_len
-    for col_num, width in column_widths.items():
-        worksheet.column_dimensions[get_column_letter(col_num)].width = width + 4
-        
-    output = io.BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    return output
-
-def get_column_options(conn, cursor, table_name, column_name):
-    """Dynamically fetches the allowed values for an ENUM or SET column from the database schema."""
-    try:
-        db_name = conn.database 
-        query = """
-            SELECT COLUMN_TYPE 
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
-        """
-        cursor.execute(query, (db_name, table_name, column_name))
-        result = cursor.fetchone()
-        if result and result.get('COLUMN_TYPE'):
-            type_string = result['COLUMN_TYPE']
-            values = re.findall(r"'(.*?)'", type_string)
-            return values
-        return []
-    except Exception as e:
-        current_app.logger.error(f"Could not fetch options for {table_name}.{column_name}: {e}", exc_info=True)
-        return []
-    
-def get_form_options(conn, cursor):
+# --- Helper Functions ---
+def get_form_options(conn):
     """
     Helper to fetch all dynamic options for the job offer form and process them.
     """
-    options = {}
-    table = 'JobOffers'
     columns_to_fetch = [
         'HiringPlan', 'GraduationStatusRequirement', 'HiringCadence',
         'WorkLocationType', 'ShiftType', 'AvailableShifts', 'BenefitsIncluded',
         'Nationality', 'RequiredLanguages', 'RequiredLevel', 'Status', 'PaymentTerm',
         'LanguagesType', 'Gender', 'MilitaryStatus'
     ]
-    for col in columns_to_fetch:
-        options[col] = get_column_options(conn, cursor, table, col)
+    options = get_table_options('JobOffers', columns_to_fetch, conn)
     
     # This is the crucial logic that was missing:
     all_benefits_from_schema = options.get('BenefitsIncluded', [])
@@ -269,7 +188,7 @@ def staff_direct_create_job_offer():
         companies = cursor.fetchall()
         cursor.execute("SELECT CategoryID, CategoryName FROM JobCategories ORDER BY CategoryName")
         categories = cursor.fetchall()
-        form_options = get_form_options(conn_data, cursor)
+        form_options = get_form_options(conn_data)
     except Exception as e:
         current_app.logger.error(f"Error fetching form data for create offer: {e}", exc_info=True)
         flash("Error loading form support data.", "danger")
@@ -356,9 +275,13 @@ def staff_direct_create_job_offer():
                         %(gender)s, %(military_status)s, %(working_days)s, %(working_hours)s, %(experience_requirement)s
                     )"""
                 cursor.execute(sql, params)
+                new_offer_id = cursor.lastrowid
 
                 _create_automated_announcement(cursor, 'Automated_Offer', f"New Job: {params['title']} with {company_name}", "A new job offer has been posted.", posted_by_user_id=current_user.id)
                 conn_tx.commit()
+                invalidate_public_content()
+                refresh_job_offer(new_offer_id)
+                invalidate_search('job_offers', 'announcements')
                 flash(f"New job offer '{params['title']}' created and announced!", 'success')
                 return redirect(url_for('.list_all_job_offers'))
             except ValueError: 
@@ -397,7 +320,7 @@ def edit_live_job_offer(offer_id):
         companies = cursor_deps.fetchall()
         cursor_deps.execute("SELECT CategoryID, CategoryName FROM JobCategories ORDER BY CategoryName")
         categories = cursor_deps.fetchall()
-        form_options = get_form_options(conn_deps, cursor_deps)
+        form_options = get_form_options(conn_deps)
     except Exception as e:
         flash("Error loading form support data.", "danger")
         if conn_deps and conn_deps.is_connected(): conn_deps.close()
@@ -471,6 +394,9 @@ def edit_live_job_offer(offer_id):
                     flash(f"Job offer status updated and an announcement was posted.", 'info')
 
                 conn_update.commit()
+                invalidate_public_content()
+                refresh_job_offer(offer_id)
+                invalidate_search('job_offers', 'announcements')
                 flash(f"Job offer '{params['title']}' updated successfully!", 'success')
                 return redirect(url_for('.list_all_job_offers'))
             except Exception as e:
@@ -532,6 +458,9 @@ def delete_live_job_offer(offer_id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM JobOffers WHERE OfferID = %s", (offer_id,))
         conn.commit()
+        invalidate_public_content()
+        refresh_job_offer(offer_id)
+        invalidate_search('job_offers')
         if cursor.rowcount > 0:
             flash('The job offer has been permanently deleted.', 'success')
         else:
@@ -3,6 +3,8 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import current_user
 from utils.decorators import login_required_with_role
 from db import get_db_connection
+from utils.org_hierarchy import invalidate_org_hierarchy
+from utils.identity_cache import invalidate_user_identity
 
 # --- [CORRECTED] Define roles that can access this new portal section ---
 AM_ORG_MANAGEMENT_ROLES = ['HeadAccountManager', 'CEO', 'Founder']
@@ -145,6 +147,8 @@ def assign_am_team_lead():
              cursor.execute("UPDATE Staff SET ReportsToStaffID = NULL, AMTeamID = %s WHERE StaffID = %s", (team_id, lead_staff_id))
         
         conn.commit()
+        invalidate_user_identity(staff_id=lead_staff_id)
+        invalidate_org_hierarchy()
         flash("AM Team Lead assigned successfully.", "success")
     finally:
         if cursor: cursor.close()
@@ -167,6 +171,8 @@ def assign_am_team_to_unit():
              cursor.execute("UPDATE Staff SET ReportsToStaffID = %s WHERE StaffID = %s", (info['UnitManagerStaffID'], info['TeamLeadStaffID']))
         
         conn.commit()
+        if info and info.get('TeamLeadStaffID'): invalidate_user_identity(staff_id=info['TeamLeadStaffID'])
+        invalidate_org_hierarchy()
         flash("AM Team assigned to Unit successfully.", "success")
     finally:
         if cursor: cursor.close()
@@ -186,6 +192,8 @@ def assign_am_to_team():
         if team and team['TeamLeadStaffID']:
             cursor.execute("UPDATE Staff SET AMTeamID = %s, ReportsToStaffID = %s WHERE StaffID = %s", (team_id, team['TeamLeadStaffID'], am_staff_id))
             conn.commit()
+            invalidate_user_identity(staff_id=am_staff_id)
+            invalidate_org_hierarchy()
             flash("Account Manager assigned to team successfully.", "success")
         else:
             flash("Cannot assign. The selected team does not have a lead.", "warning")
@@ -1,17 +1,13 @@
 # routes/Account_Manager_Portal/am_portal_routes.py
 import datetime
-import io
-import csv
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort, make_response
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort
 from flask_login import current_user
 from utils.decorators import login_required_with_role
 from db import get_db_connection
-
-# --- Excel Styling Imports ---
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
+from utils.leaderboard import record_application_status_change
+from utils.export_utils import RowStream, stream_xlsx_response
+from utils.org_hierarchy import manages_or_is
 
 # --- Roles are defined once for clarity, matching the new schema ---
 AM_PORTAL_ACCESS_ROLES = ['AccountManager', 'SeniorAccountManager', 'HeadAccountManager', 'CEO', 'Founder']
@@ -22,81 +18,16 @@ account_manager_bp = Blueprint('account_manager_bp', __name__,
                                template_folder='../../../templates',
                                url_prefix='/am-portal')
 
-# --- NEW: Reusable Styled Excel Helper Function ---
-def _create_styled_excel(report_data, title, header_mapping):
-    """
-    Generates a styled Excel report using only OpenPyXL, matching the managerial portal style.
-    """
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Report"
-
-    # --- Define Styles (Consistent with other reports) ---
-    title_font = Font(name='Calibri', size=18, bold=True, color='1F2937')
-    header_font = Font(name='Calibri', size=12, bold=True, color='FFFFFF')
-    center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    left_align = Alignment(horizontal='left', vertical='center', wrap_text=True)
-    header_fill = PatternFill(start_color='4F46E5', end_color='4F46E5', fill_type='solid') # Indigo
-
-    # --- Add and Style Title & Subtitle ---
-    worksheet.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(header_mapping))
-    title_cell = worksheet.cell(row=1, column=1, value=title)
-    title_cell.font = title_font
-    title_cell.alignment = center_align
-    worksheet.row_dimensions[1].height = 30
-
-    worksheet.merge_cells(start_row=2, start_column=1, end_row=2, end_column=len(header_mapping))
-    subtitle_cell = worksheet.cell(row=2, column=1, value=f"Report generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    subtitle_cell.font = Font(italic=True, color='6B7280')
-    subtitle_cell.alignment = center_align
-    worksheet.row_dimensions[2].height = 20
-
-    # --- Write and Style Headers ---
-    headers = list(header_mapping.keys())
-    for col_num, header_title in enumerate(headers, 1):
-        cell = worksheet.cell(row=4, column=col_num, value=header_title)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_align
-    worksheet.row_dimensions[4].height = 20
-
-    # --- Write Data Cell by Cell ---
-    data_keys = list(header_mapping.values())
-    for row_num, row_data in enumerate(report_data, 5):
-        for col_num, key in enumerate(data_keys, 1):
-            cell_value = row_data.get(key, 'N/A')
-            if isinstance(cell_value, (datetime.datetime, datetime.date)):
-                cell_value = cell_value.strftime('%Y-%m-%d')
-            worksheet.cell(row=row_num, column=col_num, value=cell_value).alignment = left_align
-
-    # --- Adjust Column Widths ---
-    column_widths = {}
-    for col_num, header_title in enumerate(headers, 1):
-        column_widths[col_num] = len(str(header_title))
-    for row_data in report_data:
-        for col_num, key in enumerate(data_keys, 1):
-            cell_len = len(str(row_data.get(key, '')))
-            if cell_len > column_widths.get(col_num, 0):
-                column_widths[col_num] = cell_len
-    for col_num, width in column_widths.items():
-        worksheet.column_dimensions[get_column_letter(col_num)].width = width + 4
-
-    output = io.BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    return output
-
 def _is_user_authorized_for_application(staff_id, application_id):
     """Checks if a staff member can action a specific application, including hierarchy."""
     if not staff_id or not application_id: return False
+    # Senior managers are authorized for any application
+    if current_user.role_type in STAFF_MANAGEMENT_ROLES:
+        return True
+
     conn = get_db_connection()
     try:
         cursor = conn.cursor(dictionary=True)
-
-        # Senior managers are authorized for any application
-        if current_user.role_type in STAFF_MANAGEMENT_ROLES:
-            return True
-
         cursor.execute("""
             SELECT c.ManagedByStaffID FROM JobApplications ja
             JOIN JobOffers jo ON ja.OfferID = jo.OfferID
@@ -106,17 +37,8 @@ def _is_user_authorized_for_application(staff_id, application_id):
         result = cursor.fetchone()
         if not result or not result['ManagedByStaffID']: return False
         
-        company_manager_staff_id = result['ManagedByStaffID']
-        if company_manager_staff_id == staff_id: return True
-
-        current_id_in_chain = company_manager_staff_id
-        for _ in range(5): # Limit recursion depth for safety
-            cursor.execute("SELECT ReportsToStaffID FROM Staff WHERE StaffID = %s", (current_id_in_chain,))
-            supervisor = cursor.fetchone()
-            if not supervisor or not supervisor['ReportsToStaffID']: return False
-            current_id_in_chain = supervisor['ReportsToStaffID']
-            if current_id_in_chain == staff_id: return True
-        return False
+        # Authorized if the company's manager is this staff member or reports to them at any depth.
+        return manages_or_is(staff_id, result['ManagedByStaffID'])
     finally:
         if conn and conn.is_connected():
              cursor.close()
@@ -355,6 +277,7 @@ def update_application_status(application_id):
             cursor = conn.cursor()
             sql = "UPDATE JobApplications SET Status = %s, NotesByStaff = CONCAT(COALESCE(NotesByStaff, ''), %s) WHERE ApplicationID = %s"
             notes_to_add = f"\n\n--- {new_status} by {current_user.first_name} on {datetime.date.today().strftime('%Y-%m-%d')} ---\n{feedback_notes}"
+            record_application_status_change(conn, application_id, new_status)
             cursor.execute(sql, (new_status, notes_to_add, application_id))
             conn.commit()
             flash(f"Application status updated to '{new_status}'.", "success")
@@ -440,6 +363,14 @@ def review_application_details(application_id):
     return render_template('account_manager_portal/application_review_modal.html', review_data=review_data, manager_staff_id=staff_id)
 
 
+def _interview_export_row(interview):
+    """Adds the derived columns used by the scheduled interviews export."""
+    interview['LanguagesStr'] = ", ".join(sorted(interview['Languages'])) if interview.get('Languages') else 'N/A'
+    interview['InterviewDateStr'] = interview['ScheduledDateTime'].strftime('%Y-%m-%d')
+    interview['InterviewTimeStr'] = interview['ScheduledDateTime'].strftime('%I:%M %p')
+    return interview
+
+
 @account_manager_bp.route('/interview-pipeline/export-scheduled')
 @login_required_with_role(AM_PORTAL_ACCESS_ROLES)
 def export_scheduled_interviews():
@@ -450,80 +381,51 @@ def export_scheduled_interviews():
         
     company_id_filter = request.args.get('company_id')
 
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor(dictionary=True)
-        sql = """
-            SELECT
-                u.FirstName, u.LastName, u.Email, u.PhoneNumber, u.RegistrationDate,
-                c.LinkedInProfileURL, c.DateOfBirth, c.Nationality AS CandidateNationality, 
-                c.Languages, c.LanguageLevel, c.EducationalStatus, c.Gender,
-                jo.Title AS OfferTitle,
-                comp.CompanyName,
-                i.ScheduledDateTime
-            FROM JobApplications ja
-            JOIN Candidates c ON ja.CandidateID = c.CandidateID
-            JOIN Users u ON c.UserID = u.UserID
-            JOIN JobOffers jo ON ja.OfferID = jo.OfferID
-            JOIN Companies comp ON jo.CompanyID = comp.CompanyID
-            JOIN Interviews i ON ja.ApplicationID = i.ApplicationID
-            WHERE ja.Status = 'Interview Scheduled'
-        """
-        params = []
-        if not is_senior_manager:
-            sql += " AND comp.ManagedByStaffID = %s"
-            params.append(staff_id)
-
-        if company_id_filter and company_id_filter.isdigit():
-            sql += " AND comp.CompanyID = %s"
-            params.append(int(company_id_filter))
-        sql += " ORDER BY comp.CompanyName, i.ScheduledDateTime;"
-        cursor.execute(sql, tuple(params))
-        scheduled_interviews = cursor.fetchall()
-
-        if not scheduled_interviews:
-            flash("No scheduled interviews found for the selected criteria.", "warning")
-            return redirect(url_for('.interview_pipeline'))
-        
-        # --- REFACTORED EXPORT LOGIC ---
-        
-        # 1. Define the mapping from styled header name to data key
-        header_map = {
-            'First Name': 'FirstName', 'Last Name': 'LastName', 'Email': 'Email', 'Phone': 'PhoneNumber',
-            'Gender': 'Gender', 'DOB': 'DateOfBirth', 'Nationality': 'CandidateNationality', 
-            'Education': 'EducationalStatus', 'Languages': 'LanguagesStr', 'Lang. Level': 'LanguageLevel', 
-            'LinkedIn': 'LinkedInProfileURL', 'Registered On': 'RegistrationDate', 'Company': 'CompanyName', 
-            'Applying For': 'OfferTitle', 'Interview Date': 'InterviewDateStr', 'Interview Time': 'InterviewTimeStr'
-        }
-        
-        # 2. Pre-process the data to match the keys in header_map
-        excel_data = []
-        for interview in scheduled_interviews:
-            new_row = interview.copy()
-            new_row['LanguagesStr'] = ", ".join(sorted(interview['Languages'])) if interview.get('Languages') else 'N/A'
-            new_row['InterviewDateStr'] = interview['ScheduledDateTime'].strftime('%Y-%m-%d')
-            new_row['InterviewTimeStr'] = interview['ScheduledDateTime'].strftime('%I:%M %p')
-            excel_data.append(new_row)
-
-        # 3. Call the helper function
-        report_title = "Scheduled Interviews"
-        if company_id_filter and company_id_filter.isdigit() and scheduled_interviews:
-             report_title = f"Scheduled Interviews for {scheduled_interviews[0]['CompanyName']}"
-        
-        excel_file = _create_styled_excel(excel_data, report_title, header_map)
-
-        # 4. Create the response
-        filename = "scheduled_interviews.xlsx"
-        if company_id_filter and company_id_filter.isdigit() and scheduled_interviews:
-             company_name_slug = scheduled_interviews[0]['CompanyName'].replace(' ', '_').lower()
-             filename = f"interviews_{company_name_slug}.xlsx"
-
-        response = make_response(excel_file.read())
-        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-        response.headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        return response
-
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
\ No newline at end of file
+    sql = """
+        SELECT
+            u.FirstName, u.LastName, u.Email, u.PhoneNumber, u.RegistrationDate,
+            c.LinkedInProfileURL, c.DateOfBirth, c.Nationality AS CandidateNationality, 
+            c.Languages, c.LanguageLevel, c.EducationalStatus, c.Gender,
+            jo.Title AS OfferTitle,
+            comp.CompanyName,
+            i.ScheduledDateTime
+        FROM JobApplications ja
+        JOIN Candidates c ON ja.CandidateID = c.CandidateID
+        JOIN Users u ON c.UserID = u.UserID
+        JOIN JobOffers jo ON ja.OfferID = jo.OfferID
+        JOIN Companies comp ON jo.CompanyID = comp.CompanyID
+        JOIN Interviews i ON ja.ApplicationID = i.ApplicationID
+        WHERE ja.Status = 'Interview Scheduled'
+    """
+    params = []
+    if not is_senior_manager:
+        sql += " AND comp.ManagedByStaffID = %s"
+        params.append(staff_id)
+
+    if company_id_filter and company_id_filter.isdigit():
+        sql += " AND comp.CompanyID = %s"
+        params.append(int(company_id_filter))
+    sql += " ORDER BY comp.CompanyName, i.ScheduledDateTime;"
+
+    # Rows are streamed into the workbook rather than fetched all at once.
+    scheduled_interviews = RowStream(sql, params, transform=_interview_export_row).open()
+    if scheduled_interviews.is_empty:
+        flash("No scheduled interviews found for the selected criteria.", "warning")
+        return redirect(url_for('.interview_pipeline'))
+
+    header_map = {
+        'First Name': 'FirstName', 'Last Name': 'LastName', 'Email': 'Email', 'Phone': 'PhoneNumber',
+        'Gender': 'Gender', 'DOB': 'DateOfBirth', 'Nationality': 'CandidateNationality', 
+        'Education': 'EducationalStatus', 'Languages': 'LanguagesStr', 'Lang. Level': 'LanguageLevel', 
+        'LinkedIn': 'LinkedInProfileURL', 'Registered On': 'RegistrationDate', 'Company': 'CompanyName', 
+        'Applying For': 'OfferTitle', 'Interview Date': 'InterviewDateStr', 'Interview Time': 'InterviewTimeStr'
+    }
+
+    report_title = "Scheduled Interviews"
+    filename = "scheduled_interviews.xlsx"
+    if company_id_filter and company_id_filter.isdigit():
+        company_name = scheduled_interviews.first['CompanyName']
+        report_title = f"Scheduled Interviews for {company_name}"
+        filename = f"interviews_{company_name.replace(' ', '_').lower()}.xlsx"
+
+    return stream_xlsx_response(scheduled_interviews, report_title, header_map, filename)
@@ -2,6 +2,7 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
 from utils.decorators import login_required_with_role
 from db import get_db_connection
+from utils.interview_slots import refresh_company_slots
 
 AM_SCHEDULE_MANAGEMENT_ROLES = ['HeadAccountManager', 'CEO', 'Admin', 'AccountManager']
 
@@ -31,6 +32,7 @@ def manage_company_schedule(company_id):
                 schedule_id = request.form.get('schedule_id')
                 cursor.execute("DELETE FROM CompanyInterviewSchedules WHERE ScheduleID = %s AND CompanyID = %s", (schedule_id, company_id))
                 conn.commit()
+                refresh_company_slots(company_id)
                 flash("Schedule slot deleted successfully.", "success")
             else:
                 day_of_week = request.form.get('day_of_week')
@@ -46,6 +48,7 @@ def manage_company_schedule(company_id):
                         VALUES (%s, %s, %s, %s)
                     """, (company_id, day_of_week, start_time, end_time))
                     conn.commit()
+                    refresh_company_slots(company_id)
                     flash("New interview schedule slot added successfully.", "success")
             
             return redirect(url_for('.manage_company_schedule', company_id=company_id))
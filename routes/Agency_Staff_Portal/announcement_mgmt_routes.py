@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import current_user
 from utils.decorators import login_required_with_role 
 from db import get_db_connection
+from utils.search import invalidate_search
 import datetime
 import mysql.connector
 
@@ -82,6 +83,7 @@ def add_announcement():
                 val = (form_data['title'], form_data['content'], current_user.id, form_data['is_active'], display_until, form_data['audience'], form_data['priority'])
                 cursor.execute(sql, val)
                 conn.commit()
+                invalidate_search('announcements')
                 flash('Announcement added!', 'success')
                 return redirect(url_for('.list_announcements'))
             except Exception as e:
@@ -132,6 +134,7 @@ def edit_announcement(announcement_id):
                 val = (form_data['title'], form_data['content'], form_data['is_active'], display_until, form_data['audience'], form_data['priority'], announcement_id)
                 cursor.execute(sql, val)
                 conn.commit()
+                invalidate_search('announcements')
                 flash('Announcement updated!', 'success')
                 return redirect(url_for('.list_announcements'))
             else: 
@@ -158,6 +161,7 @@ def delete_announcement(announcement_id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM SystemAnnouncements WHERE AnnouncementID = %s", (announcement_id,))
         conn.commit()
+        invalidate_search('announcements')
         if cursor.rowcount > 0:
             flash('Announcement deleted successfully!', 'success')
         else:
@@ -4,6 +4,7 @@ from flask import Blueprint, abort, render_template, request, flash, redirect, u
 from flask_login import current_user
 from utils.decorators import login_required_with_role, MANAGERIAL_PORTAL_ROLES
 from db import get_db_connection
+from utils.identity_cache import invalidate_user_identity, invalidate_company_identities
 import mysql.connector
 
 client_mgmt_bp = Blueprint('client_mgmt_bp', __name__,
@@ -162,6 +163,7 @@ def approve_client_registration(reg_id):
         """, (current_user.specific_role_id, company_id, reg_id))
 
         conn.commit()
+        invalidate_user_identity(user_id=app_data['UserID'])
         flash(f"Client registration for '{app_data['CompanyName']}' has been approved.", "success")
     except Exception as e:
         if conn: conn.rollback()
@@ -191,6 +193,7 @@ def reject_client_registration(reg_id):
         """, (current_user.specific_role_id, reg_id))
         
         conn.commit()
+        if app_data: invalidate_user_identity(user_id=app_data['UserID'])
         flash("Client registration has been rejected.", "info")
     except Exception as e:
         if conn: conn.rollback()
@@ -247,6 +250,7 @@ def edit_company(company_id):
                 WHERE CompanyID = %s
             """, (company_name, request.form.get('company_website'), request.form.get('industry'), request.form.get('address'), request.form.get('description'), company_id))
             conn.commit()
+            invalidate_company_identities(company_id)
             flash(f"Company '{company_name}' updated successfully.", "success")
             return redirect(url_for('.list_companies'))
         except mysql.connector.Error as err:
@@ -272,6 +276,7 @@ def delete_company(company_id):
         # The database's ON DELETE CASCADE constraints will handle associated records.
         cursor.execute("DELETE FROM Companies WHERE CompanyID = %s", (company_id,))
         conn.commit()
+        invalidate_company_identities(company_id)
         flash("Company and all associated data have been permanently deleted.", "success")
     except Exception as e:
         if conn: conn.rollback()
@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import current_user
 from utils.decorators import login_required_with_role
 from db import get_db_connection
+from utils.package_catalog import load_package_catalog, invalidate_package_catalog
 import decimal
 import mysql.connector
 
@@ -27,26 +28,7 @@ def list_all_packages():
     conn = get_db_connection()
     try:
         cursor = conn.cursor(dictionary=True)
-        # 1. Fetch all MainPackages
-        cursor.execute("SELECT * FROM MainPackages ORDER BY Name")
-        main_packages = cursor.fetchall()
-
-        # 2. For each package, fetch its associated languages and sub-packages
-        for package in main_packages:
-            # Fetch languages for this package
-            cursor.execute("""
-                SELECT l.LanguageName 
-                FROM MainPackageLanguages mpl
-                JOIN Languages l ON mpl.LanguageID = l.LanguageID
-                WHERE mpl.PackageID = %s
-            """, (package['PackageID'],))
-            languages_raw = cursor.fetchall()
-            package['languages'] = [lang['LanguageName'] for lang in languages_raw]
-
-            # Fetch sub-packages
-            cursor.execute("SELECT * FROM SubPackages WHERE MainPackageID = %s ORDER BY DisplayOrder, Name", (package['PackageID'],))
-            package['sub_packages'] = cursor.fetchall()
-            
+        main_packages = load_package_catalog(cursor)
     except Exception as e:
         current_app.logger.error(f"Error fetching package management list: {e}", exc_info=True)
         flash("Could not load package content.", "danger")
@@ -101,6 +83,7 @@ def add_main_package():
                 cursor.execute(sql_lang, (new_package_id, lang_id))
             
             conn.commit()
+            invalidate_package_catalog()
             flash("Main Package added successfully!", "success")
             return redirect(url_for('.list_all_packages'))
             
@@ -160,6 +143,7 @@ def edit_main_package(package_id):
                 cursor.execute(sql_lang, (package_id, lang_id))
             
             conn.commit()
+            invalidate_package_catalog()
             flash("Main Package updated successfully!", "success")
             return redirect(url_for('.list_all_packages'))
 
@@ -191,6 +175,7 @@ def delete_main_package(package_id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM MainPackages WHERE PackageID = %s", (package_id,))
         conn.commit()
+        invalidate_package_catalog()
         flash("Main Package and all its sub-packages have been deleted.", "success")
     except Exception as e:
         if conn and conn.is_connected(): conn.rollback()
@@ -243,6 +228,7 @@ def add_sub_package(main_package_id):
             )
             cursor.execute(sql, params)
             conn.commit()
+            invalidate_package_catalog()
             flash("Sub-Package added successfully!", "success")
             return redirect(url_for('.list_all_packages'))
             
@@ -307,6 +293,7 @@ def edit_sub_package(sub_package_id):
             )
             cursor.execute(sql, params)
             conn.commit()
+            invalidate_package_catalog()
             flash("Sub-Package updated successfully!", "success")
             return redirect(url_for('.list_all_packages'))
         
@@ -333,6 +320,7 @@ def delete_sub_package(sub_package_id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM SubPackages WHERE SubPackageID = %s", (sub_package_id,))
         conn.commit()
+        invalidate_package_catalog()
         flash("Sub-Package deleted successfully.", "success")
     except mysql.connector.Error as err:
         if conn and conn.is_connected(): conn.rollback()
@@ -581,6 +569,7 @@ def update_package_status():
         sql = f"UPDATE {table_name} SET Status = %s, UpdatedAt = NOW() WHERE {id_column} = %s"
         cursor.execute(sql, (new_status, package_id))
         conn.commit()
+        invalidate_package_catalog()
         
         if cursor.rowcount > 0:
             flash(f"Package status updated to '{new_status}'.", "success")
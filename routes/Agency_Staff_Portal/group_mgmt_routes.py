@@ -3,11 +3,12 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import current_user
 from utils.decorators import login_required_with_role
 from db import get_db_connection
+from utils.identity_cache import invalidate_user_identity
 import mysql.connector
 from werkzeug.security import generate_password_hash
 
 
-from utils.group_utils import sync_sessions_for_groups
+from utils.group_utils import start_session_backfill, get_session_backfill_status, save_attendance_grid
 
 # Roles with management access
 GROUP_MANAGEMENT_ROLES = ['SalesManager', 'SalesAssistant', 'CEO', 'Founder', 'Admin'] 
@@ -132,6 +133,7 @@ def edit_instructor(staff_id):
             cursor.execute(sql_staff_update, params_staff)
             
             conn.commit()
+            invalidate_user_identity(user_id=user_id)
             flash('Instructor details updated successfully!', 'success')
             return redirect(url_for('.list_instructors'))
 
@@ -178,6 +180,7 @@ def delete_instructor(staff_id):
         if user:
             cursor.execute("DELETE FROM Users WHERE UserID = %s", (user[0],))
             conn.commit()
+            invalidate_user_identity(user_id=user[0])
             flash("Instructor deleted successfully.", "success")
         else:
             flash("Instructor not found.", "danger")
@@ -456,13 +459,30 @@ def remove_group_member(group_id, enrollment_id):
 @login_required_with_role(GROUP_MANAGEMENT_ROLES)
 def sync_sessions_utility():
     if request.method == 'POST':
-        message, category = sync_sessions_for_groups()
-        flash(message, category)
-        return redirect(url_for('.list_groups'))
+        try:
+            run_id, started = start_session_backfill(current_user.id)
+            if started:
+                flash(f"Session sync #{run_id} started in the background. Progress is shown below.", "info")
+            else:
+                flash(f"Session sync #{run_id} is already running.", "warning")
+        except Exception as e:
+            current_app.logger.error(f"Could not start the session sync: {e}", exc_info=True)
+            flash("Could not start the session sync.", "danger")
+        return redirect(url_for('.sync_sessions_utility'))
     
     return render_template('agency_staff_portal/courses/groups/sync_sessions_utility.html',
                            title="Sync Group Sessions")
 
+@group_mgmt_bp.route('/utility/sync-sessions/status')
+@login_required_with_role(GROUP_MANAGEMENT_ROLES)
+def sync_sessions_status():
+    """JSON progress of the latest (or ?run_id=) session sync run."""
+    try:
+        return jsonify(run=get_session_backfill_status(request.args.get('run_id', type=int)))
+    except Exception as e:
+        current_app.logger.error(f"Could not load session sync status: {e}", exc_info=True)
+        return jsonify(error="Could not load the sync status."), 500
+
 @group_mgmt_bp.route('/placement-pipeline')
 @login_required_with_role(GROUP_MANAGEMENT_ROLES)
 def placement_pipeline():
@@ -640,15 +660,9 @@ def admin_update_attendance(group_id):
     conn = get_db_connection()
     try:
         cursor = conn.cursor()
-        for key, value in request.form.items():
-            if key.startswith('status_'):
-                _, session_id, enrollment_id = key.split('_')
-                new_status = value
-                attendance_notes = request.form.get(f'attendance_notes_{session_id}_{enrollment_id}', '')
-                performance_notes = request.form.get(f'performance_notes_{session_id}_{enrollment_id}', '')
-                cursor.execute("UPDATE SessionAttendance SET Status = %s, AttendanceNotes = %s, PerformanceNotes = %s WHERE SessionID = %s AND EnrollmentID = %s", (new_status, attendance_notes, performance_notes, session_id, enrollment_id))
+        changed = save_attendance_grid(cursor, group_id, request.form)
         conn.commit()
-        flash("Attendance updated successfully!", "success")
+        flash(f"Attendance updated successfully! ({changed} record(s) changed)", "success")
     finally:
         if conn and conn.is_connected(): conn.close()
     return redirect(url_for('.admin_attendance', group_id=group_id))
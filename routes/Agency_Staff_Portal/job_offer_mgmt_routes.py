@@ -1,118 +1,37 @@
 # routes/Agency_Staff_Portal/job_offer_mgmt_routes.py
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, make_response
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
 from flask_login import current_user
 from utils.decorators import login_required_with_role, EXECUTIVE_ROLES
 from db import get_db_connection
+from utils.public_content import invalidate_public_content
+from utils.job_eligibility import refresh_job_offer
+from utils.search import invalidate_search
+from utils.interview_slots import refresh_company_slots
+from utils.schema_options import get_column_options, get_table_options
+from utils.export_utils import RowStream, stream_csv_response, stream_xlsx_response
 import datetime
 import decimal
 import mysql.connector
 import re
-import io
-import csv
 from collections import OrderedDict 
 
-# Imports for styled Excel generation
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
-
 JOB_OFFER_REVIEW_ROLES = ['CEO','Founder','Admin']
 CLIENT_CONTACT_ROLE_NAME = 'ClientContact'
 
+# Applications list paging
+APPLICATIONS_PAGE_SIZE = 50
+# Keyset sort key for the applications list. Undated applications sort as the
+# oldest, under a non-NULL sentinel that the page predicates and the cursor
+# token ('1000-01-01T00:00:00_<id>') can both compare.
+APPLICATION_SORT_KEY = "COALESCE(ja.ApplicationDate, TIMESTAMP '1000-01-01 00:00:00')"
+APPLICATIONS_MAX_PAGE_SIZE = 200
+APPLICATIONS_COUNT_CAP = 10000  # filtered counts beyond this are shown as "10,000+"
+TYPEAHEAD_LIMIT = 20
+
 job_offer_mgmt_bp = Blueprint('job_offer_mgmt_bp', __name__,
                               template_folder='../../../templates',
                               url_prefix='/job-offers')
 
-# --- [UPDATED] - Enhanced Excel Helper Function ---
-def _create_styled_excel(report_data, title, header_mapping):
-    """Generates a styled Excel report using only OpenPyXL."""
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Report"
-
-    # --- Define Styles ---
-    title_font = Font(name='Calibri', size=18, bold=True, color='1F2937')
-    header_font = Font(name='Calibri', size=12, bold=True, color='FFFFFF')
-    center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    left_align = Alignment(horizontal='left', vertical='center', wrap_text=True)
-    header_fill = PatternFill(start_color='4F46E5', end_color='4F46E5', fill_type='solid') # Indigo color
-
-    # --- Add and Style Title & Subtitle ---
-    worksheet.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(header_mapping))
-    title_cell = worksheet.cell(row=1, column=1, value=title)
-    title_cell.font = title_font
-    title_cell.alignment = center_align
-    worksheet.row_dimensions[1].height = 30
-
-    worksheet.merge_cells(start_row=2, start_column=1, end_row=2, end_column=len(header_mapping))
-    subtitle_cell = worksheet.cell(row=2, column=1, value=f"Report generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    subtitle_cell.font = Font(italic=True, color='6B7280')
-    subtitle_cell.alignment = center_align
-    worksheet.row_dimensions[2].height = 20
-
-    # --- Write and Style Headers ---
-    headers = list(header_mapping.keys())
-    # Start headers on row 4 to leave a blank row after the subtitle
-    for col_num, header_title in enumerate(headers, 1):
-        cell = worksheet.cell(row=4, column=col_num, value=header_title)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_align
-    worksheet.row_dimensions[4].height = 25
-
-    # --- Write Data Cell by Cell ---
-    data_keys = list(header_mapping.values())
-    # Start data on row 5
-    for row_num, row_data in enumerate(report_data, 5):
-        for col_num, key in enumerate(data_keys, 1):
-            cell_value = row_data.get(key, 'N/A')
-            # Format dates nicely
-            if isinstance(cell_value, (datetime.datetime, datetime.date)):
-                cell_value = cell_value.strftime('%Y-%m-%d')
-            worksheet.cell(row=row_num, column=col_num, value=cell_value).alignment = left_align
-
-    # --- Adjust Column Widths Dynamically ---
-    column_widths = {}
-    for col_num, header_title in enumerate(headers, 1):
-        column_widths[col_num] = len(str(header_title))
-    
-    if report_data:
-        for row_data in report_data:
-            for col_num, key in enumerate(data_keys, 1):
-                cell_len = len(str(row_data.get(key, '')))
-                if cell_len > column_widths.get(col_num, 0):
-                    column_widths[col_num] = cell_len
-    
-    for col_num, width in column_widths.items():
-        # Add a little padding to the width
-        worksheet.column_dimensions[get_column_letter(col_num)].width = width + 4
-        
-    output = io.BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    return output
-
-
-def get_column_options(conn, cursor, table_name, column_name):
-    """Dynamically fetches the allowed values for an ENUM or SET column from the database schema."""
-    try:
-        db_name = conn.database 
-        query = """
-            SELECT COLUMN_TYPE 
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
-        """
-        cursor.execute(query, (db_name, table_name, column_name))
-        result = cursor.fetchone()
-        if result and result.get('COLUMN_TYPE'):
-            type_string = result['COLUMN_TYPE']
-            values = re.findall(r"'(.*?)'", type_string)
-            return values
-        return []
-    except Exception as e:
-        current_app.logger.error(f"Could not fetch options for {table_name}.{column_name}: {e}", exc_info=True)
-        return []
-
 def validate_job_offer_data(form_data, is_editing=False, is_client_submission=False):
     """A comprehensive validation helper for the offer form."""
     errors = {}
@@ -239,28 +158,6 @@ def client_submit_job_offer():
     return redirect(url_for('client_portal_bp.dashboard'))
 
 
-@job_offer_mgmt_bp.route('/api/offers-for-company/<int:company_id>')
-@login_required_with_role(EXECUTIVE_ROLES)
-def api_get_offers_for_company(company_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT OfferID, Title FROM JobOffers WHERE CompanyID = %s ORDER BY Title", (company_id,))
-    offers = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return {'offers': offers}
-
-@job_offer_mgmt_bp.route('/api/all-offers')
-@login_required_with_role(EXECUTIVE_ROLES)
-def api_get_all_offers():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT OfferID, Title FROM JobOffers ORDER BY Title")
-    offers = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return {'offers': offers}
-
 @job_offer_mgmt_bp.route('/dashboard')
 @login_required_with_role(JOB_OFFER_REVIEW_ROLES)
 def dashboard():
@@ -387,22 +284,18 @@ def list_all_job_offers():
     )
 
 
-def get_form_options(conn, cursor):
+def get_form_options(conn):
     """
     Helper to fetch all dynamic options for the job offer form from the JobOffers table schema.
+    Served from the process-wide schema options cache.
     """
-    options = {}
-    table = 'JobOffers'
     columns_to_fetch = [
         'PaymentTerm', 'HiringPlan', 'LanguagesType', 'RequiredLevel',
         'GraduationStatusRequirement', 'HiringCadence', 'WorkLocationType', 
         'ShiftType', 'AvailableShifts', 'BenefitsIncluded', 'InterviewType', 
         'Nationality', 'Gender', 'MilitaryStatus', 'Status', 'RequiredLanguages'
     ]
-    for col in columns_to_fetch:
-        options[col] = get_column_options(conn, cursor, table, col)
-    
-    return options
+    return get_table_options('JobOffers', columns_to_fetch, conn)
 
 @job_offer_mgmt_bp.route('/create-live', methods=['GET', 'POST'])
 @login_required_with_role(JOB_OFFER_REVIEW_ROLES)
@@ -417,7 +310,7 @@ def staff_direct_create_job_offer():
         companies = cursor.fetchall()
         cursor.execute("SELECT CategoryID, CategoryName FROM JobCategories ORDER BY CategoryName")
         categories = cursor.fetchall()
-        form_options = get_form_options(conn_data, cursor)
+        form_options = get_form_options(conn_data)
     except Exception as e:
         current_app.logger.error(f"Error fetching form data for create offer: {e}", exc_info=True)
         flash("Error loading form support data.", "danger")
@@ -498,6 +391,7 @@ def staff_direct_create_job_offer():
                     )
                 """
                 cursor.execute(sql, params)
+                new_offer_id = cursor.lastrowid
                 
                 announcement_title = f"New Job: {params['title']} with {company_name}"
                 announcement_content = f"A new job offer has been posted directly by staff."
@@ -506,6 +400,9 @@ def staff_direct_create_job_offer():
                 )
                 
                 conn_tx.commit()
+                invalidate_public_content()
+                refresh_job_offer(new_offer_id)
+                invalidate_search('job_offers', 'announcements')
                 flash(f"New job offer for '{params['title']}' created successfully and announced!", 'success')
                 return redirect(url_for('.list_all_job_offers'))
 
@@ -541,7 +438,7 @@ def edit_live_job_offer(offer_id):
         cursor_deps.execute("SELECT CategoryID, CategoryName FROM JobCategories ORDER BY CategoryName")
         categories = cursor_deps.fetchall()
         # Fetching dynamic options (ENUMs, SETs) for the form
-        form_options = get_form_options(conn_deps, cursor_deps)
+        form_options = get_form_options(conn_deps)
     except Exception as e:
         current_app.logger.error(f"Error fetching dropdown data for edit offer {offer_id}: {e}", exc_info=True)
         flash("Error loading form support data.", "danger")
@@ -650,6 +547,9 @@ def edit_live_job_offer(offer_id):
                     flash(f"Job offer status updated and an announcement was posted.", 'info')
 
                 conn_update.commit()
+                invalidate_public_content()
+                refresh_job_offer(offer_id)
+                invalidate_search('job_offers', 'announcements')
                 flash(f"Job offer '{params['title']}' updated successfully!", 'success')
                 return redirect(url_for('.list_all_job_offers'))
                 
@@ -740,6 +640,9 @@ def delete_live_job_offer(offer_id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM JobOffers WHERE OfferID = %s", (offer_id,))
         conn.commit()
+        invalidate_public_content()
+        refresh_job_offer(offer_id)
+        invalidate_search('job_offers')
         if cursor.rowcount > 0:
             flash('The job offer has been permanently deleted.', 'success')
         else:
@@ -898,6 +801,10 @@ def review_client_submission_action(submission_id):
             flash(f'Submission has been marked as "{new_status}".', 'info')
         
         conn.commit()
+        invalidate_public_content()
+        if action == 'approve':
+            refresh_job_offer(live_offer_id)
+            invalidate_search('job_offers', 'announcements')
     except Exception as e:
         if conn: conn.rollback()
         current_app.logger.error(f"Error processing submission {submission_id}, action {action}: {e}", exc_info=True)
@@ -952,36 +859,78 @@ def view_live_job_offer_detail(offer_id):
     return render_template('agency_staff_portal/job_offers/view_live_job_offer_detail.html', title=f"Job Offer Details", offer=offer)
 
 
+def _application_export_row(app):
+    """Adds the derived columns used by the applications CSV/XLSX exports."""
+    app['FullName'] = f"{app['FirstName']} {app['LastName']}"
+    app['ApplicationDateStr'] = app['ApplicationDate'].strftime('%Y-%m-%d') if app['ApplicationDate'] else ''
+    return app
+
+
+def _encode_application_cursor(row):
+    """Keyset position of an application row: '<SortDate ISO>_<ApplicationID>' (SortDate is APPLICATION_SORT_KEY)."""
+    return f"{row['SortDate'].isoformat()}_{row['ApplicationID']}"
+
+
+def _decode_application_cursor(token):
+    """Returns (SortDate, ApplicationID) or None for a missing/malformed token."""
+    if not token:
+        return None
+    try:
+        date_part, id_part = token.rsplit('_', 1)
+        return datetime.datetime.fromisoformat(date_part), int(id_part)
+    except (ValueError, TypeError):
+        return None
+
+
+def _application_count_label(cursor, from_where_sql, params, has_filters):
+    """
+    Total shown above the applications list. Unfiltered totals come from the
+    table statistics ("~12,345"); filtered counts stop at APPLICATIONS_COUNT_CAP
+    rows ("10,000+") so a broad filter never scans the whole table.
+    """
+    if not has_filters:
+        cursor.execute("""
+            SELECT TABLE_ROWS FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'JobApplications'
+        """)
+        row = cursor.fetchone()
+        return f"~{int(row['TABLE_ROWS'] or 0) if row else 0:,}"
+    cursor.execute(f"SELECT COUNT(*) AS total FROM (SELECT 1 {from_where_sql} LIMIT %s) AS capped",
+                   tuple(params) + (APPLICATIONS_COUNT_CAP + 1,))
+    total = cursor.fetchone()['total']
+    return f"{APPLICATIONS_COUNT_CAP:,}+" if total > APPLICATIONS_COUNT_CAP else f"{total:,}"
+
+
 @job_offer_mgmt_bp.route('/applications')
 @login_required_with_role(EXECUTIVE_ROLES)
 def list_all_applications():
     """
     Unified page to list all job applications with filtering capabilities
-    by company, offer, and status.
+    by company, offer, and status. Pages are navigated by keyset on
+    (ApplicationDate, ApplicationID) so deep pages cost the same as the first;
+    undated applications come last (see APPLICATION_SORT_KEY).
     """
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
     selected_company_id = request.args.get('company_id', type=int)
     selected_offer_id = request.args.get('offer_id', type=int)
     filter_status = request.args.get('filter_status')
     export_format = request.args.get('format')
+    per_page = min(max(request.args.get('per_page', APPLICATIONS_PAGE_SIZE, type=int), 1), APPLICATIONS_MAX_PAGE_SIZE)
+    before = _decode_application_cursor(request.args.get('before'))
+    after = None if before else _decode_application_cursor(request.args.get('after'))
 
-    cursor.execute("SELECT CompanyID, CompanyName FROM Companies ORDER BY CompanyName")
-    companies = cursor.fetchall()
-    cursor.execute("SELECT OfferID, Title FROM JobOffers ORDER BY Title")
-    job_offers = cursor.fetchall()
-    
-    sql = """
-        SELECT
-            u.FirstName, u.LastName, ja.ApplicationDate, jo.Title AS JobTitle,
-            c.CompanyName, ja.Status, cand.CandidateID, ja.ApplicationID
+    from_sql = """
         FROM JobApplications ja
         JOIN Candidates cand ON ja.CandidateID = cand.CandidateID
         JOIN Users u ON cand.UserID = u.UserID
         JOIN JobOffers jo ON ja.OfferID = jo.OfferID
         JOIN Companies c ON jo.CompanyID = c.CompanyID
     """
+    select_sql = f"""
+        SELECT
+            u.FirstName, u.LastName, ja.ApplicationDate, jo.Title AS JobTitle,
+            c.CompanyName, ja.Status, cand.CandidateID, ja.ApplicationID,
+            {APPLICATION_SORT_KEY} AS SortDate
+    """
     
     conditions = []
     params = []
@@ -995,26 +944,18 @@ def list_all_applications():
         conditions.append("ja.Status = %s")
         params.append(filter_status)
 
-    if conditions:
-        sql += " WHERE " + " AND ".join(conditions)
-    
-    sql += " ORDER BY ja.ApplicationDate DESC"
-    
-    cursor.execute(sql, tuple(params))
-    applications = cursor.fetchall()
-    cursor.close()
-    conn.close()
-
-    # --- FIX: FULL EXPORT LOGIC IS NOW IMPLEMENTED ---
-    if export_format:
-        if not applications:
+    where_sql = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    if export_format in ('xlsx', 'csv'):
+        sql = select_sql + from_sql + where_sql + f" ORDER BY {APPLICATION_SORT_KEY} DESC, ja.ApplicationID DESC"
+        applications = RowStream(sql, params, transform=_application_export_row).open()
+        if applications.is_empty:
             flash("No data to export for the selected filters.", "warning")
             return redirect(url_for('.list_all_applications', 
                                     company_id=selected_company_id, 
                                     offer_id=selected_offer_id, 
                                     filter_status=filter_status))
-        
-        # --- XLSX Export Logic ---
+
         if export_format == 'xlsx':
             header_map = {
                 'Candidate Name': 'FullName',
@@ -1023,55 +964,110 @@ def list_all_applications():
                 'Company': 'CompanyName',
                 'Status': 'Status'
             }
-            excel_data = []
-            for app in applications:
-                new_app = app.copy()
-                new_app['FullName'] = f"{app['FirstName']} {app['LastName']}"
-                excel_data.append(new_app)
-            
-            excel_file = _create_styled_excel(excel_data, "All Job Applications", header_map)
-            response = make_response(excel_file.read())
-            filename = f"all_applications_{datetime.date.today()}.xlsx"
-            response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-            response.headers["Content-type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            return response
-
-        # --- CSV Export Logic ---
-        if export_format == 'csv':
-            output = io.StringIO()
-            # Prepare data with a 'Candidate Name' field
-            csv_data = []
-            if not applications: # Should be caught above, but safe check
-                writer = csv.writer(output)
-                writer.writerow(['No Data Found'])
-            else:
-                fieldnames = ['Candidate Name', 'Application Date', 'Job Title', 'Company', 'Status']
-                writer = csv.DictWriter(output, fieldnames=fieldnames)
-                writer.writeheader()
-                for app in applications:
-                    writer.writerow({
-                        'Candidate Name': f"{app['FirstName']} {app['LastName']}",
-                        'Application Date': app['ApplicationDate'].strftime('%Y-%m-%d') if app['ApplicationDate'] else '',
-                        'Job Title': app['JobTitle'],
-                        'Company': app['CompanyName'],
-                        'Status': app['Status']
-                    })
-            
-            output.seek(0)
-            response = make_response(output.read())
-            response.headers["Content-Disposition"] = f"attachment; filename=all_applications_{datetime.date.today()}.csv"
-            response.headers["Content-type"] = "text/csv"
-            return response
+            return stream_xlsx_response(applications, "All Job Applications", header_map, f"all_applications_{datetime.date.today()}.xlsx")
+
+        columns = [('Candidate Name', 'FullName'), ('Application Date', 'ApplicationDateStr'),
+                   ('Job Title', 'JobTitle'), ('Company', 'CompanyName'), ('Status', 'Status')]
+        return stream_csv_response(applications, f"all_applications_{datetime.date.today()}.csv", columns)
+
+    # --- Keyset page: fetch one extra row to know whether another page exists ---
+    page_conditions, page_params = list(conditions), list(params)
+    if before:
+        page_conditions.append(f"({APPLICATION_SORT_KEY} < %s OR ({APPLICATION_SORT_KEY} = %s AND ja.ApplicationID < %s))")
+        page_params.extend([before[0], before[0], before[1]])
+    elif after:
+        page_conditions.append(f"({APPLICATION_SORT_KEY} > %s OR ({APPLICATION_SORT_KEY} = %s AND ja.ApplicationID > %s))")
+        page_params.extend([after[0], after[0], after[1]])
+    page_where = (" WHERE " + " AND ".join(page_conditions)) if page_conditions else ""
+    direction = "ASC" if after else "DESC"
+    sql = (select_sql + from_sql + page_where +
+           f" ORDER BY {APPLICATION_SORT_KEY} {direction}, ja.ApplicationID {direction} LIMIT %s")
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, tuple(page_params) + (per_page + 1,))
+        applications = cursor.fetchall()
+        has_more = len(applications) > per_page
+        applications = applications[:per_page]
+        if after:
+            applications.reverse()  # fetched oldest-first; display newest-first
+
+        total_count_label = None
+        if request.args.get('count', '1') != '0':
+            total_count_label = _application_count_label(cursor, from_sql + where_sql, params, bool(conditions))
+
+        # Only the currently selected filter values are needed; the pickers search via the typeahead APIs.
+        selected_company = selected_offer = None
+        if selected_company_id:
+            cursor.execute("SELECT CompanyID, CompanyName FROM Companies WHERE CompanyID = %s", (selected_company_id,))
+            selected_company = cursor.fetchone()
+        if selected_offer_id:
+            cursor.execute("SELECT OfferID, Title FROM JobOffers WHERE OfferID = %s", (selected_offer_id,))
+            selected_offer = cursor.fetchone()
+        cursor.close()
+    finally:
+        if conn and conn.is_connected(): conn.close()
+
+    is_first_page = not before and not (after and has_more)
+    newer_cursor = _encode_application_cursor(applications[0]) if applications and not is_first_page else None
+    older_cursor = _encode_application_cursor(applications[-1]) if applications and (has_more or after) else None
 
-    # This only runs if 'export_format' is not provided
     return render_template('agency_staff_portal/job_offers/list_all_applications.html',
                            title="Job Applications",
                            applications=applications,
-                           companies=companies,
-                           job_offers=job_offers,
+                           selected_company=selected_company,
+                           selected_offer=selected_offer,
                            selected_company_id=selected_company_id,
                            selected_offer_id=selected_offer_id,
-                           selected_filter_status=filter_status)
+                           selected_filter_status=filter_status,
+                           per_page=per_page,
+                           newer_cursor=newer_cursor,
+                           older_cursor=older_cursor,
+                           total_count_label=total_count_label)
+
+
+def _like_prefix(text):
+    """Escapes LIKE wildcards so user input is matched literally as a prefix."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+@job_offer_mgmt_bp.route('/api/companies/search')
+@login_required_with_role(EXECUTIVE_ROLES)
+def api_search_companies():
+    """Typeahead for the company filter: up to TYPEAHEAD_LIMIT companies whose name starts with `q`."""
+    query = request.args.get('q', '').strip()
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT CompanyID, CompanyName FROM Companies WHERE CompanyName LIKE %s ORDER BY CompanyName LIMIT %s",
+                       (_like_prefix(query), TYPEAHEAD_LIMIT))
+        companies = cursor.fetchall()
+    finally:
+        if conn and conn.is_connected(): conn.close()
+    return {'companies': companies}
+
+
+@job_offer_mgmt_bp.route('/api/offers/search')
+@login_required_with_role(EXECUTIVE_ROLES)
+def api_search_offers():
+    """Typeahead for the offer filter, optionally narrowed to one company."""
+    query = request.args.get('q', '').strip()
+    company_id = request.args.get('company_id', type=int)
+    sql, params = "SELECT OfferID, Title FROM JobOffers WHERE Title LIKE %s", [_like_prefix(query)]
+    if company_id:
+        sql += " AND CompanyID = %s"
+        params.append(company_id)
+    sql += " ORDER BY Title LIMIT %s"
+    params.append(TYPEAHEAD_LIMIT)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, tuple(params))
+        offers = cursor.fetchall()
+    finally:
+        if conn and conn.is_connected(): conn.close()
+    return {'offers': offers}
 
 @job_offer_mgmt_bp.route('/company/<int:company_id>/schedules', methods=['GET'])
 @login_required_with_role(EXECUTIVE_ROLES)
@@ -1096,7 +1092,7 @@ def view_company_schedules(company_id):
         """, (company_id,))
         schedules = cursor.fetchall()
 
-        day_options = get_column_options(conn, cursor, 'CompanyInterviewSchedules', 'DayOfWeek')
+        day_options = get_column_options('CompanyInterviewSchedules', 'DayOfWeek', conn)
 
     except Exception as e:
         current_app.logger.error(f"Error viewing schedules for company {company_id}: {e}", exc_info=True)
@@ -1138,6 +1134,7 @@ def add_schedule_slot(company_id):
         """
         cursor.execute(insert_sql, (company_id, day, start_time, end_time))
         conn.commit()
+        refresh_company_slots(company_id)
         flash("New schedule slot added successfully!", "success")
     except Exception as e:
         if conn and conn.is_connected(): conn.rollback()
@@ -1169,6 +1166,7 @@ def delete_schedule_slot(schedule_id):
         
         cursor.execute("DELETE FROM CompanyInterviewSchedules WHERE ScheduleID = %s", (schedule_id,))
         conn.commit()
+        refresh_company_slots(company_id)
         
         if cursor.rowcount > 0:
             flash("Schedule slot deleted successfully.", "success")
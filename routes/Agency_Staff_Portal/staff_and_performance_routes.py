@@ -4,7 +4,13 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import current_user
 from utils.decorators import login_required_with_role, MANAGERIAL_PORTAL_ROLES
 from db import get_db_connection
+from utils.identity_cache import invalidate_user_identity, clear_identity_cache
+from utils.org_hierarchy import would_create_cycle, invalidate_org_hierarchy, get_org_version, ORG_HIERARCHY_TTL
+from utils.cache_utils import TTLCache
+from utils.schema_options import get_column_options
 from werkzeug.security import generate_password_hash, check_password_hash
+import hashlib
+import json
 import mysql.connector
 import random
 import re
@@ -13,6 +19,9 @@ staff_perf_bp = Blueprint('staff_perf_bp', __name__,
                           template_folder='../../../templates',
                           url_prefix='/managerial/staff-performance')
 
+# Org chart JSON keyed by (org version, subtree); the TTL picks up name/photo edits.
+_team_chart_cache = TTLCache(maxsize=512, ttl=ORG_HIERARCHY_TTL)
+
 
 ROLES_ELIGIBLE_FOR_POINTS = [
     'SourcingRecruiter',
@@ -22,27 +31,6 @@ ROLES_ELIGIBLE_FOR_POINTS = [
 
 
 # --- Helper Functions ---
-def _is_valid_new_leader(staff_to_change_id, new_leader_staff_id):
-    """Prevents creating a reporting loop."""
-    if staff_to_change_id == new_leader_staff_id: return False
-    if not new_leader_staff_id: return True
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        current_id_in_chain = new_leader_staff_id
-        for _ in range(10): 
-            if not current_id_in_chain: return True
-            cursor.execute("SELECT ReportsToStaffID FROM Staff WHERE StaffID = %s", (current_id_in_chain,))
-            result = cursor.fetchone()
-            if not result or not result[0]: return True
-            parent_id = result[0]
-            if parent_id == staff_to_change_id: return False
-            current_id_in_chain = parent_id
-        return True
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
-
 def check_email_exists_in_db(email, conn):
     """Checks if an email already exists using an existing connection."""
     cursor = conn.cursor()
@@ -181,6 +169,8 @@ def approve_application(application_id):
         # ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^ ^
         
         conn.commit()
+        invalidate_user_identity(user_id=user_id)
+        invalidate_org_hierarchy()
         flash("Application approved. The staff member is now active and their onboarding checklist has been created.", "success")
     except Exception as e:
         if conn: conn.rollback()
@@ -292,6 +282,7 @@ def reject_application(application_id):
         """, (current_user.specific_role_id, notes, application_id))
 
         conn.commit()
+        if app_data: invalidate_user_identity(user_id=app_data['UserID'])
         flash("Application has been successfully rejected.", "info")
     except Exception as e:
         if conn: conn.rollback()
@@ -337,13 +328,7 @@ def list_all_staff():
 def add_staff():
     """Provides a form for a manager to directly add a new ACTIVE staff member."""
     errors, form_data = {}, {}
-    conn_data = get_db_connection()
-    cursor_data = conn_data.cursor()
-    cursor_data.execute("SHOW COLUMNS FROM Staff LIKE 'Role'")
-    enum_str = cursor_data.fetchone()[1]
-    possible_roles = enum_str.replace("enum('", "").replace("')", "").split("','")
-    cursor_data.close()
-    conn_data.close()
+    possible_roles = get_column_options('Staff', 'Role')
 
     if request.method == 'POST':
         form_data = request.form.to_dict()
@@ -367,6 +352,7 @@ def add_staff():
                 user_id = cursor.lastrowid
                 cursor.execute("INSERT INTO Staff (UserID, Role, EmployeeID) VALUES (%s, %s, %s)", (user_id, form_data.get('role'), form_data.get('employee_id')))
                 conn.commit()
+                invalidate_org_hierarchy()
                 flash(f"Active staff member '{form_data.get('first_name')}' created successfully.", "success")
                 return redirect(url_for('.list_all_staff'))
         except Exception as e:
@@ -388,6 +374,8 @@ def activate_staff(staff_id):
         cursor = conn.cursor()
         cursor.execute("UPDATE Users u JOIN Staff s ON u.UserID = s.UserID SET u.AccountStatus = 'Active' WHERE s.StaffID = %s", (staff_id,))
         conn.commit()
+        invalidate_user_identity(staff_id=staff_id)
+        invalidate_org_hierarchy()
         flash("Staff member has been activated successfully.", "success")
     except Exception as e:
         if conn: conn.rollback()
@@ -410,6 +398,9 @@ def deactivate_staff(staff_id):
         cursor.execute("UPDATE SourcingTeams SET TeamLeadStaffID = NULL WHERE TeamLeadStaffID = %s", (staff_id,))
         cursor.execute("UPDATE SourcingUnits SET UnitManagerStaffID = NULL WHERE UnitManagerStaffID = %s", (staff_id,))
         conn.commit()
+        # Direct reports lost their leader too, so drop every cached identity.
+        clear_identity_cache()
+        invalidate_org_hierarchy()
         flash("Staff member has been deactivated and removed from all structural roles.", "success")
     except Exception as e:
         if conn: conn.rollback()
@@ -525,9 +516,7 @@ def view_staff_profile(user_id_viewing):
         else:
             cursor.execute("SELECT StaffID, CONCAT(u.FirstName, ' ', u.LastName) as FullName FROM Staff s JOIN Users u ON s.UserID = u.UserID WHERE u.AccountStatus = 'Active' ORDER BY FullName")
             team_leaders = cursor.fetchall()
-            cursor.execute("SHOW COLUMNS FROM Staff LIKE 'Role'")
-            enum_str = cursor.fetchone()['Type']
-            possible_roles = enum_str.replace("enum('", "").replace("')", "").split("','")
+            possible_roles = get_column_options('Staff', 'Role', conn)
             
             return render_template('agency_staff_portal/staff/view_staff_profile.html', 
                                    title=f"Profile: {user_profile_data['FirstName']}", 
@@ -560,6 +549,8 @@ def update_role(staff_id_to_edit):
     cursor.execute("UPDATE Staff SET Role = %s WHERE StaffID = %s", (new_role, staff_id_to_edit))
     conn.commit()
     conn.close()
+    invalidate_user_identity(staff_id=staff_id_to_edit)
+    invalidate_org_hierarchy()
     flash("Staff role updated successfully.", "success")
     return redirect(url_for('.view_staff_profile', user_id_viewing=user_id_redirect))
 
@@ -570,7 +561,7 @@ def update_leader(staff_id_to_edit):
     new_leader_id_str = request.form.get('leader_id')
     new_leader_id = int(new_leader_id_str) if new_leader_id_str else None
 
-    if not _is_valid_new_leader(staff_id_to_edit, new_leader_id):
+    if would_create_cycle(staff_id_to_edit, new_leader_id):
         flash("Invalid manager assignment: this would create a reporting loop.", "danger")
     else:
         conn = get_db_connection()
@@ -578,6 +569,8 @@ def update_leader(staff_id_to_edit):
         cursor.execute("UPDATE Staff SET ReportsToStaffID = %s WHERE StaffID = %s", (new_leader_id, staff_id_to_edit))
         conn.commit()
         conn.close()
+        invalidate_user_identity(staff_id=staff_id_to_edit)
+        invalidate_org_hierarchy()
         flash("Staff manager updated successfully.", "success")
     return redirect(url_for('.view_staff_profile', user_id_viewing=user_id_redirect))
 
@@ -669,6 +662,7 @@ def my_profile_update_details():
         cursor = conn.cursor()
         cursor.execute("UPDATE Users SET FirstName = %s, LastName = %s, PhoneNumber = %s WHERE UserID = %s", (first_name, last_name, phone_number, current_user.id))
         conn.commit()
+        invalidate_user_identity(user_id=current_user.id)
         flash("Your profile details have been updated successfully.", "success")
     except Exception as e:
         if conn: conn.rollback()
@@ -709,6 +703,7 @@ def my_profile_update_password():
         new_hashed_password = generate_password_hash(new_password)
         cursor.execute("UPDATE Users SET PasswordHash = %s WHERE UserID = %s", (new_hashed_password, current_user.id))
         conn.commit()
+        invalidate_user_identity(user_id=current_user.id)
         flash("Your password has been changed successfully.", "success")
     except Exception as e:
         if conn: conn.rollback()
@@ -726,18 +721,17 @@ def my_profile_update_password():
 def global_team_overview():
     return render_template('agency_staff_portal/staff/global_team_overview.html', title="Global Team Structure")
 
-@staff_perf_bp.route('/api/team-hierarchy')
-@login_required_with_role(MANAGERIAL_PORTAL_ROLES)
-def api_team_hierarchy():
-    conn = get_db_connection()
+def _load_team_chart(conn):
+    """Active staff as chart nodes plus a parent -> children map. The synthetic root has id None."""
     cursor = conn.cursor(dictionary=True)
     cursor.execute("""
         SELECT s.StaffID AS id, s.ReportsToStaffID AS parentId, u.FirstName, u.LastName, s.Role, u.ProfilePictureURL
         FROM Staff s JOIN Users u ON s.UserID = u.UserID
         WHERE u.AccountStatus = 'Active'
+        ORDER BY s.StaffID
     """)
     nodes = cursor.fetchall()
-    conn.close()
+    cursor.close()
 
     root_node = {
         'id': None, 'parentId': 'root', 'FirstName': 'Mosla', 'LastName': 'Pioneers',
@@ -746,16 +740,74 @@ def api_team_hierarchy():
     nodes.append(root_node)
 
     node_map = {node['id']: node for node in nodes}
+    children = {}
     for node in nodes:
         node['name'] = f"{node['FirstName']} {node['LastName']}"
         parent_id = node.get('parentId')
         if parent_id in node_map:
-            parent = node_map[parent_id]
-            if 'children' not in parent: parent['children'] = []
-            parent['children'].append(node)
+            children.setdefault(parent_id, []).append(node)
+    return node_map, children
+
+
+def _team_chart_body(parent_key):
+    """
+    JSON bytes and a strong ETag for the chart, built once per org version
+    (see utils/org_hierarchy.py). parent_key None means the full nested tree;
+    otherwise the direct children of that staff member ('root' for the top level).
+    """
+    version = get_org_version()
+    entry = _team_chart_cache.get((version, parent_key))
+    if entry is not None:
+        return entry
+
+    chart = _team_chart_cache.get((version, 'chart'))
+    if chart is None:
+        conn = get_db_connection()
+        try:
+            chart = _load_team_chart(conn)
+        finally:
+            conn.close()
+        _team_chart_cache.set((version, 'chart'), chart)
+    node_map, children = chart
+
+    if parent_key is None:
+        def nest(node):
+            nested = dict(node)
+            if node['id'] in children:
+                nested['children'] = [nest(child) for child in children[node['id']]]
+            return nested
+        payload = nest(node_map[None])
+    else:
+        parent_id = None if parent_key == 'root' else parent_key
+        payload = [dict(child, childCount=len(children.get(child['id'], ()))) for child in children.get(parent_id, ())]
 
-    hierarchy_data = next((node for node in nodes if node.get('parentId') == 'root'), None)
-    return jsonify(hierarchy_data)
+    body = json.dumps(payload, default=str, separators=(',', ':')).encode('utf-8')
+    entry = (body, hashlib.sha1(body).hexdigest())
+    _team_chart_cache.set((version, parent_key), entry)
+    return entry
+
+
+@staff_perf_bp.route('/api/team-hierarchy')
+@login_required_with_role(MANAGERIAL_PORTAL_ROLES)
+def api_team_hierarchy():
+    """
+    The org chart as nested JSON. With ?parent=<StaffID> (or ?parent=root) only
+    that node's direct reports are returned, each with a childCount, so very
+    large organizations can be expanded one level at a time.
+    Responses carry an ETag; clients revalidate and get 304 while the org is unchanged.
+    """
+    parent = request.args.get('parent')
+    if parent is not None and parent != 'root':
+        if not parent.isdigit():
+            return jsonify({'status': 'error', 'message': 'parent must be a StaffID or "root".'}), 400
+        parent = int(parent)
+
+    body, etag = _team_chart_body(parent)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @staff_perf_bp.route('/leaderboard/performance')
 @login_required_with_role(MANAGERIAL_PORTAL_ROLES)
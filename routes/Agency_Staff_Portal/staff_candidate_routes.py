@@ -4,6 +4,7 @@ from flask_login import current_user
 from utils.decorators import login_required_with_role, EXECUTIVE_ROLES
 import mysql.connector
 from db import get_db_connection
+from utils.org_hierarchy import manages_or_is
 
 # --- The single, unified blueprint for all staff-related candidate views ---
 staff_candidate_bp = Blueprint('staff_candidate_bp', __name__,
@@ -35,22 +36,7 @@ def _can_staff_view_offer_applicants(staff_id_of_viewer, offer_id):
             current_app.logger.info(f"Offer {offer_id} has no assigned staff manager for company.")
             return False 
 
-        company_direct_manager_id = company_assignment['ManagedByStaffID']
-        if staff_id_of_viewer == company_direct_manager_id:
-            return True
-            
-        current_leader_in_chain = company_direct_manager_id
-        for _ in range(6): # Max hierarchy depth to check
-            if not current_leader_in_chain: return False
-            cursor.execute("SELECT ReportsToStaffID FROM Staff WHERE StaffID = %s", (current_leader_in_chain,))
-            manager_of_current_leader = cursor.fetchone()
-            if not manager_of_current_leader or not manager_of_current_leader['ReportsToStaffID']:
-                return False
-            current_leader_in_chain = manager_of_current_leader['ReportsToStaffID']
-            if current_leader_in_chain == staff_id_of_viewer:
-                return True
-
-        return False
+        return manages_or_is(staff_id_of_viewer, company_assignment['ManagedByStaffID'])
     except Exception as e:
         current_app.logger.error(f"Error in _can_staff_view_offer_applicants (viewer: {staff_id_of_viewer}, offer: {offer_id}): {e}", exc_info=True)
         return False
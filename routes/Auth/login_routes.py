@@ -5,6 +5,9 @@ import datetime
 import re
 from werkzeug.security import check_password_hash
 from db import get_db_connection
+from utils.identity_cache import get_cached_identity, cache_identity, invalidate_user_identity
+from utils.candidate_context import CANDIDATE_PROFILE_FIELDS
+from utils.telemetry import record_login_attempt
 import mysql.connector
 
 login_bp = Blueprint('login_bp', __name__, template_folder='../../templates/auth')
@@ -19,35 +22,15 @@ CLIENT_ROLES = ['ClientContact']
 
 # --- NEW: Helper function to log login attempts ---
 def log_login_attempt(email, status, user_id=None):
-    """Logs a login attempt to the database."""
-    conn = None
+    """Queues a login attempt for the LoginHistory table (written in batches by utils/telemetry.py)."""
     try:
-        conn = get_db_connection()
-        if not conn:
-            current_app.logger.error("Failed to get DB connection for login history.")
-            return
-
-        cursor = conn.cursor()
-        ip_address = request.remote_addr
-        user_agent = request.headers.get('User-Agent')
-        
-        query = """
-            INSERT INTO LoginHistory (UserID, EmailAttempt, IPAddress, UserAgent, Status)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (user_id, email, ip_address, user_agent, status))
-        conn.commit()
+        record_login_attempt(user_id, email, request.remote_addr, request.headers.get('User-Agent'), status)
     except Exception as e:
-        if conn: conn.rollback()
         current_app.logger.error(f"Error logging login attempt for {email}: {e}", exc_info=True)
-    finally:
-        if conn and conn.is_connected():
-            if 'cursor' in locals() and cursor: cursor.close()
-            conn.close()
 
 
 class LoginUser(UserMixin):
-    def __init__(self, user_id, email, first_name, last_name, account_status, role_type, specific_role_id=None, company_id=None, reports_to_id=None, password_hash=None):
+    def __init__(self, user_id, email, first_name, last_name, account_status, role_type, specific_role_id=None, company_id=None, reports_to_id=None, password_hash=None, company_name=None, candidate_profile=None):
         self.id = int(user_id)
         self.email = email
         self.first_name = first_name
@@ -56,6 +39,8 @@ class LoginUser(UserMixin):
         self.role_type = role_type
         self.specific_role_id = specific_role_id
         self.company_id = company_id
+        self.company_name = company_name
+        self.candidate_profile = candidate_profile
         self.reports_to_id = reports_to_id
         self.password_hash = password_hash
         
@@ -72,45 +57,58 @@ class LoginUser(UserMixin):
         if self.password_hash is None: return False
         return check_password_hash(self.password_hash, password_to_check)
 
-def determine_user_identity(user_id, db_connection):
-    cursor = db_connection.cursor(dictionary=True)
-    identity = {'role': "Unknown", 'id': None, 'company_id': None, 'reports_to_id': None}
-    try:
-        cursor.execute("SELECT StaffID, Role, ReportsToStaffID FROM Staff WHERE UserID = %s", (user_id,))
-        if record := cursor.fetchone():
-            identity['role'] = record['Role']
-            identity['id'] = record['StaffID']
-            identity['reports_to_id'] = record.get('ReportsToStaffID')
-        else:
-            cursor.execute("SELECT ContactID, CompanyID FROM CompanyContacts WHERE UserID = %s", (user_id,))
-            if record := cursor.fetchone():
-                identity['role'] = "ClientContact"
-                identity['id'] = record['ContactID']
-                identity['company_id'] = record.get('CompanyID')
-            else:
-                cursor.execute("SELECT CandidateID FROM Candidates WHERE UserID = %s", (user_id,))
-                if record := cursor.fetchone():
-                    identity['role'] = "Candidate"
-                    identity['id'] = record['CandidateID']
-    except Exception as e:
-        current_app.logger.error(f"Error determining role for UserID {user_id}: {e}", exc_info=True)
-        identity['role'] = "ErrorDeterminingRole"
-    finally:
-        if cursor: cursor.close()
+def determine_user_identity(record):
+    """
+    Maps a row from the joined identity query to a role. Precedence matches the
+    original lookup order: Staff, then CompanyContacts, then Candidates.
+    """
+    # The contact's company is carried for every role, so the client portal can authorize
+    # from the identity alone (staff who are also company contacts keep portal access).
+    identity = {'role': "Unknown", 'id': None, 'company_id': record.get('CompanyID'),
+                'company_name': record.get('CompanyName'), 'reports_to_id': None, 'candidate_profile': None}
+    if record.get('StaffID'):
+        identity['role'] = record['StaffRole']
+        identity['id'] = record['StaffID']
+        identity['reports_to_id'] = record.get('ReportsToStaffID')
+    elif record.get('ContactID'):
+        identity['role'] = "ClientContact"
+        identity['id'] = record['ContactID']
+    elif record.get('CandidateID'):
+        identity['role'] = "Candidate"
+        identity['id'] = record['CandidateID']
+        identity['candidate_profile'] = {field: record.get(f'Candidate{field}') for field in CANDIDATE_PROFILE_FIELDS}
     return identity
 
 def get_user_by_id_or_email(identifier, by_email=False):
+    # The user_loader path (by id) is served from the in-process identity cache.
+    if not by_email and (user_args := get_cached_identity(identifier)):
+        return LoginUser(**user_args)
+
     conn = get_db_connection()
     if not conn: return None
     try:
         cursor = conn.cursor(dictionary=True)
-        query = "SELECT UserID, Email, FirstName, LastName, AccountStatus, PasswordHash FROM Users WHERE "
-        query += "Email = %s" if by_email else "UserID = %s"
-        
+        # One round-trip resolves the user and whichever role table they belong to.
+        query = """
+            SELECT u.UserID, u.Email, u.FirstName, u.LastName, u.AccountStatus, u.PasswordHash,
+                   s.StaffID, s.Role AS StaffRole, s.ReportsToStaffID,
+                   cc.ContactID, cc.CompanyID, co.CompanyName,
+                   c.CandidateID, c.Nationality AS CandidateNationality, c.Languages AS CandidateLanguages,
+                   c.LanguageLevel AS CandidateLanguageLevel, c.EducationalStatus AS CandidateEducationalStatus,
+                   c.Gender AS CandidateGender
+            FROM Users u
+            LEFT JOIN Staff s ON s.UserID = u.UserID
+            LEFT JOIN CompanyContacts cc ON cc.UserID = u.UserID
+            LEFT JOIN Companies co ON co.CompanyID = cc.CompanyID
+            LEFT JOIN Candidates c ON c.UserID = u.UserID
+            WHERE """
+        query += "u.Email = %s" if by_email else "u.UserID = %s"
+        query += " LIMIT 1"
+
         cursor.execute(query, (identifier,))
 
         if user_data := cursor.fetchone():
-            identity = determine_user_identity(user_data['UserID'], conn)
+            identity = determine_user_identity(user_data)
             user_args = {
                 'user_id': user_data['UserID'],
                 'email': user_data['Email'],
@@ -121,8 +119,11 @@ def get_user_by_id_or_email(identifier, by_email=False):
                 'role_type': identity['role'],
                 'specific_role_id': identity.get('id'),
                 'company_id': identity.get('company_id'),
+                'company_name': identity.get('company_name'),
+                'candidate_profile': identity.get('candidate_profile'),
                 'reports_to_id': identity.get('reports_to_id')
             }
+            cache_identity(user_args)
             return LoginUser(**user_args)
     except Exception as e:
         current_app.logger.error(f"Error in user retrieval for {identifier}: {e}", exc_info=True)
@@ -254,6 +255,7 @@ def login():
 def logout():
     user_email = current_user.email if hasattr(current_user, 'email') else f"UserID: {current_user.id}"
     session.pop('candidate_intended_destination', None)
+    invalidate_user_identity(user_id=current_user.id)
     logout_user()
     flash('You have been logged out.', 'success')
     current_app.logger.info(f"User {user_email} logged out.")
@@ -1,12 +1,11 @@
 # routes/Auth/register_routes.py
 from flask import Blueprint, render_template, request, flash, redirect, session, url_for, current_app
-from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash
-import os
 import datetime
 import re
 import mysql.connector
 from db import get_db_connection
+from utils.upload_storage import store_upload
 
 register_bp = Blueprint('register_bp', __name__, template_folder='../../templates/auth')
 
@@ -59,21 +58,9 @@ def create_user_in_db(email, password, first_name, last_name, phone_number=None,
             conn.close()
 
 def save_file(file_storage, subfolder='general'):
-    """Saves an uploaded file and returns its relative path for DB or None."""
+    """Saves an uploaded file (content-addressed, see utils/upload_storage.py) and returns its relative path for DB or None."""
     if file_storage and file_storage.filename:
-        filename = secure_filename(file_storage.filename)
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', os.path.join(current_app.static_folder, 'uploads'))
-        specific_upload_path = os.path.join(upload_folder, subfolder)
-        os.makedirs(specific_upload_path, exist_ok=True)
-        file_path_on_disk = os.path.join(specific_upload_path, filename)
-        try:
-            file_storage.save(file_path_on_disk)
-            relative_path = os.path.join('uploads', subfolder, filename).replace("\\", "/")
-            current_app.logger.info(f"File saved: {file_path_on_disk}, DB path: {relative_path}")
-            return relative_path
-        except Exception as e:
-            current_app.logger.error(f"Error saving file {filename} to {file_path_on_disk}: {e}")
-            return None
+        return store_upload(file_storage, category=subfolder)
     return None
 
 @register_bp.route('/register', methods=['GET'])
@@ -1,34 +1,27 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort, jsonify
 from flask_login import login_required, current_user
 from db import get_db_connection
+from utils.leaderboard import record_application_status_change
+from utils.identity_cache import invalidate_user_identity
+from utils.candidate_context import get_candidate_id
 from utils.directory_configs import save_file_from_config
+from utils.upload_storage import release_upload
+from utils.interview_slots import ensure_company_slots, get_available_slots, has_upcoming_booking, reserve_slot, INTERVIEW_SLOT_HORIZON_DAYS, INTERVIEW_SLOT_MINUTES
 from datetime import datetime, timedelta, time
 import os
+import mysql.connector
 
 candidate_bp = Blueprint('candidate_bp', __name__,
                          url_prefix='/candidate',
                          template_folder='../../../templates')
 
-def get_candidate_id(user_id):
-    """Helper to get CandidateID from UserID, returns None if not found."""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT CandidateID FROM Candidates WHERE UserID = %s", (user_id,))
-        result = cursor.fetchone()
-        return result[0] if result else None
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
-
 @candidate_bp.route('/dashboard')
 @login_required
 def dashboard():
     if not (hasattr(current_user, 'role_type') and current_user.role_type == 'Candidate'):
         abort(403)
 
-    candidate_id = get_candidate_id(current_user.id)
+    candidate_id = get_candidate_id()
     if not candidate_id:
         flash("Your candidate profile could not be found.", "danger")
         return redirect(url_for('public_routes_bp.home_page'))
@@ -87,7 +80,7 @@ def dashboard():
 def edit_profile():
     if not (hasattr(current_user, 'role_type') and current_user.role_type == 'Candidate'):
         abort(403)
-    candidate_id = get_candidate_id(current_user.id)
+    candidate_id = get_candidate_id()
     if not candidate_id:
         flash("Candidate profile not found.", "danger")
         return redirect(url_for('.dashboard'))
@@ -102,7 +95,10 @@ def edit_profile():
 
             profile_pic_path = None
             if 'profile_picture' in files and files['profile_picture'].filename:
-                profile_pic_path = save_file_from_config(files['profile_picture'], f'candidate_profile_pics/{candidate_id}')
+                profile_pic_path = save_file_from_config(files['profile_picture'], f'candidate_profile_pics/{candidate_id}', conn=conn)
+                if profile_pic_path:
+                    cursor.execute("SELECT ProfilePictureURL FROM Users WHERE UserID = %s", (current_user.id,))
+                    release_upload(cursor.fetchone()[0], conn)
             
             user_update_query = "UPDATE Users SET FirstName=%s, LastName=%s, PhoneNumber=%s"
             user_params = [form.get('first_name'), form.get('last_name'), form.get('phone_number')]
@@ -132,6 +128,7 @@ def edit_profile():
             """, candidate_params)
 
             conn.commit()
+            invalidate_user_identity(user_id=current_user.id)
             flash("Profile updated successfully!", "success")
             return redirect(url_for('.dashboard'))
         except Exception as e:
@@ -166,7 +163,7 @@ def upload_cv():
     # This function is unchanged
     if not (hasattr(current_user, 'role_type') and current_user.role_type == 'Candidate'):
         abort(403)
-    candidate_id = get_candidate_id(current_user.id)
+    candidate_id = get_candidate_id()
     if not candidate_id:
         flash("Your candidate profile could not be found. Cannot upload CV.", "danger")
         return redirect(url_for('.dashboard'))
@@ -184,7 +181,7 @@ def upload_cv():
         cursor.execute("SELECT COUNT(*) FROM CandidateCVs WHERE CandidateID = %s", (candidate_id,))
         cv_count = cursor.fetchone()[0]
         is_primary = 1 if cv_count == 0 else 0
-        cv_path = save_file_from_config(file, f'candidate_cvs/{candidate_id}')
+        cv_path = save_file_from_config(file, f'candidate_cvs/{candidate_id}', conn=conn)
         if cv_path:
             if is_primary:
                 cursor.execute("UPDATE CandidateCVs SET IsPrimary = 0 WHERE CandidateID = %s", (candidate_id,))
@@ -214,7 +211,7 @@ def delete_cv(cv_id):
     # This function is unchanged
     if not (hasattr(current_user, 'role_type') and current_user.role_type == 'Candidate'):
         return jsonify({'status': 'error', 'message': 'Access denied'}), 403
-    candidate_id = get_candidate_id(current_user.id)
+    candidate_id = get_candidate_id()
     if not candidate_id:
         return jsonify({'status': 'error', 'message': 'Candidate profile not found.'}), 404
     conn = None
@@ -226,6 +223,7 @@ def delete_cv(cv_id):
         if not cv_data:
             return jsonify({'status': 'error', 'message': 'CV not found or you do not have permission to delete it.'}), 404
         cursor.execute("DELETE FROM CandidateCVs WHERE CVID = %s", (cv_id,))
+        release_upload(cv_data['CVFileUrl'], conn)
         if cv_data['IsPrimary']:
             cursor.execute("SELECT CVID FROM CandidateCVs WHERE CandidateID = %s ORDER BY UploadedAt DESC LIMIT 1", (candidate_id,))
             next_primary = cursor.fetchone()
@@ -248,7 +246,7 @@ def set_primary_cv(cv_id):
     # This function is unchanged
     if not (hasattr(current_user, 'role_type') and current_user.role_type == 'Candidate'):
         return jsonify({'status': 'error', 'message': 'Access denied'}), 403
-    candidate_id = get_candidate_id(current_user.id)
+    candidate_id = get_candidate_id()
     if not candidate_id:
         return jsonify({'status': 'error', 'message': 'Candidate profile not found.'}), 404
     conn = None
@@ -281,7 +279,7 @@ def view_interview_slots(application_id):
     if not (hasattr(current_user, 'role_type') and current_user.role_type == 'Candidate'):
         abort(403)
     
-    candidate_id = get_candidate_id(current_user.id)
+    candidate_id = get_candidate_id()
     if not candidate_id:
         abort(403)
 
@@ -305,33 +303,11 @@ def view_interview_slots(application_id):
             flash("This application is not currently eligible for interview scheduling.", "warning")
             return redirect(url_for('.dashboard'))
 
-        # Slot Generation Logic
-        cursor.execute("SELECT DayOfWeek, StartTime, EndTime FROM CompanyInterviewSchedules WHERE CompanyID = %s AND IsActive = 1", (application['CompanyID'],))
-        company_schedules = cursor.fetchall()
-
-        cursor.execute("SELECT ScheduledDateTime FROM Interviews i JOIN JobApplications ja ON i.ApplicationID = ja.ApplicationID JOIN JobOffers jo ON ja.OfferID = jo.OfferID WHERE jo.CompanyID = %s AND i.ScheduledDateTime >= CURDATE()", (application['CompanyID'],))
-        booked_slots = {row['ScheduledDateTime'] for row in cursor.fetchall()}
-        
-        available_slots = []
-        today = datetime.today()
-        for day_offset in range(1, 15):
-            current_day = today + timedelta(days=day_offset)
-            day_name = current_day.strftime('%A')
-            for schedule in company_schedules:
-                if schedule['DayOfWeek'] == day_name:
-                    start_timedelta = schedule['StartTime']
-                    end_timedelta = schedule['EndTime']
-                    
-                    start_time_obj = (datetime.min + start_timedelta).time()
-                    end_time_obj = (datetime.min + end_timedelta).time()
-                    
-                    slot_time = datetime.combine(current_day.date(), start_time_obj)
-                    end_time = datetime.combine(current_day.date(), end_time_obj)
-                    
-                    while slot_time < end_time:
-                        if slot_time > datetime.now() and slot_time not in booked_slots:
-                            available_slots.append(slot_time)
-                        slot_time += timedelta(minutes=30)
+        # Slots are materialized per company (utils/interview_slots.py); this is an indexed range read.
+        ensure_company_slots(conn, application['CompanyID'])
+        window_start = datetime.combine(datetime.today().date() + timedelta(days=1), time())
+        available_slots = get_available_slots(cursor, application['CompanyID'], window_start,
+                                              window_start + timedelta(days=INTERVIEW_SLOT_HORIZON_DAYS))
 
         # Group slots for the UI
         grouped_slots = {}
@@ -355,6 +331,59 @@ def view_interview_slots(application_id):
                            grouped_slots=grouped_slots)
 
 
+@candidate_bp.route('/application/<int:application_id>/slots', methods=['GET'])
+@login_required
+def api_interview_slots(application_id):
+    """
+    Returns open interview slots for a shortlisted application as JSON.
+    Optional `start` / `end` (YYYY-MM-DD, end exclusive) narrow the window;
+    it defaults to, and is capped at, INTERVIEW_SLOT_HORIZON_DAYS from tomorrow.
+    """
+    if not (hasattr(current_user, 'role_type') and current_user.role_type == 'Candidate'):
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+
+    candidate_id = get_candidate_id()
+    if not candidate_id:
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+
+    first_day = datetime.today().date() + timedelta(days=1)
+    last_day = first_day + timedelta(days=INTERVIEW_SLOT_HORIZON_DAYS)
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else first_day
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else last_day
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Dates must be YYYY-MM-DD.'}), 400
+    start, end = max(start, first_day), min(end, last_day)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT ja.Status, jo.CompanyID FROM JobApplications ja JOIN JobOffers jo ON ja.OfferID = jo.OfferID
+            WHERE ja.ApplicationID = %s AND ja.CandidateID = %s
+        """, (application_id, candidate_id))
+        application = cursor.fetchone()
+        if not application:
+            return jsonify({'status': 'error', 'message': 'Application not found.'}), 404
+        if application['Status'] != 'Shortlisted':
+            return jsonify({'status': 'error', 'message': 'This application is not eligible for interview scheduling.'}), 409
+
+        slots = []
+        if start < end:
+            ensure_company_slots(conn, application['CompanyID'])
+            slots = get_available_slots(cursor, application['CompanyID'], datetime.combine(start, time()), datetime.combine(end, time()))
+        return jsonify({'status': 'success', 'start': start.isoformat(), 'end': end.isoformat(),
+                        'slot_minutes': INTERVIEW_SLOT_MINUTES,
+                        'slots': [slot.isoformat() for slot in slots]})
+    except Exception as e:
+        current_app.logger.error(f"Error listing interview slots for AppID {application_id}: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'Could not load interview slots.'}), 500
+    finally:
+        if conn and conn.is_connected():
+            if 'cursor' in locals() and cursor: cursor.close()
+            conn.close()
+
+
 @candidate_bp.route('/application/<int:application_id>/book', methods=['POST'])
 @login_required
 def book_interview_slot(application_id):
@@ -365,7 +394,7 @@ def book_interview_slot(application_id):
     if not (hasattr(current_user, 'role_type') and current_user.role_type == 'Candidate'):
         abort(403)
     
-    candidate_id = get_candidate_id(current_user.id)
+    candidate_id = get_candidate_id()
     if not candidate_id:
         abort(403)
 
@@ -374,32 +403,46 @@ def book_interview_slot(application_id):
         flash("Please select a valid interview slot.", "danger")
         return redirect(url_for('.view_interview_slots', application_id=application_id))
 
-    scheduled_dt = datetime.fromisoformat(selected_slot_str)
+    try:
+        scheduled_dt = datetime.fromisoformat(selected_slot_str)
+    except ValueError:
+        flash("Please select a valid interview slot.", "danger")
+        return redirect(url_for('.view_interview_slots', application_id=application_id))
     
     conn = get_db_connection()
     try:
         cursor = conn.cursor(dictionary=True)
-        # Re-verify ownership and status before booking
-        cursor.execute("SELECT ja.Status, jo.CompanyID FROM JobApplications ja JOIN JobOffers jo ON ja.OfferID = jo.OfferID WHERE ja.ApplicationID = %s AND ja.CandidateID = %s", (application_id, candidate_id))
+        # Re-verify ownership and status before booking; the row lock serializes bookings for this application.
+        cursor.execute("SELECT ja.Status, jo.CompanyID FROM JobApplications ja JOIN JobOffers jo ON ja.OfferID = jo.OfferID WHERE ja.ApplicationID = %s AND ja.CandidateID = %s FOR UPDATE OF ja", (application_id, candidate_id))
         application = cursor.fetchone()
         if not application or application['Status'] != 'Shortlisted':
+            conn.rollback()
             flash("This application cannot be scheduled at this time.", "warning")
             return redirect(url_for('.dashboard'))
+        if has_upcoming_booking(cursor, application_id):
+            conn.rollback()
+            flash("An interview is already booked for this application.", "info")
+            return redirect(url_for('.dashboard'))
 
-        # Check for race condition: Is the slot still available?
-        cursor.execute("SELECT InterviewID FROM Interviews WHERE ScheduledDateTime = %s", (scheduled_dt,))
-        if cursor.fetchone():
+        # Claim the slot atomically; losing the race leaves the row untouched.
+        if not reserve_slot(cursor, application['CompanyID'], scheduled_dt, application_id):
+            conn.rollback()
             flash("Sorry, that time slot was just booked by another candidate. Please choose another.", "warning")
             return redirect(url_for('.view_interview_slots', application_id=application_id))
         
         # All checks passed, perform the booking
         cursor.execute("INSERT INTO Interviews (ApplicationID, ScheduledDateTime) VALUES (%s, %s)", (application_id, scheduled_dt))
+        record_application_status_change(conn, application_id, 'Interview Scheduled')
         cursor.execute("UPDATE JobApplications SET Status = 'Interview Scheduled' WHERE ApplicationID = %s", (application_id,))
         conn.commit() # Commit the two changes together
 
         flash(f"Your interview has been successfully scheduled for {scheduled_dt.strftime('%A, %B %d at %I:%M %p')}.", "success")
         return redirect(url_for('.dashboard'))
 
+    except mysql.connector.IntegrityError:
+        conn.rollback()
+        flash("An interview is already booked for this application.", "info")
+        return redirect(url_for('.dashboard'))
     except Exception as e:
         if 'conn' in locals() and conn: conn.rollback()
         current_app.logger.error(f"Error booking interview for AppID {application_id}: {e}", exc_info=True)
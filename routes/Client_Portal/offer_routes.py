@@ -1,9 +1,11 @@
 # routes/Client_Portal/offer_routes.py
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, session, abort
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort
 from flask_login import login_required, current_user
 from functools import wraps
 from db import get_db_connection
+from utils.leaderboard import record_application_status_change
+from utils.schema_options import get_column_options
 import mysql.connector
 import re # Import the regular expression module
 
@@ -13,109 +15,38 @@ client_offers_bp = Blueprint('client_offers_bp', __name__,
                              url_prefix='/client')
 
 
-# --- Helper Function to Query ENUM/SET Options (with Fixes) ---
-def get_column_options(cursor, db_name, table_name, column_name):
-    """
-    Queries the information_schema to get the possible values for an ENUM or SET column.
-    Returns a list of strings.
-    """
-    # FIX: Add a check to ensure db_name is configured. This is a common point of failure.
-    if not db_name:
-        current_app.logger.error(f"FATAL: MYSQL_DB configuration is not set. Cannot get options for {table_name}.{column_name}.")
-        return []
-    try:
-        query = """
-            SELECT COLUMN_TYPE 
-            FROM information_schema.COLUMNS
-            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
-        """
-        cursor.execute(query, (db_name, table_name, column_name))
-        result = cursor.fetchone()
-        
-        if result and result[0]:
-            # FIX: Handle potential bytearray response from some database connectors, which was causing the regex to fail silently.
-            type_string = result[0].decode('utf-8') if isinstance(result[0], bytearray) else result[0]
-            options = re.findall(r"'(.*?)'", type_string)
-            return options
-        
-        current_app.logger.warning(f"No options found in schema for {table_name}.{column_name}. The column might not exist or is not an ENUM/SET.")
-        return []
-    except Exception as e:
-        current_app.logger.error(f"DATABASE ERROR fetching options for {table_name}.{column_name}: {e}")
-        return []
-
 # --- Decorator (No changes needed) ---
 def client_login_required(f):
     @wraps(f)
     @login_required
     def decorated_function(*args, **kwargs):
-        if 'client_company_id' not in session or session.get('user_id') != current_user.id:
-            conn = None
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor(dictionary=True)
-                cursor.execute("""
-                    SELECT c.CompanyID, c.CompanyName 
-                    FROM CompanyContacts cc
-                    JOIN Companies c ON cc.CompanyID = c.CompanyID
-                    WHERE cc.UserID = %s 
-                    LIMIT 1
-                """, (current_user.id,))
-                company_contact_info = cursor.fetchone()
-                if not company_contact_info:
-                    flash("You are not authorized to access the client portal.", "danger")
-                    return redirect(url_for('login_bp.login'))
-                session['client_company_id'] = company_contact_info['CompanyID']
-                session['client_company_name'] = company_contact_info['CompanyName']
-                session['user_id'] = current_user.id
-            except Exception as e:
-                current_app.logger.error(f"Error during client auth check for User {current_user.id}: {e}")
-                flash("An error occurred during authorization.", "danger")
-                return redirect(url_for('login_bp.login'))
-            finally:
-                if conn and conn.is_connected():
-                    cursor.close()
-                    conn.close()
+        # The contact's company is resolved at login and carried in the (cached) identity.
+        if not getattr(current_user, 'company_id', None):
+            flash("You are not authorized to access the client portal.", "danger")
+            return redirect(url_for('login_bp.login'))
         return f(*args, **kwargs)
     return decorated_function
 
 @client_offers_bp.route('/submit-offer', methods=['GET', 'POST'])
 @client_login_required
 def submit_offer():
-    form_options = {}
-    db_name = current_app.config.get('MYSQL_DB')
-    conn = None
-    
-    # DYNAMICALLY FETCH ALL OPTIONS FROM DB SCHEMA FOR THE FORM
-    try:
-        conn = get_db_connection()
-        db_name = conn.database  # Get the database name from the connection object
-        cursor = conn.cursor() 
-        table = 'ClientSubmittedJobOffers'
-        form_options = {
-            'benefits_included': get_column_options(cursor, db_name, table, 'BenefitsIncluded'),
-            'interview_types': get_column_options(cursor, db_name, table, 'InterviewType'),
-            'nationalities': get_column_options(cursor, db_name, table, 'Nationality'),
-            'genders': get_column_options(cursor, db_name, table, 'Gender'),
-            'military_statuses': get_column_options(cursor, db_name, table, 'MilitaryStatus'),
-            'graduation_statuses': get_column_options(cursor, db_name, table, 'GraduationStatusRequirement'),
-            'available_shifts': get_column_options(cursor, db_name, table, 'AvailableShifts'),
-            'required_languages': get_column_options(cursor, db_name, table, 'RequiredLanguages'),
-            'payment_terms': get_column_options(cursor, db_name, table, 'PaymentTerm'),
-            'required_levels': get_column_options(cursor, db_name, table, 'RequiredLevel')
-        }
-    except Exception as e:
-        flash("Could not load form options from the database.", "danger")
-        current_app.logger.error(f"Error establishing connection to fetch form options: {e}")
-        # Initialize with empty lists to prevent template errors
-        form_options = {key: [] for key in ['benefits_included', 'interview_types', 'nationalities', 'genders', 'military_statuses', 'graduation_statuses', 'available_shifts', 'required_languages', 'payment_terms', 'required_levels']}
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+    # DYNAMICALLY FETCH ALL OPTIONS FROM THE CACHED DB SCHEMA FOR THE FORM
+    table = 'ClientSubmittedJobOffers'
+    form_options = {
+        'benefits_included': get_column_options(table, 'BenefitsIncluded'),
+        'interview_types': get_column_options(table, 'InterviewType'),
+        'nationalities': get_column_options(table, 'Nationality'),
+        'genders': get_column_options(table, 'Gender'),
+        'military_statuses': get_column_options(table, 'MilitaryStatus'),
+        'graduation_statuses': get_column_options(table, 'GraduationStatusRequirement'),
+        'available_shifts': get_column_options(table, 'AvailableShifts'),
+        'required_languages': get_column_options(table, 'RequiredLanguages'),
+        'payment_terms': get_column_options(table, 'PaymentTerm'),
+        'required_levels': get_column_options(table, 'RequiredLevel')
+    }
 
     if request.method == 'POST':
-        company_id = session.get('client_company_id')
+        company_id = current_user.company_id
         if not company_id:
             abort(403)
 
@@ -123,7 +54,7 @@ def submit_offer():
         if not form.get('title') or not form.get('closing_date'):
             flash("Job Title and Closing Date are required.", "danger")
             return render_template('client_portal/submit_offer.html', 
-                                   title="Submit New Job Offer", company_name=session.get('client_company_name'), 
+                                   title="Submit New Job Offer", company_name=current_user.company_name, 
                                    form_data=form, options=form_options,
                                    selected_benefits=form.getlist('benefits_included'),
                                    selected_shifts=form.getlist('available_shifts'),
@@ -178,7 +109,7 @@ def submit_offer():
             flash(f"An error occurred while submitting your offer: {err}", "danger")
             current_app.logger.error(f"Client offer submission error for company {company_id}: {err}")
             return render_template('client_portal/submit_offer.html', 
-                                   title="Submit New Job Offer", company_name=session.get('client_company_name'), 
+                                   title="Submit New Job Offer", company_name=current_user.company_name, 
                                    form_data=form, options=form_options,
                                    selected_benefits=form.getlist('benefits_included'),
                                    selected_shifts=form.getlist('available_shifts'),
@@ -192,7 +123,7 @@ def submit_offer():
     # On initial GET request
     return render_template('client_portal/submit_offer.html', 
                            title="Submit New Job Offer", 
-                           company_name=session.get('client_company_name'), 
+                           company_name=current_user.company_name, 
                            form_data={},
                            options=form_options,
                            selected_benefits=[], selected_shifts=[], selected_languages=[], selected_grad_statuses=[])
@@ -202,7 +133,7 @@ def submit_offer():
 def my_submissions():
     conn = None
     submissions = []
-    company_id = session.get('client_company_id')
+    company_id = current_user.company_id
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -228,26 +159,34 @@ def my_submissions():
 def pipeline():
     conn = None
     offers_with_candidates = []
-    company_id = session.get('client_company_id')
+    company_id = current_user.company_id
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT OfferID, Title, CandidatesNeeded FROM JobOffers WHERE CompanyID = %s AND Status = 'Open' ORDER BY Title", (company_id,))
-        live_offers = cursor.fetchall()
-        for offer in live_offers:
-            cursor.execute("""
-                SELECT 
-                    ja.ApplicationID, ja.Status, u.FirstName, u.LastName, cv.CVFileUrl 
-                FROM JobApplications ja 
-                JOIN Candidates c ON ja.CandidateID = c.CandidateID 
-                JOIN Users u ON c.UserID = u.UserID 
-                LEFT JOIN CandidateCVs cv ON c.CandidateID = cv.CandidateID AND cv.IsPrimary = 1 
-                WHERE ja.OfferID = %s AND ja.Status = 'Shortlisted' 
-                ORDER BY ja.ApplicationDate DESC
-            """, (offer['OfferID'],))
-            candidates = cursor.fetchall()
-            offer['candidates'] = candidates
-            offers_with_candidates.append(offer)
+        # One pass over the open offers and their shortlisted candidates; offers
+        # without candidates come back as a single row with NULL application columns.
+        cursor.execute("""
+            SELECT
+                jo.OfferID, jo.Title, jo.CandidatesNeeded,
+                ja.ApplicationID, ja.Status, u.FirstName, u.LastName, cv.CVFileUrl,
+                ROW_NUMBER() OVER (PARTITION BY jo.OfferID ORDER BY ja.ApplicationDate DESC, ja.ApplicationID DESC) AS CandidateRank
+            FROM JobOffers jo
+            LEFT JOIN JobApplications ja ON ja.OfferID = jo.OfferID AND ja.Status = 'Shortlisted'
+            LEFT JOIN Candidates c ON ja.CandidateID = c.CandidateID
+            LEFT JOIN Users u ON c.UserID = u.UserID
+            LEFT JOIN CandidateCVs cv ON c.CandidateID = cv.CandidateID AND cv.IsPrimary = 1
+            WHERE jo.CompanyID = %s AND jo.Status = 'Open'
+            ORDER BY jo.Title, jo.OfferID, CandidateRank
+        """, (company_id,))
+        offers_by_id = {}
+        for row in cursor.fetchall():
+            offer = offers_by_id.get(row['OfferID'])
+            if offer is None:
+                offer = {'OfferID': row['OfferID'], 'Title': row['Title'], 'CandidatesNeeded': row['CandidatesNeeded'], 'candidates': []}
+                offers_by_id[row['OfferID']] = offer
+                offers_with_candidates.append(offer)
+            if row['ApplicationID'] is not None:
+                offer['candidates'].append({key: row[key] for key in ('ApplicationID', 'Status', 'FirstName', 'LastName', 'CVFileUrl')})
     except Exception as e:
         current_app.logger.error(f"Client Pipeline DB Error for company {company_id}: {e}")
         flash("A database error occurred while loading your candidate pipeline.", "danger")
@@ -262,7 +201,7 @@ def pipeline():
 @client_login_required
 def update_application_status(application_id):
     action = request.form.get('action')
-    company_id = session.get('client_company_id')
+    company_id = current_user.company_id
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -284,6 +223,7 @@ def update_application_status(application_id):
         conn_update = get_db_connection()
         cursor_update = conn_update.cursor()
         try:
+            record_application_status_change(conn_update, application_id, new_status)
             cursor_update.execute("UPDATE JobApplications SET Status = %s WHERE ApplicationID = %s", (new_status, application_id))
             conn_update.commit()
             flash(f"Candidate status has been updated to '{new_status}'.", "success")
@@ -301,7 +241,7 @@ def update_application_status(application_id):
 def view_submission_details(submission_id):
     conn = None
     submission = None
-    company_id = session.get('client_company_id')
+    company_id = current_user.company_id
 
     try:
         conn = get_db_connection()
@@ -347,7 +287,7 @@ def view_submission_details(submission_id):
 def my_offers():
     conn = None
     offers = []
-    company_id = session.get('client_company_id')
+    company_id = current_user.company_id
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
@@ -3,6 +3,9 @@ from flask import Blueprint, abort, render_template, flash, redirect, url_for, c
 from flask_login import login_required, current_user
 from utils.decorators import login_required_with_role
 from db import get_db_connection
+from utils.identity_cache import invalidate_user_identity
+from utils.leaderboard import get_leaderboard, get_referral_rollup
+from utils.search import search, order_by_rank
 import secrets
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -31,7 +34,6 @@ def dashboard():
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
 
-    scoped_staff_ids = []
     dashboard_title = "My Performance"
     
     kpis = {
@@ -57,40 +59,33 @@ def dashboard():
         """)
         announcements = cursor.fetchall()
 
+        # Scope is a condition on Staff s; the figures come from the monthly
+        # referral rollup (utils/leaderboard.py), not from JobApplications.
+        scope_sql, scope_params = None, ()
         if user_role in ORG_MANAGEMENT_ROLES:
             dashboard_title = "Overall Sourcing Division Performance"
-            cursor.execute("""
-                SELECT s.StaffID FROM Staff s JOIN Users u ON s.UserID = u.UserID
-                WHERE s.Role IN ('SourcingRecruiter', 'SourcingTeamLead', 'UnitManager', 'HeadUnitManager') AND u.IsActive = 1
-            """)
-            scoped_staff_ids = [row['StaffID'] for row in cursor.fetchall()]
+            scope_sql = "s.Role IN ('SourcingRecruiter', 'SourcingTeamLead', 'UnitManager', 'HeadUnitManager')"
 
         elif user_role == 'UnitManager':
             dashboard_title = f"{current_user.first_name}'s Unit Performance"
-            cursor.execute("""
-                SELECT s.StaffID FROM Staff s JOIN SourcingTeams st ON s.TeamID = st.TeamID
-                JOIN Users u ON s.UserID = u.UserID
-                WHERE st.UnitID = (SELECT su.UnitID FROM SourcingUnits su WHERE su.UnitManagerStaffID = %s) AND u.IsActive = 1
-            """, (user_staff_id,))
-            scoped_staff_ids = [row['StaffID'] for row in cursor.fetchall()]
+            scope_sql = """s.TeamID IN (SELECT st.TeamID FROM SourcingTeams st
+                           WHERE st.UnitID = (SELECT su.UnitID FROM SourcingUnits su WHERE su.UnitManagerStaffID = %s))"""
+            scope_params = (user_staff_id,)
 
         elif user_role == 'SourcingTeamLead':
             dashboard_title = f"{current_user.first_name}'s Team Performance"
-            cursor.execute("""
-                SELECT s.StaffID FROM Staff s JOIN Users u ON s.UserID = u.UserID
-                WHERE s.TeamID = (SELECT TeamID FROM Staff WHERE StaffID = %s) AND u.IsActive = 1
-            """, (user_staff_id,))
-            scoped_staff_ids = [row['StaffID'] for row in cursor.fetchall()]
+            scope_sql = "s.TeamID = (SELECT TeamID FROM Staff WHERE StaffID = %s)"
+            scope_params = (user_staff_id,)
 
-        if not scoped_staff_ids and current_user.is_active:
-            scoped_staff_ids.append(user_staff_id)
+        if scope_sql:
+            cursor.execute(f"SELECT 1 FROM Staff s JOIN Users u ON s.UserID = u.UserID WHERE u.IsActive = 1 AND {scope_sql} LIMIT 1", scope_params)
+            if cursor.fetchone() is None:
+                scope_sql = None
+        if not scope_sql and current_user.is_active:
+            scope_sql, scope_params = "s.StaffID = %s", (user_staff_id,)
 
-        if scoped_staff_ids:
-            placeholders = ', '.join(['%s'] * len(scoped_staff_ids))
-
-            funnel_sql = f"SELECT Status, COUNT(ApplicationID) as count FROM JobApplications WHERE ReferringStaffID IN ({placeholders}) GROUP BY Status"
-            cursor.execute(funnel_sql, tuple(scoped_staff_ids))
-            funnel_data = {row['Status']: row['count'] for row in cursor.fetchall()}
+        if scope_sql:
+            funnel_data, kpis['monthly_performance'] = get_referral_rollup(cursor, scope_sql, scope_params)
 
             kpis['funnel'] = {
                 'Applied': funnel_data.get('Applied', 0) + funnel_data.get('Submitted', 0),
@@ -100,17 +95,6 @@ def dashboard():
             }
             kpis['status_breakdown_for_chart'] = funnel_data
             kpis['total_referrals'] = sum(funnel_data.values())
-
-            monthly_sql = f"""
-                SELECT DATE_FORMAT(ApplicationDate, '%%Y-%%m') AS month,
-                    COUNT(ApplicationID) as total_referrals,
-                    SUM(CASE WHEN Status = 'Hired' THEN 1 ELSE 0 END) as total_hires
-                FROM JobApplications
-                WHERE ReferringStaffID IN ({placeholders}) AND ApplicationDate >= DATE_SUB(NOW(), INTERVAL 6 MONTH)
-                GROUP BY month ORDER BY month ASC
-            """
-            cursor.execute(monthly_sql, tuple(scoped_staff_ids))
-            kpis['monthly_performance'] = cursor.fetchall()
         
     except Exception as e:
         current_app.logger.error(f"Error fetching recruiter dashboard for StaffID {user_staff_id}: {e}", exc_info=True)
@@ -138,6 +122,7 @@ def my_profile():
             cursor.execute("UPDATE Users SET FirstName = %s, LastName = %s, Email = %s, PhoneNumber = %s WHERE UserID = %s", (first_name, last_name, email, phone_number, user_id))
             conn.commit()
             current_user.first_name, current_user.last_name = first_name, last_name
+            invalidate_user_identity(user_id=user_id)
             flash("Your profile details have been updated successfully.", "success")
         
         elif action == 'change_password':
@@ -150,6 +135,7 @@ def my_profile():
                 hashed_password = generate_password_hash(new_password)
                 cursor.execute("UPDATE Users SET PasswordHash = %s WHERE UserID = %s", (hashed_password, user_id))
                 conn.commit()
+                invalidate_user_identity(user_id=user_id)
                 flash("Your password has been changed successfully.", "success")
         
         elif action == 'generate_code':
@@ -184,28 +170,20 @@ def my_profile():
 @login_required_with_role(RECRUITER_PORTAL_ROLES)
 def team_leaderboard():
     sort_by = request.args.get('sort_by', 'referrals_all_time')
-    sql = """
-        SELECT s.StaffID, u.FirstName, u.LastName, u.ProfilePictureURL, s.Role,
-            (SELECT COUNT(*) FROM JobApplications WHERE ReferringStaffID = s.StaffID) as referrals_all_time,
-            (SELECT COUNT(*) FROM JobApplications WHERE ReferringStaffID = s.StaffID AND Status = 'Hired') as hires_all_time,
-            (SELECT COUNT(*) FROM JobApplications WHERE ReferringStaffID = s.StaffID AND ApplicationDate >= DATE_FORMAT(NOW(), '%%Y-%%m-01')) as referrals_monthly,
-            (SELECT COUNT(*) FROM JobApplications WHERE ReferringStaffID = s.StaffID AND Status = 'Hired' AND ApplicationDate >= DATE_FORMAT(NOW(), '%%Y-%%m-01')) as hires_monthly
-        FROM Staff s JOIN Users u ON s.UserID = u.UserID
-        WHERE s.Role IN ('SourcingRecruiter', 'SourcingTeamLead', 'HeadSourcingTeamLead', 'UnitManager') AND u.IsActive = 1
-    """
-    if sort_by == 'hires_all_time':
-        sql += " ORDER BY hires_all_time DESC, referrals_all_time DESC"; title = "Leaderboard: All-Time Hires"
-    elif sort_by == 'referrals_monthly':
-        sql += " ORDER BY referrals_monthly DESC, hires_monthly DESC"; title = "Leaderboard: Referrals This Month"
-    elif sort_by == 'hires_monthly':
-        sql += " ORDER BY hires_monthly DESC, referrals_monthly DESC"; title = "Leaderboard: Hires This Month"
-    else:
-        sort_by = 'referrals_all_time'; sql += " ORDER BY referrals_all_time DESC, hires_all_time DESC"; title = "Leaderboard: All-Time Referrals"
+    titles = {
+        'referrals_all_time': "Leaderboard: All-Time Referrals",
+        'hires_all_time': "Leaderboard: All-Time Hires",
+        'referrals_monthly': "Leaderboard: Referrals This Month",
+        'hires_monthly': "Leaderboard: Hires This Month",
+    }
+    if sort_by not in titles:
+        sort_by = 'referrals_all_time'
+    title = titles[sort_by]
 
+    # Counters are maintained on application insert/status change (see utils/leaderboard.py).
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
-    cursor.execute(sql)
-    leaderboard_data = cursor.fetchall()
+    leaderboard_data = get_leaderboard(cursor, ('SourcingRecruiter', 'SourcingTeamLead', 'HeadSourcingTeamLead', 'UnitManager'), sort_by)
     conn.close()
     return render_template('recruiter_team_portal/team_leaderboard.html', title=title, leaderboard_data=leaderboard_data, current_sort=sort_by)
 
@@ -217,14 +195,17 @@ def announcements_history():
     conn, all_announcements = get_db_connection(), []
     try:
         cursor = conn.cursor(dictionary=True)
-        sql, params = "SELECT Title, Content, CreatedAt, Priority, Audience FROM SystemAnnouncements WHERE IsActive = 1", []
-        if search_query:
-            sql += " AND (Title LIKE %s OR Content LIKE %s)"; params.extend([f"%{search_query}%", f"%{search_query}%"])
+        sql, params = "SELECT AnnouncementID, Title, Content, CreatedAt, Priority, Audience FROM SystemAnnouncements WHERE IsActive = 1", []
+        ranked_ids = search('announcements', search_query, conn=conn) if search_query else None
+        if ranked_ids is not None:
+            sql += f" AND AnnouncementID IN ({', '.join(['%s'] * len(ranked_ids)) or 'NULL'})"; params.extend(ranked_ids)
         if filter_priority:
             sql += " AND Priority = %s"; params.append(filter_priority)
         sql += " ORDER BY CreatedAt DESC"
         cursor.execute(sql, tuple(params))
         all_announcements = cursor.fetchall()
+        if ranked_ids is not None:
+            all_announcements = order_by_rank(all_announcements, ranked_ids, 'AnnouncementID')
     except Exception as e:
         current_app.logger.error(f"Error fetching announcements history: {e}", exc_info=True)
         flash("Could not load the announcements history.", "danger")
@@ -3,6 +3,9 @@ from flask import Blueprint, abort, render_template, flash, redirect, url_for, c
 from flask_login import current_user
 from utils.decorators import login_required_with_role
 from db import get_db_connection
+from utils.org_hierarchy import invalidate_org_hierarchy
+from utils.identity_cache import invalidate_user_identity, clear_identity_cache
+from utils.referral_stats import get_referral_stats
 
 # --- ROLE CONSTANTS ---
 RECRUITER_PORTAL_ROLES = ['SourcingRecruiter', 'SourcingTeamLead', 'HeadSourcingTeamLead', 'UnitManager', 'HeadUnitManager', 'CEO', 'Founder']
@@ -17,12 +20,12 @@ organization_bp = Blueprint('organization_bp', __name__,
                               template_folder='../../../templates')
 
 # --- Helper Functions (can be moved to a utils file later if needed) ---
-def _get_performance_stats(cursor, staff_id):
-    cursor.execute("SELECT COUNT(*) as count FROM JobApplications WHERE ReferringStaffID = %s AND Status = 'Hired'", (staff_id,))
-    hires = cursor.fetchone()['count']
-    cursor.execute("SELECT COUNT(*) as count FROM JobApplications WHERE ReferringStaffID = %s", (staff_id,))
-    referrals = cursor.fetchone()['count']
-    return hires, referrals
+def _attach_performance_stats(cursor, team_members):
+    """Adds all-time hires/referrals to every member using one grouped query."""
+    stats = get_referral_stats(cursor, [member['StaffID'] for member in team_members])
+    for member in team_members:
+        member_stats = stats.get(member['StaffID'], {'hires': 0, 'referrals': 0})
+        member['total_hires'], member['total_referrals'] = member_stats['hires'], member_stats['referrals']
 
 def _get_manager_context_data(cursor, user):
     context = {"teams_in_unit": [], "potential_team_leads": [], "unassigned_recruiters": [], "assignable_teams": []}
@@ -91,8 +94,8 @@ def my_team_view():
         elif leader_role == 'SourcingTeamLead':
             cursor.execute("SELECT s.StaffID, u.FirstName, u.LastName, s.Role, u.IsActive, u.ProfilePictureURL FROM Staff s JOIN Users u ON s.UserID = u.UserID WHERE s.TeamID = (SELECT TeamID FROM Staff WHERE StaffID = %s) AND s.StaffID != %s AND u.IsActive = 1", (leader_staff_id, leader_staff_id))
         team_members = cursor.fetchall()
+        _attach_performance_stats(cursor, team_members)
         for member in team_members:
-            member['total_hires'], member['total_referrals'] = _get_performance_stats(cursor, member['StaffID'])
             member['direct_reports_count'] = 1 if member['Role'] in ['UnitManager', 'SourcingTeamLead'] else 0
     finally:
         if cursor: cursor.close()
@@ -114,8 +117,8 @@ def team_view(leader_staff_id):
         elif leader_role == 'SourcingTeamLead':
             cursor.execute("SELECT s.StaffID, u.FirstName, u.LastName, s.Role, u.IsActive, u.ProfilePictureURL FROM Staff s JOIN Users u ON s.UserID = u.UserID WHERE s.TeamID = (SELECT TeamID FROM Staff WHERE StaffID = %s) AND s.StaffID != %s AND u.IsActive = 1", (leader_staff_id, leader_staff_id))
         team_members = cursor.fetchall()
+        _attach_performance_stats(cursor, team_members)
         for member in team_members:
-            member['total_hires'], member['total_referrals'] = _get_performance_stats(cursor, member['StaffID'])
             member['direct_reports_count'] = 1 if member['Role'] in ['UnitManager', 'SourcingTeamLead'] else 0
     finally:
         if cursor: cursor.close()
@@ -288,7 +291,7 @@ def assign_unit_manager():
         cursor = conn.cursor()
         cursor.execute("UPDATE SourcingUnits SET UnitManagerStaffID = %s WHERE UnitID = %s", (manager_staff_id, unit_id))
         cursor.execute("UPDATE Staff SET Role = 'UnitManager', TeamID = NULL, ReportsToStaffID = %s WHERE StaffID = %s", (current_user.specific_role_id, manager_staff_id))
-        conn.commit(); flash("Unit Manager assigned successfully.", "success")
+        conn.commit(); invalidate_user_identity(staff_id=manager_staff_id); invalidate_org_hierarchy(); flash("Unit Manager assigned successfully.", "success")
     except Exception as e: flash(f"Error assigning manager: {e}", "danger")
     finally: conn.close()
     return redirect(url_for('organization_bp.list_units'))
@@ -315,6 +318,8 @@ def assign_team_lead():
             cursor.execute("UPDATE Staff SET ReportsToStaffID = NULL WHERE StaffID = %s", (lead_staff_id,))
             flash("Team Lead assigned successfully. Note: The team is not in a managed unit, so no manager was set.", "info")
         conn.commit()
+        invalidate_user_identity(staff_id=lead_staff_id)
+        invalidate_org_hierarchy()
     except Exception as e:
         conn.rollback(); current_app.logger.error(f"Error assigning team lead: {e}"); flash(f"Error assigning team lead: {e}", "danger")
     finally: conn.close()
@@ -339,7 +344,7 @@ def assign_recruiter_to_team():
         team = cursor.fetchone()
         if not team or not team['TeamLeadStaffID']: flash("Cannot assign recruiter. The selected team does not have a lead.", "warning"); return redirect(request.referrer)
         cursor.execute("UPDATE Staff SET TeamID = %s, ReportsToStaffID = %s WHERE StaffID = %s", (team_id, team['TeamLeadStaffID'], recruiter_staff_id))
-        conn.commit(); flash("Recruiter successfully assigned to team.", "success")
+        conn.commit(); invalidate_user_identity(staff_id=recruiter_staff_id); invalidate_org_hierarchy(); flash("Recruiter successfully assigned to team.", "success")
     except Exception as e:
         current_app.logger.error(f"Error assigning recruiter to team: {e}"); flash(f"Error assigning recruiter: {e}", "danger")
     finally: conn.close()
@@ -359,6 +364,8 @@ def deactivate_unit(unit_id):
             cursor.execute(f"UPDATE SourcingTeams SET TeamLeadStaffID = NULL, IsActive = 0 WHERE TeamID IN ({placeholders})", tuple(team_ids))
             cursor.execute(f"UPDATE Staff SET TeamID = NULL, ReportsToStaffID = NULL WHERE TeamID IN ({placeholders})", tuple(team_ids))
         conn.commit()
+        clear_identity_cache()
+        invalidate_org_hierarchy()
         flash("Unit has been deactivated. All associated teams and staff assignments have been cleared.", "success")
     except Exception as e:
         conn.rollback(); current_app.logger.error(f"Error deactivating unit {unit_id}: {e}", exc_info=True); flash(f"Error deactivating unit: {e}", "danger")
@@ -407,6 +414,8 @@ def remove_recruiter_from_team(team_id):
         # Perform the update
         cursor.execute("UPDATE Staff SET TeamID = NULL, ReportsToStaffID = NULL WHERE StaffID = %s AND TeamID = %s", (recruiter_staff_id, team_id))
         conn.commit()
+        invalidate_user_identity(staff_id=recruiter_staff_id)
+        invalidate_org_hierarchy()
         flash("Recruiter has been successfully removed from the team.", "success")
 
     except Exception as e:
@@ -490,6 +499,8 @@ def delete_unit(unit_id):
         # Finally, delete the unit
         cursor.execute("DELETE FROM SourcingUnits WHERE UnitID = %s", (unit_id,))
         conn.commit()
+        clear_identity_cache()
+        invalidate_org_hierarchy()
         flash("Unit and all its associated teams have been permanently deleted.", "success")
     except Exception as e:
         conn.rollback()
@@ -535,6 +546,8 @@ def delete_team(team_id):
         # Delete the team
         cursor.execute("DELETE FROM SourcingTeams WHERE TeamID = %s", (team_id,))
         conn.commit()
+        clear_identity_cache()
+        invalidate_org_hierarchy()
         flash("Team has been permanently deleted.", "success")
 
     except Exception as e:
@@ -571,6 +584,8 @@ def deactivate_team(team_id):
         cursor.execute("UPDATE SourcingTeams SET TeamLeadStaffID = NULL, IsActive = 0 WHERE TeamID = %s", (team_id,))
         cursor.execute("UPDATE Staff SET TeamID = NULL, ReportsToStaffID = NULL WHERE TeamID = %s", (team_id,))
         conn.commit()
+        clear_identity_cache()
+        invalidate_org_hierarchy()
         flash("Team has been deactivated. All staff assignments have been cleared.", "success")
     except Exception as e:
         conn.rollback()
@@ -4,6 +4,10 @@ from flask import Blueprint, abort, render_template, flash, redirect, url_for, c
 from flask_login import current_user
 from utils.decorators import login_required_with_role
 from db import get_db_connection
+from utils.identity_cache import invalidate_user_identity
+from utils.referral_stats import get_staff_referral_stats
+from utils.search import search, order_by_rank
+from utils.org_hierarchy import is_ancestor, invalidate_org_hierarchy
 
 # --- ROLE CONSTANTS ---
 LEADER_ROLES_IN_PORTAL = ['SourcingTeamLead', 'HeadSourcingTeamLead', 'UnitManager', 'HeadUnitManager', 'CEO', 'Founder']
@@ -18,32 +22,12 @@ staff_bp = Blueprint('staff_bp', __name__,
 
 def _get_performance_stats(cursor, staff_id):
     """Fetches all-time hires and referrals for a staff member."""
-    cursor.execute("SELECT COUNT(*) as count FROM JobApplications WHERE ReferringStaffID = %s AND Status = 'Hired'", (staff_id,))
-    hires = cursor.fetchone()['count']
-    cursor.execute("SELECT COUNT(*) as count FROM JobApplications WHERE ReferringStaffID = %s", (staff_id,))
-    referrals = cursor.fetchone()['count']
+    stats = get_staff_referral_stats(cursor, staff_id)
     return {
-        'hires_all_time': hires,
-        'referrals_all_time': referrals
+        'hires_all_time': stats['hires'],
+        'referrals_all_time': stats['referrals']
     }
 
-def _is_subordinate(cursor, manager_staff_id, subordinate_staff_id):
-    """
-    Checks if a staff member is a subordinate of a manager by traversing the reporting hierarchy.
-    """
-    if not manager_staff_id or not subordinate_staff_id or str(manager_staff_id) == str(subordinate_staff_id):
-        return False
-    query = """
-        WITH RECURSIVE SubordinateHierarchy AS (
-            SELECT StaffID FROM Staff WHERE ReportsToStaffID = %s
-            UNION ALL
-            SELECT s.StaffID FROM Staff s INNER JOIN SubordinateHierarchy sh ON s.ReportsToStaffID = sh.StaffID
-        )
-        SELECT 1 FROM SubordinateHierarchy WHERE StaffID = %s;
-    """
-    cursor.execute(query, (manager_staff_id, subordinate_staff_id))
-    return cursor.fetchone() is not None
-
 @staff_bp.route('/manage-recruiters')
 @login_required_with_role(LEADER_ROLES_IN_PORTAL)
 def manage_recruiters():
@@ -71,10 +55,10 @@ def manage_recruiters():
         """
         params = list(MANAGEABLE_RECRUITER_ROLES)
         
-        if search_query:
-            sql += " AND (u.FirstName LIKE %s OR u.LastName LIKE %s OR u.Email LIKE %s)"
-            like_query = f"%{search_query}%"
-            params.extend([like_query, like_query, like_query])
+        ranked_ids = search('staff', search_query, conn=conn) if search_query else None
+        if ranked_ids is not None:
+            sql += f" AND s.StaffID IN ({', '.join(['%s'] * len(ranked_ids)) or 'NULL'})"
+            params.extend(ranked_ids)
         
         if filter_role:
             sql += " AND s.Role = %s"
@@ -88,6 +72,8 @@ def manage_recruiters():
         sql += " ORDER BY u.FirstName, u.LastName"
         cursor.execute(sql, tuple(params))
         recruiters = cursor.fetchall()
+        if ranked_ids is not None:
+            recruiters = order_by_rank(recruiters, ranked_ids, 'StaffID')
 
     except Exception as e:
         current_app.logger.error(f"Error fetching recruiters list: {e}", exc_info=True)
@@ -131,7 +117,7 @@ def view_recruiter_profile(staff_id_viewing):
         is_top_level = current_user.role_type in TOP_LEVEL_MANAGEMENT
         is_own_profile = (str(staff_id_viewing) == str(viewer_staff_id))
         is_direct_manager = (str(profile_info['ReportsToStaffID']) == str(viewer_staff_id))
-        is_indirect_manager = not is_direct_manager and _is_subordinate(cursor, viewer_staff_id, staff_id_viewing)
+        is_indirect_manager = not is_direct_manager and is_ancestor(viewer_staff_id, staff_id_viewing)
         
         if not (is_own_profile or is_direct_manager or is_indirect_manager or is_top_level):
             abort(403)
@@ -200,7 +186,7 @@ def assign_points():
         if not subordinate: flash("Staff member not found.", "danger"); return redirect(url_for('staff_bp.manage_recruiters'))
         
         is_authorized = (manager_role in TOP_LEVEL_MANAGEMENT) or \
-                        (manager_role == 'UnitManager' and _is_subordinate(cursor, manager_staff_id, staff_id_to_reward)) or \
+                        (manager_role == 'UnitManager' and is_ancestor(manager_staff_id, staff_id_to_reward)) or \
                         (manager_role == 'SourcingTeamLead' and str(subordinate['ReportsToStaffID']) == str(manager_staff_id) and subordinate['Role'] == 'SourcingRecruiter')
         
         if not is_authorized:
@@ -271,6 +257,8 @@ def activate_staff_member():
         cursor.execute("UPDATE Users u JOIN Staff s ON u.UserID = s.UserID SET u.AccountStatus = 'Active' WHERE s.StaffID = %s", (staff_id,))
         if cursor.rowcount > 0:
             conn.commit()
+            invalidate_user_identity(staff_id=staff_id)
+            invalidate_org_hierarchy()
             flash("Staff member has been activated.", "success")
         else:
             flash("Staff member not found or no change was needed.", "warning")
@@ -296,6 +284,8 @@ def deactivate_staff():
         cursor.execute("UPDATE Users u JOIN Staff s ON u.UserID = s.UserID SET u.AccountStatus = 'Inactive' WHERE s.StaffID = %s", (staff_id,))
         cursor.execute("UPDATE Staff SET TeamID = NULL, ReportsToStaffID = NULL WHERE StaffID = %s", (staff_id,))
         conn.commit()
+        invalidate_user_identity(staff_id=staff_id)
+        invalidate_org_hierarchy()
         flash("Staff member has been deactivated.", "success")
     except Exception as e:
         flash(f"Error deactivating staff member: {e}", "danger")
@@ -323,7 +313,7 @@ def change_staff_role():
     try:
         cursor = conn.cursor()
         is_authorized = (current_user.role_type in TOP_LEVEL_MANAGEMENT) or \
-                        (manager_staff_id and _is_subordinate(cursor, manager_staff_id, staff_id_to_change))
+                        (manager_staff_id and is_ancestor(manager_staff_id, staff_id_to_change))
         
         if not is_authorized:
             flash("You are not authorized to modify this staff member's role.", "danger")
@@ -331,6 +321,8 @@ def change_staff_role():
 
         cursor.execute("UPDATE Staff SET Role = %s WHERE StaffID = %s", (new_role, staff_id_to_change))
         conn.commit()
+        invalidate_user_identity(staff_id=staff_id_to_change)
+        invalidate_org_hierarchy()
         flash(f"Role successfully updated to '{new_role}'.", "success")
     except Exception as e:
         conn.rollback()
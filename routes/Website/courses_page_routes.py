@@ -2,25 +2,14 @@
 from flask import Blueprint, render_template, current_app, flash, request, url_for, redirect
 from flask_login import current_user, login_required
 from db import get_db_connection
+from utils.package_catalog import get_public_package_catalog
+from utils.candidate_context import get_candidate_id
 import mysql.connector
 
 # This blueprint will handle public-facing pages like Home, About, Courses, etc.
 courses_page_bp = Blueprint('courses_page_bp', __name__,
                             template_folder='../../../templates')
 
-# Helper function to get CandidateID from UserID (remains unchanged)
-def get_candidate_id(user_id):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor(dictionary=True) # Using dictionary=True for consistency
-        cursor.execute("SELECT CandidateID FROM Candidates WHERE UserID = %s", (user_id,))
-        result = cursor.fetchone()
-        return result['CandidateID'] if result else None
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
-
 # --- Route to display new Package structure (Unchanged) ---
 @courses_page_bp.route('/courses')
 def view_packages():
@@ -29,41 +18,13 @@ def view_packages():
     and passes the structured data to the courses_page.html template.
     """
     main_packages = []
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor(dictionary=True)
-        # 1. Fetch all active MainPackages
-        cursor.execute("SELECT * FROM MainPackages WHERE IsActive = TRUE ORDER BY Name")
-        main_packages = cursor.fetchall()
-
-        # 2. For each package, fetch its languages and active sub-packages
-        for package in main_packages:
-            # Fetch languages for this package
-            cursor.execute("""
-                SELECT l.LanguageName 
-                FROM MainPackageLanguages mpl
-                JOIN Languages l ON mpl.LanguageID = l.LanguageID
-                WHERE mpl.PackageID = %s
-            """, (package['PackageID'],))
-            languages_raw = cursor.fetchall()
-            package['languages'] = [lang['LanguageName'] for lang in languages_raw]
-
-            # Fetch its active sub-packages (the items candidates can apply for)
-            cursor.execute("""
-                SELECT * FROM SubPackages 
-                WHERE MainPackageID = %s AND IsActive = TRUE 
-                ORDER BY DisplayOrder, Name
-            """, (package['PackageID'],))
-            package['sub_packages'] = cursor.fetchall()
-            
+        # Served from the per-worker catalog cache; see utils/package_catalog.py
+        main_packages = get_public_package_catalog()
     except Exception as e:
         current_app.logger.error(f"Error fetching public packages page data: {e}", exc_info=True)
         flash("Could not load course information at this time. Please try again later.", "warning")
         main_packages = [] # Ensure it's an empty list on error
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
             
     return render_template('Website/courses_page.html', 
                            title="Our Programs & Courses",
@@ -130,7 +91,7 @@ def submit_package_application(sub_package_id):
         flash("Only candidates can submit applications.", "danger")
         return redirect(url_for('.view_packages'))
         
-    candidate_id = get_candidate_id(current_user.id)
+    candidate_id = get_candidate_id()
     if not candidate_id:
         flash("Your candidate profile could not be found. Please complete your profile first.", "danger")
         return redirect(url_for('candidate_bp.dashboard'))
@@ -2,8 +2,13 @@
 from flask import Blueprint, render_template, request, current_app, flash, url_for, redirect, jsonify
 from flask_login import login_required, current_user
 from db import get_db_connection
+from utils.leaderboard import record_application_created
+from utils.job_eligibility import get_eligible_offer_ids
+from utils.search import search, order_by_rank
+from utils.candidate_context import get_candidate_id, get_candidate_profile
 import datetime
 from utils.directory_configs import save_file_from_config
+from utils.upload_storage import release_upload
 from werkzeug.utils import secure_filename
 
 job_board_bp = Blueprint('job_board_bp', __name__,
@@ -31,76 +36,43 @@ def job_offers_list():
     if role_redirect:
         return role_redirect
 
+    # The filter fields come from the cached login identity, not a Candidates query.
+    candidate_profile = get_candidate_profile()
+    if not candidate_profile:
+        flash("Your candidate profile could not be found. Please complete your profile to see relevant jobs.", "danger")
+        return redirect(url_for('candidate_bp.dashboard'))
+
     conn = get_db_connection()
     job_offers_list = []
-    candidate_profile = None
     search_term = request.args.get('q', '').strip()
     
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT Nationality, Languages, LanguageLevel, EducationalStatus, Gender FROM Candidates WHERE UserID = %s", (current_user.id,))
-        candidate_profile = cursor.fetchone()
-        
-        if not candidate_profile:
-            flash("Your candidate profile could not be found. Please complete your profile to see relevant jobs.", "danger")
-            return redirect(url_for('candidate_bp.dashboard'))
-
-        base_sql = """
-            SELECT jo.OfferID, jo.Title, jo.Location, jo.WorkLocationType, jo.RequiredLevel,
-                   jo.NetSalary, jo.DatePosted, c.CompanyName, c.CompanyLogoURL, jc.CategoryName
-            FROM JobOffers jo
-            JOIN Companies c ON jo.CompanyID = c.CompanyID
-            LEFT JOIN JobCategories jc ON jo.CategoryID = jc.CategoryID
-            WHERE jo.Status = 'Open' AND (jo.ClosingDate IS NULL OR jo.ClosingDate >= CURDATE())
-        """
-        params = []
-        conditions = []
-
-        candidate_gender = candidate_profile.get('Gender')
-        if candidate_gender in ['Male', 'Female']:
-            conditions.append("jo.Gender IN ('Both', %s)")
-            params.append(candidate_gender)
-        else:
-            conditions.append("jo.Gender = 'Both'")
-
-        candidate_nationality = candidate_profile.get('Nationality')
-        if candidate_nationality == 'Egyptian':
-            conditions.append("jo.Nationality IN ('Egyptians Only', 'Foreigners & Egyptians')")
-        elif candidate_nationality == 'Foreigner':
-            conditions.append("jo.Nationality = 'Foreigners & Egyptians'")
-
-        candidate_langs = candidate_profile.get('Languages', [])
-        if candidate_langs:
-            lang_conditions = [ "FIND_IN_SET(%s, jo.RequiredLanguages)" for _ in candidate_langs ]
-            params.extend(list(candidate_langs))
-            if lang_conditions:
-                 conditions.append(f"({' OR '.join(lang_conditions)})")
-
-        candidate_level = candidate_profile.get('LanguageLevel')
-        if candidate_level:
-            level_map_sql = "CASE jo.RequiredLevel WHEN 'C2' THEN 6 WHEN 'C1' THEN 5 WHEN 'B2+' THEN 4 WHEN 'B2' THEN 3 WHEN 'B1+' THEN 2 WHEN 'B1' THEN 1 ELSE 0 END"
-            candidate_level_map = {'C2': 6, 'C1': 5, 'B2+': 4, 'B2': 3, 'B1+': 2, 'B1': 1}
-            candidate_level_value = candidate_level_map.get(candidate_level, 0)
-            conditions.append(f"({level_map_sql} <= %s)")
-            params.append(candidate_level_value)
-
-        edu_status = candidate_profile.get('EducationalStatus')
-        if edu_status:
-             conditions.append("FIND_IN_SET(%s, jo.GraduationStatusRequirement)")
-             params.append(edu_status)
-
+        # Eligibility (gender, nationality, languages, level, education) is answered
+        # by the in-memory bitset index; SQL only fetches the matching rows by key.
+        eligible_ids = get_eligible_offer_ids(candidate_profile, conn)
+        ranked_ids = None
         if search_term:
-            conditions.append("(jo.Title LIKE %s OR c.CompanyName LIKE %s)")
-            search_like = f"%{search_term}%"
-            params.extend([search_like, search_like])
-        
-        sql = base_sql
-        if conditions:
-            sql += " AND " + " AND ".join(conditions)
-        sql += " ORDER BY jo.DatePosted DESC"
-        
-        cursor.execute(sql, tuple(params))
-        job_offers_list = cursor.fetchall()
+            ranked_ids = search('job_offers', search_term, conn=conn)
+            matching = set(ranked_ids)
+            eligible_ids = [offer_id for offer_id in eligible_ids if offer_id in matching]
+
+        if eligible_ids:
+            placeholders = ', '.join(['%s'] * len(eligible_ids))
+            sql = f"""
+                SELECT jo.OfferID, jo.Title, jo.Location, jo.WorkLocationType, jo.RequiredLevel,
+                       jo.NetSalary, jo.DatePosted, c.CompanyName, c.CompanyLogoURL, jc.CategoryName
+                FROM JobOffers jo
+                JOIN Companies c ON jo.CompanyID = c.CompanyID
+                LEFT JOIN JobCategories jc ON jo.CategoryID = jc.CategoryID
+                WHERE jo.OfferID IN ({placeholders})
+                  AND jo.Status = 'Open' AND (jo.ClosingDate IS NULL OR jo.ClosingDate >= CURDATE())
+                ORDER BY jo.DatePosted DESC
+            """
+            cursor.execute(sql, tuple(eligible_ids))
+            job_offers_list = cursor.fetchall()
+            if ranked_ids is not None:
+                job_offers_list = order_by_rank(job_offers_list, ranked_ids, 'OfferID')
         
     except Exception as e:
         current_app.logger.error(f"Error fetching personalized job offers for UserID {current_user.id}: {e}", exc_info=True)
@@ -298,7 +270,8 @@ def validate_referral_code_api():
 @job_board_bp.route('/offer/<int:offer_id>/submit', methods=['POST'])
 @login_required
 def submit_application_form(offer_id):
-    if not (hasattr(current_user, 'role_type') and current_user.role_type == 'Candidate'):
+    candidate_id = get_candidate_id()
+    if not candidate_id:
         return jsonify({'status': 'error', 'message': 'Access denied: Only candidates can apply.'}), 403
     
     full_name = request.form.get('full_name', '').strip()
@@ -342,24 +315,30 @@ def submit_application_form(offer_id):
         conn.start_transaction()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT CandidateID FROM Candidates WHERE UserID = %s", (current_user.id,))
-        candidate_id = cursor.fetchone()[0]
-        
         allowed_cv_extensions = {'pdf', 'doc', 'docx'}
         allowed_voice_extensions = {'mp3', 'm4a', 'wav', 'webm', 'ogg', 'mp4'}
 
-        cv_db_path = save_file_from_config(cv_file, f'candidate_cvs/{candidate_id}', allowed_extensions=allowed_cv_extensions)
-        voice_note_db_path = save_file_from_config(voice_note_file, f'candidate_applications/voice/{candidate_id}', allowed_extensions=allowed_voice_extensions)
+        cv_db_path = save_file_from_config(cv_file, f'candidate_cvs/{candidate_id}', allowed_extensions=allowed_cv_extensions, conn=conn)
+        voice_note_db_path = save_file_from_config(voice_note_file, f'candidate_applications/voice/{candidate_id}', allowed_extensions=allowed_voice_extensions, conn=conn)
 
         if not cv_db_path or not voice_note_db_path:
              raise Exception("Failed to save one or more files.")
         
+        application_date = datetime.datetime.now()
         cursor.execute("INSERT INTO JobApplications (OfferID, CandidateID, ApplicationDate, Status, NotesByCandidate, ReferringStaffID, ReferringStaffTeamLeadID) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                       (offer_id, candidate_id, datetime.datetime.now(), 'Submitted', candidate_questions, referring_staff_id, referring_staff_team_lead_id))
+                       (offer_id, candidate_id, application_date, 'Submitted', candidate_questions, referring_staff_id, referring_staff_team_lead_id))
+        record_application_created(conn, referring_staff_id, 'Submitted', application_date)
         
+        # Re-submitting a CV the candidate already has (same content) reuses that row.
         cursor.execute("UPDATE CandidateCVs SET IsPrimary = 0 WHERE CandidateID = %s", (candidate_id,))
-        cursor.execute("INSERT INTO CandidateCVs (CandidateID, CVFileUrl, OriginalFileName, IsPrimary, CVTitle) VALUES (%s, %s, %s, 1, %s)",
-                       (candidate_id, cv_db_path, secure_filename(cv_file.filename), f"CV for Offer {offer_id}"))
+        cursor.execute("SELECT CVID FROM CandidateCVs WHERE CandidateID = %s AND CVFileUrl = %s LIMIT 1", (candidate_id, cv_db_path))
+        existing_cv = cursor.fetchone()
+        if existing_cv:
+            cursor.execute("UPDATE CandidateCVs SET IsPrimary = 1 WHERE CVID = %s", (existing_cv[0],))
+            release_upload(cv_db_path, conn)
+        else:
+            cursor.execute("INSERT INTO CandidateCVs (CandidateID, CVFileUrl, OriginalFileName, IsPrimary, CVTitle) VALUES (%s, %s, %s, 1, %s)",
+                           (candidate_id, cv_db_path, secure_filename(cv_file.filename), f"CV for Offer {offer_id}"))
         
         cursor.execute("INSERT INTO CandidateVoiceNotes (CandidateID, VoiceNoteURL, Title, Purpose) VALUES (%s, %s, %s, %s)",
                        (candidate_id, voice_note_db_path, secure_filename(voice_note_file.filename), "Job Application"))
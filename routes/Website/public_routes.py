@@ -1,6 +1,7 @@
 # routes/public_routes.py
 from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, session
 from db import get_db_connection
+from utils.public_content import anonymous_page_cache, get_recent_open_offers, skip_page_cache
 import datetime
 import mysql.connector
 
@@ -9,29 +10,15 @@ public_routes_bp = Blueprint('public_routes_bp', __name__,
 
 # === HOMEPAGE ROUTE ===
 @public_routes_bp.route('/')
+@anonymous_page_cache
 def home_page():
     current_app.logger.info(f"Accessing homepage. Current theme: {session.get('theme', current_app.config.get('DEFAULT_THEME', 'light'))}")
     recent_jobs = []
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                jo.OfferID, jo.Title, c.CompanyName, jo.Location 
-            FROM JobOffers jo 
-            JOIN Companies c ON jo.CompanyID = c.CompanyID
-            WHERE jo.Status = 'Open' AND (jo.ClosingDate IS NULL OR jo.ClosingDate >= CURDATE())
-            ORDER BY  jo.DatePosted DESC 
-            LIMIT 3 
-        """)
-        recent_jobs = cursor.fetchall()
+        recent_jobs = get_recent_open_offers(limit=3)
     except Exception as e:
         current_app.logger.error(f"Error fetching recent jobs for homepage: {e}", exc_info=True)
-    finally:
-        if conn and conn.is_connected():
-            if 'cursor' in locals() and cursor: cursor.close()
-            conn.close()
+        skip_page_cache()
     
     return render_template('Website/home.html', recent_jobs=recent_jobs, title="Welcome to Mosla Pioneers")
 
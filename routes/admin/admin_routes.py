@@ -6,10 +6,10 @@ import os
 import subprocess
 import json
 from functools import wraps
-import psutil
 from flask import Blueprint, render_template, request, abort, current_app, Response, jsonify
 from flask_login import login_required, current_user
-from db import get_db_connection
+from db import get_db_connection, get_pool_stats
+from utils.telemetry import get_telemetry_stats
 
 admin_bp = Blueprint('admin_bp', __name__, template_folder='../../templates/admin', url_prefix='/admin')
 
@@ -44,6 +44,7 @@ def get_bandwidth_usage():
         return {"error": "Could not retrieve vnstat data."}
 
 def get_system_performance():
+    import psutil  # only the admin dashboard needs it; imported on first use, not at worker boot
     memory = psutil.virtual_memory()
     net_io = psutil.net_io_counters()
     boot_time_timestamp = psutil.boot_time()
@@ -61,6 +62,7 @@ def get_system_performance():
     }
 
 def get_service_stats(service_names):
+    import psutil
     stats = {name: {'status': 'Stopped', 'cpu': 0, 'memory': 0} for name in service_names.keys()}
     for proc in psutil.process_iter(['name', 'cpu_percent', 'memory_info']):
         for display_name, process_name in service_names.items():
@@ -134,6 +136,20 @@ def system_stats_api():
         'bandwidth': get_bandwidth_usage()
     })
 
+@admin_bp.route('/db-pool-stats')
+@login_required
+@admin_required
+def db_pool_stats_api():
+    """Connection pool counters for this worker process (checkouts, reuse, exhaustion)."""
+    return jsonify({'pid': os.getpid(), 'pool': get_pool_stats()})
+
+@admin_bp.route('/telemetry-stats')
+@login_required
+@admin_required
+def telemetry_stats_api():
+    """Write-behind counters for LoginHistory/AuditLog/ErrorLog in this worker (queued, written, dropped, failed)."""
+    return jsonify(get_telemetry_stats())
+
 @admin_bp.route('/app-activity-stats')
 @login_required
 @admin_required
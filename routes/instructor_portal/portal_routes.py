@@ -3,6 +3,8 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import current_user
 from utils.decorators import instructor_required
 from utils.logging_utils import log_audit
+from utils.bulk_writes import diff_rows, bulk_update, normalize_number, normalize_text
+from utils.group_utils import parse_grid_form, save_attendance_grid, start_session_backfill, get_session_backfill_status
 from db import get_db_connection
 import uuid
 import mysql.connector
@@ -428,15 +430,17 @@ def grade_assessment(assessment_id):
             return redirect(url_for('.my_groups'))
 
         if request.method == 'POST':
-            for key, value in request.form.items():
-                if key.startswith('score_'):
-                    submission_id = key.split('_')[1]
-                    score = value or None
-                    feedback = request.form.get(f'feedback_{submission_id}', '')
-                    sql_update = "UPDATE CandidateSubmissions SET Score = %s, InstructorFeedback = %s, Status = 'Graded', GradedAt = NOW() WHERE SubmissionID = %s"
-                    cursor.execute(sql_update, (score, feedback, submission_id))
+            # Only submissions of this assessment are diffed, and only changed or not-yet-graded ones are written.
+            cursor.execute("SELECT SubmissionID, Score, InstructorFeedback, Status FROM CandidateSubmissions WHERE AssessmentID = %s", (assessment_id,))
+            current = {(row['SubmissionID'],): (row['Score'], row['InstructorFeedback'], row['Status']) for row in cursor.fetchall()}
+            submitted = {}
+            for (submission_id,), score in parse_grid_form(request.form, 'score').items():
+                submitted[(submission_id,)] = (score or None, request.form.get(f'feedback_{submission_id}', ''), 'Graded')
+            changes = diff_rows(current, submitted, (normalize_number, normalize_text, normalize_text))
+            graded = bulk_update(cursor, 'CandidateSubmissions', ('SubmissionID',), ('Score', 'InstructorFeedback', 'Status'),
+                                 changes, extra_assignments="t.GradedAt = NOW()")
             conn.commit()
-            log_audit('GRADE_ASSESSMENT', 'GroupAssessment', assessment_id, "Grades updated for assessment.")
+            log_audit('GRADE_ASSESSMENT', 'GroupAssessment', assessment_id, f"Grades updated for assessment ({graded} submission(s) changed).")
             flash("Grades saved successfully!", "success")
             return redirect(url_for('.grade_assessment', assessment_id=assessment_id))
 
@@ -510,16 +514,9 @@ def update_attendance(group_id):
             flash("You are not authorized to update this group's attendance.", "danger")
             return redirect(url_for('.my_groups'))
 
-        for key, value in request.form.items():
-            if key.startswith('status_'):
-                _, session_id, enrollment_id = key.split('_')
-                new_status = value
-                attendance_notes = request.form.get(f'attendance_notes_{session_id}_{enrollment_id}', '')
-                performance_notes = request.form.get(f'performance_notes_{session_id}_{enrollment_id}', '')
-                cursor.execute("UPDATE SessionAttendance SET Status = %s, AttendanceNotes = %s, PerformanceNotes = %s WHERE SessionID = %s AND EnrollmentID = %s", (new_status, attendance_notes, performance_notes, session_id, enrollment_id))
-        
+        changed = save_attendance_grid(cursor, group_id, request.form)
         conn.commit()
-        log_audit('UPDATE_ATTENDANCE', 'CourseGroup', group_id, f"Attendance updated for group {group_id}.")
+        log_audit('UPDATE_ATTENDANCE', 'CourseGroup', group_id, f"Attendance updated for group {group_id} ({changed} record(s) changed).")
         flash("Attendance updated successfully!", "success")
     except Exception as e:
         if conn and conn.is_connected(): conn.rollback()
@@ -533,18 +530,30 @@ def update_attendance(group_id):
 @instructor_portal_bp.route('/utility/sync-sessions', methods=['GET', 'POST'])
 @instructor_required
 def sync_sessions_utility():
-    from utils.group_utils import sync_sessions_for_groups
     if request.method == 'POST':
         try:
-            message, category = sync_sessions_for_groups()
-            log_audit('SYNC_SESSIONS', 'System', None, f"Session sync utility run. Result: {message}")
-            flash(message, category)
+            run_id, started = start_session_backfill(current_user.id)
+            if started:
+                log_audit('SYNC_SESSIONS', 'System', None, f"Session sync run #{run_id} started.")
+                flash(f"Session sync #{run_id} started in the background. Progress is shown below.", "info")
+            else:
+                flash(f"Session sync #{run_id} is already running.", "warning")
         except Exception as e:
-            current_app.logger.error(f"Error running sync_sessions_for_groups utility: {e}", exc_info=True)
-            flash("A critical error occurred during the session sync.", "danger")
-        return redirect(url_for('.my_groups'))
+            current_app.logger.error(f"Error starting the session sync utility: {e}", exc_info=True)
+            flash("A critical error occurred while starting the session sync.", "danger")
+        return redirect(url_for('.sync_sessions_utility'))
     return render_template('instructor_portal/sync_sessions_utility.html', title="Sync Group Sessions")
 
+@instructor_portal_bp.route('/utility/sync-sessions/status')
+@instructor_required
+def sync_sessions_status():
+    """JSON progress of the latest (or ?run_id=) session sync run."""
+    try:
+        return jsonify(run=get_session_backfill_status(request.args.get('run_id', type=int)))
+    except Exception as e:
+        current_app.logger.error(f"Could not load session sync status: {e}", exc_info=True)
+        return jsonify(error="Could not load the sync status."), 500
+
 @instructor_portal_bp.route('/my-placements')
 @instructor_required
 def my_placements():
@@ -0,0 +1,72 @@
+# utils/bulk_writes.py
+import decimal
+import os
+
+# Grid-style forms (attendance, grading) post every cell on every save. These
+# helpers compare the submission with what is stored and write only the rows
+# that changed, several rows per statement.
+BULK_WRITE_CHUNK_SIZE = int(os.getenv('BULK_WRITE_CHUNK_SIZE', 200))
+
+
+def normalize_text(value):
+    """Text comparison: '' equals NULL, surrounding whitespace is ignored, nothing else is coerced."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def normalize_number(value):
+    """Numeric comparison: '' equals NULL, '85' equals Decimal('85.00'). Unparseable input compares as text."""
+    value = normalize_text(value)
+    if value is None:
+        return None
+    try:
+        return decimal.Decimal(value).normalize()
+    except (decimal.InvalidOperation, ValueError):
+        return value
+
+
+def diff_rows(current, submitted, normalizers=None):
+    """
+    current and submitted map key tuples to value tuples. Returns the
+    submitted (key, values) pairs whose values differ from the stored row.
+    `normalizers` gives one function per value column (normalize_text when
+    omitted), so only numeric columns are compared as numbers.
+    Keys that are not stored are ignored, so a form can never write rows
+    outside the set the caller loaded.
+    """
+    changes = []
+    for key, values in submitted.items():
+        stored = current.get(key)
+        if stored is None:
+            continue
+        compare = normalizers or (normalize_text,) * len(values)
+        if any(normalize(new) != normalize(old) for normalize, new, old in zip(compare, values, stored)):
+            changes.append((key, values))
+    return changes
+
+
+def bulk_update(cursor, table, key_columns, value_columns, changes, extra_assignments=None, chunk_size=BULK_WRITE_CHUNK_SIZE):
+    """
+    Applies (key, values) pairs as one UPDATE ... JOIN per chunk: the new
+    values travel in a derived table, so each chunk is a single round trip and
+    only existing rows are touched. `extra_assignments` is trusted SQL appended
+    to SET (e.g. "t.GradedAt = NOW()"). Returns the number of rows changed.
+    """
+    columns = list(key_columns) + list(value_columns)
+    first_select = 'SELECT ' + ', '.join(f'%s AS {column}' for column in columns)
+    next_select = 'SELECT ' + ', '.join(['%s'] * len(columns))
+    join_on = ' AND '.join(f't.{column} = v.{column}' for column in key_columns)
+    assignments = [f't.{column} = v.{column}' for column in value_columns]
+    if extra_assignments:
+        assignments.append(extra_assignments)
+
+    updated = 0
+    for start in range(0, len(changes), chunk_size):
+        chunk = changes[start:start + chunk_size]
+        derived = ' UNION ALL '.join([first_select] + [next_select] * (len(chunk) - 1))
+        params = [value for key, values in chunk for value in (*key, *values)]
+        cursor.execute(f"UPDATE {table} t JOIN ({derived}) v ON {join_on} SET {', '.join(assignments)}", tuple(params))
+        updated += cursor.rowcount
+    return updated
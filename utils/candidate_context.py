@@ -0,0 +1,29 @@
+# utils/candidate_context.py
+from flask_login import current_user
+
+# The login identity (routes/Auth/login_routes.py, cached by utils/identity_cache)
+# already carries the CandidateID and the profile fields the job board filters
+# on, so candidate pages read them here instead of querying Candidates again.
+# The profile edit route invalidates the identity after saving.
+CANDIDATE_PROFILE_FIELDS = ('Nationality', 'Languages', 'LanguageLevel', 'EducationalStatus', 'Gender')
+
+
+def _user(user):
+    user = current_user if user is None else user
+    if not getattr(user, 'is_authenticated', False) or getattr(user, 'role_type', None) != 'Candidate':
+        return None
+    return user
+
+
+def get_candidate_id(user=None):
+    """CandidateID of the logged-in candidate (or `user`), None for anyone else."""
+    user = _user(user)
+    return user.specific_role_id if user else None
+
+
+def get_candidate_profile(user=None):
+    """A copy of the candidate's job-board profile fields, or None if the user is not a candidate."""
+    user = _user(user)
+    if not user or user.candidate_profile is None:
+        return None
+    return dict(user.candidate_profile)
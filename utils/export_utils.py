@@ -0,0 +1,208 @@
+# utils/export_utils.py
+import csv
+import datetime
+import io
+import os
+import tempfile
+from flask import Response, current_app, stream_with_context
+from db import get_db_connection
+
+# Exports stream rows from an unbuffered cursor instead of fetchall(), so a year
+# of applications never sits in worker memory at once.
+EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', 500))          # rows per fetchmany()
+EXPORT_WIDTH_SAMPLE = int(os.getenv('EXPORT_WIDTH_SAMPLE', 200))      # rows used to size XLSX columns
+EXPORT_CSV_FLUSH_ROWS = int(os.getenv('EXPORT_CSV_FLUSH_ROWS', 200))  # rows per HTTP chunk
+_FILE_CHUNK_SIZE = 64 * 1024
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class RowStream:
+    """
+    Iterates the rows of one query on a dedicated connection with an unbuffered
+    dictionary cursor. The first batch is fetched by open() so callers can
+    check `is_empty` before committing to a download response. The connection
+    is returned to the pool once iteration finishes or close() is called.
+    """
+
+    def __init__(self, sql, params=(), transform=None, fetch_size=EXPORT_FETCH_SIZE):
+        self.sql = sql
+        self.params = tuple(params)
+        self.transform = transform
+        self.fetch_size = fetch_size
+        self._conn = None
+        self._cursor = None
+        self._batch = []
+
+    def open(self):
+        self._conn = get_db_connection()
+        if not self._conn:
+            raise RuntimeError("Database connection failed for export.")
+        self._cursor = self._conn.cursor(dictionary=True, buffered=False)
+        self._cursor.execute(self.sql, self.params)
+        self._batch = self._cursor.fetchmany(self.fetch_size)
+        if not self._batch:
+            self.close()
+        return self
+
+    @property
+    def is_empty(self):
+        return not self._batch
+
+    @property
+    def first(self):
+        """The first row (transformed), or None."""
+        if not self._batch:
+            return None
+        return self.transform(self._batch[0]) if self.transform else self._batch[0]
+
+    def __iter__(self):
+        try:
+            batch = self._batch
+            while batch:
+                for row in batch:
+                    yield self.transform(row) if self.transform else row
+                batch = self._cursor.fetchmany(self.fetch_size) if self._cursor else []
+        finally:
+            self.close()
+
+    def close(self):
+        if self._cursor is not None:
+            try:
+                self._cursor.close()  # consumes any unread rows
+            except Exception:
+                pass
+            self._cursor = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _format_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def _attachment_headers(filename):
+    return {"Content-Disposition": f"attachment; filename={filename}"}
+
+
+def stream_csv_response(rows, filename, columns=None):
+    """
+    Streams rows as CSV in chunks of EXPORT_CSV_FLUSH_ROWS.
+    `columns` is a list of (header, key) pairs; without it the keys of the
+    first row are used as-is for both header and values.
+    """
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        keys = None
+        pending = 0
+        for row in rows:
+            if keys is None:
+                headers, keys = zip(*columns) if columns else (list(row.keys()), list(row.keys()))
+                writer.writerow(headers)
+            writer.writerow([row.get(key, '') for key in keys])
+            pending += 1
+            if pending >= EXPORT_CSV_FLUSH_ROWS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+                pending = 0
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    return Response(stream_with_context(generate()), mimetype="text/csv", headers=_attachment_headers(filename))
+
+
+def _build_styled_workbook(rows, title, header_mapping, target):
+    """Writes the styled report into `target` using openpyxl's write-only mode."""
+    # openpyxl is only imported on the first XLSX export, not at worker boot.
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    headers = list(header_mapping.keys())
+    data_keys = list(header_mapping.values())
+    last_column = get_column_letter(max(len(headers), 1))
+
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Report")
+
+    title_font = Font(name='Calibri', size=18, bold=True, color='1F2937')
+    header_font = Font(name='Calibri', size=12, bold=True, color='FFFFFF')
+    center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    left_align = Alignment(horizontal='left', vertical='center', wrap_text=True)
+    header_fill = PatternFill(start_color='4F46E5', end_color='4F46E5', fill_type='solid')
+
+    # Column widths have to be set before the first row is written, so they are
+    # sized from a sample of the leading rows rather than a second full pass.
+    rows = iter(rows)
+    sample = []
+    for row in rows:
+        sample.append(row)
+        if len(sample) >= EXPORT_WIDTH_SAMPLE:
+            break
+    column_widths = [len(str(header)) for header in headers]
+    for row_data in sample:
+        for index, key in enumerate(data_keys):
+            column_widths[index] = max(column_widths[index], len(str(_format_value(row_data.get(key, '')))))
+    for index, width in enumerate(column_widths, 1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width + 4
+
+    def styled(value, font=None, alignment=None, fill=None):
+        cell = WriteOnlyCell(worksheet, value=value)
+        if font: cell.font = font
+        if alignment: cell.alignment = alignment
+        if fill: cell.fill = fill
+        return cell
+
+    worksheet.row_dimensions[1].height = 30
+    worksheet.append([styled(title, title_font, center_align)])
+    worksheet.merged_cells.add(f"A1:{last_column}1")
+
+    worksheet.row_dimensions[2].height = 20
+    generated_on = f"Report generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    worksheet.append([styled(generated_on, Font(italic=True, color='6B7280'), center_align)])
+    worksheet.merged_cells.add(f"A2:{last_column}2")
+
+    worksheet.append([])
+    worksheet.row_dimensions[4].height = 25
+    worksheet.append([styled(header, header_font, center_align, header_fill) for header in headers])
+
+    def write(row_data):
+        worksheet.append([styled(_format_value(row_data.get(key, 'N/A')), alignment=left_align) for key in data_keys])
+
+    for row_data in sample:
+        write(row_data)
+    for row_data in rows:
+        write(row_data)
+
+    workbook.save(target)
+
+
+def stream_xlsx_response(rows, title, header_mapping, filename):
+    """
+    Builds a styled XLSX report (title, timestamp, indigo header row) from an
+    iterable of dict rows and streams it back in chunks.
+
+    header_mapping maps { 'Excel Header Name': 'data_key' }. The workbook is
+    spooled to a temporary file, so memory stays flat however many rows there are.
+    """
+    def generate():
+        with tempfile.TemporaryFile() as spool:
+            try:
+                _build_styled_workbook(rows, title, header_mapping, spool)
+            except Exception as e:
+                current_app.logger.error(f"Failed to build XLSX export '{title}': {e}", exc_info=True)
+                raise
+            spool.seek(0)
+            while True:
+                chunk = spool.read(_FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    return Response(stream_with_context(generate()), mimetype=XLSX_MIMETYPE, headers=_attachment_headers(filename))
@@ -1,72 +1,293 @@
 # utils/group_utils.py
 from flask import current_app, flash
 from db import get_db_connection
+from utils.bulk_writes import diff_rows, bulk_update
+import click
 import os
+import threading
 
-def sync_sessions_for_groups():
+# Backfilling sessions for groups created before sessions existed can touch
+# thousands of rows, so it runs as a background job: sessions and attendance
+# are generated with INSERT ... SELECT against a number sequence, committed a
+# few groups at a time, and progress is recorded in SessionBackfillRuns so any
+# worker can report it. A MySQL named lock keeps a single run active.
+SESSION_BACKFILL_CHUNK_SIZE = int(os.getenv('SESSION_BACKFILL_CHUNK_SIZE', 50))  # groups per transaction
+SESSION_BACKFILL_STALE_MINUTES = 10  # a run without progress for this long is treated as dead
+_BACKFILL_LOCK_NAME = 'mosla_session_backfill'
+
+_CREATE_RUNS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS SessionBackfillRuns (
+        RunID INT AUTO_INCREMENT PRIMARY KEY,
+        Status ENUM('Queued', 'Running', 'Completed', 'Failed', 'Skipped') NOT NULL DEFAULT 'Queued',
+        RequestedByUserID INT NULL,
+        GroupsTotal INT NOT NULL DEFAULT 0,
+        GroupsDone INT NOT NULL DEFAULT 0,
+        SessionsCreated INT NOT NULL DEFAULT 0,
+        AttendanceCreated INT NOT NULL DEFAULT 0,
+        Message VARCHAR(500) NULL,
+        CreatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        UpdatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FinishedAt DATETIME NULL
+    )
+"""
+
+
+def ensure_backfill_runs_table(conn):
+    cursor = conn.cursor()
+    cursor.execute(_CREATE_RUNS_TABLE_SQL)
+    conn.commit()
+    cursor.close()
+
+
+def _backfill_chunk(cursor, group_ids):
+    """Creates sessions and attendance rows for a chunk of groups. Returns (sessions, attendance) created."""
+    placeholders = ', '.join(['%s'] * len(group_ids))
+    cursor.execute("""
+        SELECT COALESCE(MAX(sp.NumSessionsMonolingual), 0)
+        FROM CourseGroups cg JOIN SubPackages sp ON cg.SubPackageID = sp.SubPackageID
+        WHERE cg.GroupID IN ({})
+    """.format(placeholders), tuple(group_ids))
+    max_sessions = cursor.fetchone()[0]
+    if not max_sessions:
+        return 0, 0
+
+    # Groups are re-checked for sessions here so a concurrent manual edit is never duplicated.
+    cursor.execute("""
+        INSERT INTO GroupSessions (GroupID, SessionNumber, SessionTitle)
+        WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+        SELECT cg.GroupID, seq.n, CONCAT('Session ', seq.n)
+        FROM CourseGroups cg
+        JOIN SubPackages sp ON cg.SubPackageID = sp.SubPackageID
+        JOIN seq ON seq.n <= sp.NumSessionsMonolingual
+        WHERE cg.GroupID IN ({})
+          AND NOT EXISTS (SELECT 1 FROM GroupSessions existing WHERE existing.GroupID = cg.GroupID)
+    """.format(placeholders), (max_sessions, *group_ids))
+    sessions_created = cursor.rowcount
+
+    cursor.execute("""
+        INSERT INTO SessionAttendance (SessionID, EnrollmentID)
+        SELECT gs.SessionID, cgm.EnrollmentID
+        FROM GroupSessions gs
+        JOIN CourseGroupMembers cgm ON cgm.GroupID = gs.GroupID
+        WHERE gs.GroupID IN ({})
+          AND NOT EXISTS (SELECT 1 FROM SessionAttendance sa WHERE sa.SessionID = gs.SessionID AND sa.EnrollmentID = cgm.EnrollmentID)
+    """.format(placeholders), tuple(group_ids))
+    return sessions_created, cursor.rowcount
+
+
+def sync_sessions_for_groups(run_id=None):
     """
-    A helper function to retroactively create sessions and attendance records
-    for existing groups. Returns a summary message.
+    Retroactively creates sessions and attendance records for groups that have
+    none, SESSION_BACKFILL_CHUNK_SIZE groups per transaction. Progress is
+    written to SessionBackfillRuns when `run_id` is given. Returns a summary
+    message and flash category.
     """
     conn = get_db_connection()
     if not conn:
         return "Database connection failed.", "danger"
-        
+
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor(dictionary=True)
-        
-        # 1. Find all groups that have ZERO sessions.
-        cursor.execute("""
-            SELECT cg.GroupID, cg.SubPackageID, sp.NumSessionsMonolingual
-            FROM CourseGroups cg
-            LEFT JOIN GroupSessions gs ON cg.GroupID = gs.GroupID
-            JOIN SubPackages sp ON cg.SubPackageID = sp.SubPackageID
-            WHERE gs.SessionID IS NULL AND sp.NumSessionsMonolingual > 0
-        """)
-        groups_to_fix = cursor.fetchall()
-
-        if not groups_to_fix:
-            return "All groups are already up-to-date with sessions.", "info"
-
-        sessions_created_count = 0
-        attendance_records_created_count = 0
-
-        for group in groups_to_fix:
-            group_id = group['GroupID']
-            num_sessions = group.get('NumSessionsMonolingual', 0)
-
-            if num_sessions > 0:
-                # 2. Create the missing sessions
-                session_data = [(group_id, i, f"Session {i}") for i in range(1, num_sessions + 1)]
-                sql_insert_sessions = "INSERT INTO GroupSessions (GroupID, SessionNumber, SessionTitle) VALUES (%s, %s, %s)"
-                cursor.executemany(sql_insert_sessions, session_data)
-                sessions_created_count += cursor.rowcount
-
-                # 3. Find members and create attendance records
-                cursor.execute("SELECT EnrollmentID FROM CourseGroupMembers WHERE GroupID = %s", (group_id,))
-                members = cursor.fetchall()
-                
-                if members:
-                    cursor.execute("SELECT SessionID FROM GroupSessions WHERE GroupID = %s", (group_id,))
-                    new_sessions = cursor.fetchall()
-                    
-                    attendance_data = []
-                    for member in members:
-                        for session in new_sessions:
-                            attendance_data.append((session['SessionID'], member['EnrollmentID']))
-                    
-                    if attendance_data:
-                        sql_insert_attendance = "INSERT INTO SessionAttendance (SessionID, EnrollmentID) VALUES (%s, %s)"
-                        cursor.executemany(sql_insert_attendance, attendance_data)
-                        attendance_records_created_count += cursor.rowcount
-        
-        conn.commit()
-        message = f"Sync complete! Fixed {len(groups_to_fix)} groups. Created {sessions_created_count} sessions and {attendance_records_created_count} attendance records."
-        return message, "success"
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (_BACKFILL_LOCK_NAME,))
+        if not cursor.fetchone()[0]:
+            message = "Another session sync is already running."
+            if run_id:
+                cursor.execute("UPDATE SessionBackfillRuns SET Status = 'Skipped', Message = %s, FinishedAt = NOW() WHERE RunID = %s", (message, run_id))
+                conn.commit()
+            return message, "warning"
+        try:
+            # 1. Find all groups that have ZERO sessions.
+            cursor.execute("""
+                SELECT cg.GroupID
+                FROM CourseGroups cg
+                JOIN SubPackages sp ON cg.SubPackageID = sp.SubPackageID
+                WHERE sp.NumSessionsMonolingual > 0
+                  AND NOT EXISTS (SELECT 1 FROM GroupSessions gs WHERE gs.GroupID = cg.GroupID)
+                ORDER BY cg.GroupID
+            """)
+            group_ids = [row[0] for row in cursor.fetchall()]
+            if run_id:
+                cursor.execute("UPDATE SessionBackfillRuns SET Status = 'Running', GroupsTotal = %s WHERE RunID = %s", (len(group_ids), run_id))
+                conn.commit()
+
+            if not group_ids:
+                message, category = "All groups are already up-to-date with sessions.", "info"
+            else:
+                # 2. Create the missing sessions and attendance, one committed chunk at a time.
+                sessions_created_count = 0
+                attendance_records_created_count = 0
+                for start in range(0, len(group_ids), SESSION_BACKFILL_CHUNK_SIZE):
+                    chunk = group_ids[start:start + SESSION_BACKFILL_CHUNK_SIZE]
+                    sessions_created, attendance_created = _backfill_chunk(cursor, chunk)
+                    sessions_created_count += sessions_created
+                    attendance_records_created_count += attendance_created
+                    if run_id:
+                        cursor.execute("""
+                            UPDATE SessionBackfillRuns
+                            SET GroupsDone = GroupsDone + %s, SessionsCreated = SessionsCreated + %s, AttendanceCreated = AttendanceCreated + %s
+                            WHERE RunID = %s
+                        """, (len(chunk), sessions_created, attendance_created, run_id))
+                    conn.commit()
+                message = f"Sync complete! Fixed {len(group_ids)} groups. Created {sessions_created_count} sessions and {attendance_records_created_count} attendance records."
+                category = "success"
+
+            if run_id:
+                cursor.execute("UPDATE SessionBackfillRuns SET Status = 'Completed', Message = %s, FinishedAt = NOW() WHERE RunID = %s", (message, run_id))
+                conn.commit()
+            return message, category
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_BACKFILL_LOCK_NAME,))
+            cursor.fetchone()
 
     except Exception as e:
         if conn and conn.is_connected(): conn.rollback()
-        current_app.logger.error(f"Error during session sync utility: {e}")
+        current_app.logger.error(f"Error during session sync utility: {e}", exc_info=True)
+        if run_id and conn.is_connected():
+            try:
+                cursor.execute("UPDATE SessionBackfillRuns SET Status = 'Failed', Message = %s, FinishedAt = NOW() WHERE RunID = %s", (str(e)[:500], run_id))
+                conn.commit()
+            except Exception:
+                current_app.logger.error(f"Could not record failure of session backfill run {run_id}.", exc_info=True)
         return f"An error occurred during sync: {e}", "danger"
     finally:
-        if conn and conn.is_connected(): conn.close()
\ No newline at end of file
+        cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+
+def _run_backfill(app, run_id):
+    with app.app_context():
+        try:
+            message, _ = sync_sessions_for_groups(run_id)
+            app.logger.info(f"Session backfill run {run_id}: {message}")
+        except Exception as e:
+            app.logger.error(f"Session backfill run {run_id} crashed: {e}", exc_info=True)
+
+
+def _active_run(cursor):
+    cursor.execute("""
+        SELECT RunID FROM SessionBackfillRuns
+        WHERE Status IN ('Queued', 'Running') AND UpdatedAt > NOW() - INTERVAL %s MINUTE
+        ORDER BY RunID DESC LIMIT 1
+    """, (SESSION_BACKFILL_STALE_MINUTES,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def start_session_backfill(requested_by_user_id=None):
+    """
+    Queues a backfill run and starts it on a background thread. Returns
+    (run_id, started); when a run is already active its id is returned with
+    started=False.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed.")
+    try:
+        ensure_backfill_runs_table(conn)
+        cursor = conn.cursor()
+        active_run_id = _active_run(cursor)
+        if active_run_id:
+            cursor.close()
+            return active_run_id, False
+        cursor.execute("INSERT INTO SessionBackfillRuns (RequestedByUserID) VALUES (%s)", (requested_by_user_id,))
+        run_id = cursor.lastrowid
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    threading.Thread(target=_run_backfill, args=(current_app._get_current_object(), run_id),
+                     name=f'session-backfill-{run_id}', daemon=True).start()
+    return run_id, True
+
+
+def get_session_backfill_status(run_id=None):
+    """The given run, or the latest one, as a JSON-ready dict (None if there is none)."""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed.")
+    try:
+        ensure_backfill_runs_table(conn)
+        cursor = conn.cursor(dictionary=True)
+        if run_id:
+            cursor.execute("SELECT * FROM SessionBackfillRuns WHERE RunID = %s", (run_id,))
+        else:
+            cursor.execute("SELECT * FROM SessionBackfillRuns ORDER BY RunID DESC LIMIT 1")
+        run = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+    if not run:
+        return None
+    for key in ('CreatedAt', 'UpdatedAt', 'FinishedAt'):
+        run[key] = run[key].isoformat() if run[key] else None
+    run['Percent'] = round(100 * run['GroupsDone'] / run['GroupsTotal']) if run['GroupsTotal'] else (100 if run['Status'] == 'Completed' else 0)
+    return run
+
+
+def init_session_backfill(app):
+    """Creates the SessionBackfillRuns table and registers `flask sync-group-sessions`."""
+    with app.app_context():
+        conn = get_db_connection()
+        if conn:
+            try:
+                ensure_backfill_runs_table(conn)
+            except Exception as e:
+                app.logger.error(f"Could not create the session backfill table: {e}", exc_info=True)
+            finally:
+                conn.close()
+
+    @app.cli.command('sync-group-sessions')
+    def sync_group_sessions_command():
+        """Create missing sessions and attendance records for existing course groups."""
+        message, _ = sync_sessions_for_groups()
+        click.echo(message)
+
+
+def parse_grid_form(form, prefix):
+    """
+    Collects `<prefix>_<id>[_<id>...]` fields from a grid form into
+    {(int ids...): value}. Malformed keys are skipped.
+    """
+    cells = {}
+    for key, value in form.items():
+        if not key.startswith(prefix + '_'):
+            continue
+        try:
+            ids = tuple(int(part) for part in key[len(prefix) + 1:].split('_'))
+        except ValueError:
+            continue
+        cells[ids] = value
+    return cells
+
+
+def save_attendance_grid(cursor, group_id, form):
+    """
+    Writes the attendance grid posted for a group (status_/attendance_notes_/
+    performance_notes_<session>_<enrollment> fields). Only cells that differ
+    from the stored rows are updated, and only rows belonging to the group's
+    sessions can be touched. Returns the number of rows changed; the caller
+    commits.
+    """
+    cursor.execute("""
+        SELECT sa.SessionID, sa.EnrollmentID, sa.Status, sa.AttendanceNotes, sa.PerformanceNotes
+        FROM SessionAttendance sa
+        JOIN GroupSessions gs ON sa.SessionID = gs.SessionID
+        WHERE gs.GroupID = %s
+    """, (group_id,))
+    current = {}
+    for row in cursor.fetchall():
+        if isinstance(row, dict):
+            row = (row['SessionID'], row['EnrollmentID'], row['Status'], row['AttendanceNotes'], row['PerformanceNotes'])
+        current[(row[0], row[1])] = tuple(row[2:])
+
+    submitted = {}
+    for (session_id, enrollment_id), status in parse_grid_form(form, 'status').items():
+        submitted[(session_id, enrollment_id)] = (
+            status,
+            form.get(f'attendance_notes_{session_id}_{enrollment_id}', ''),
+            form.get(f'performance_notes_{session_id}_{enrollment_id}', ''),
+        )
+
+    changes = diff_rows(current, submitted)
+    return bulk_update(cursor, 'SessionAttendance', ('SessionID', 'EnrollmentID'),
+                       ('Status', 'AttendanceNotes', 'PerformanceNotes'), changes)
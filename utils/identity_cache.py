@@ -0,0 +1,61 @@
+# utils/identity_cache.py
+import os
+from utils.cache_utils import TTLCache
+
+# Caches the constructor arguments of LoginUser, keyed by UserID, so that the
+# Flask-Login user_loader does not hit MySQL on every authenticated request.
+_identity_cache = TTLCache(
+    maxsize=int(os.getenv('IDENTITY_CACHE_SIZE', 2048)),
+    ttl=int(os.getenv('IDENTITY_CACHE_TTL', 60))
+)
+
+
+def get_cached_identity(user_id):
+    """Returns a copy of the cached LoginUser arguments for user_id, or None."""
+    try:
+        user_args = _identity_cache.get(int(user_id))
+    except (TypeError, ValueError):
+        return None
+    return dict(user_args) if user_args else None
+
+
+def cache_identity(user_args):
+    """Stores LoginUser arguments (must include 'user_id')."""
+    _identity_cache.set(int(user_args['user_id']), dict(user_args))
+
+
+def invalidate_user_identity(user_id=None, staff_id=None):
+    """
+    Drops a cached identity after a change to the user's account, role, leader,
+    or password. Pass whichever id the caller has at hand.
+    """
+    try:
+        user_id = int(user_id) if user_id not in (None, '') else None
+        staff_id = int(staff_id) if staff_id not in (None, '') else None
+    except (TypeError, ValueError):
+        return
+    if user_id is not None:
+        _identity_cache.pop(user_id)
+    if staff_id is not None:
+        _identity_cache.invalidate_where(
+            lambda args: args.get('role_type') not in ('Candidate', 'ClientContact')
+            and args.get('specific_role_id') == staff_id
+        )
+
+
+def invalidate_company_identities(company_id):
+    """Drops the identities of a company's contacts after the company is renamed or deleted."""
+    try:
+        company_id = int(company_id)
+    except (TypeError, ValueError):
+        return
+    _identity_cache.invalidate_where(lambda args: args.get('company_id') == company_id)
+
+
+def clear_identity_cache():
+    """Drops every cached identity. Used by bulk org changes that touch many staff rows."""
+    _identity_cache.clear()
+
+
+def get_identity_cache_stats():
+    return _identity_cache.stats()
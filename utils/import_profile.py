@@ -0,0 +1,58 @@
+# utils/import_profile.py
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+# Import-time report for worker boot. Runs `python -X importtime -c "import <module>"`
+# in a fresh interpreter and summarises the per-module cost, so a slow or newly
+# eager dependency shows up before it reaches production. Importing `app` has no
+# side effects (the application is built by create_app()), so no database or
+# secrets are needed:
+#
+#     python -m utils.import_profile                # top modules + per-package totals
+#     python -m utils.import_profile --top 40 --module routes.admin.admin_routes
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def profile_imports(module='app', cwd=None):
+    """Returns [(name, self_us, cumulative_us, depth)] for every module imported by `import module`."""
+    project_root = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=project_root, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def summarize(entries, top=25):
+    """Formats the report: total, heaviest modules by cumulative time, and self time per top-level package."""
+    total_us = sum(self_us for _, self_us, _, _ in entries)
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        by_package[name.split('.')[0]] += self_us
+
+    lines = [f"Total import time: {total_us / 1000:.1f} ms across {len(entries)} modules", '',
+             f"Top {top} modules by cumulative time (ms):"]
+    for name, self_us, cumulative_us, depth in sorted(entries, key=lambda e: e[2], reverse=True)[:top]:
+        lines.append(f"  {cumulative_us / 1000:9.1f}  self {self_us / 1000:7.1f}  {'  ' * min(depth, 4)}{name}")
+    lines += ['', f"Top {top} packages by self time (ms):"]
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"  {self_us / 1000:9.1f}  {package} ({self_us * 100 / max(total_us, 1):.1f}%)")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Report per-module import cost of worker boot.")
+    parser.add_argument('--module', default='app', help="module to import (default: app)")
+    parser.add_argument('--top', type=int, default=25, help="rows per section (default: 25)")
+    args = parser.parse_args()
+    print(summarize(profile_imports(args.module), args.top))
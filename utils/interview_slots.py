@@ -0,0 +1,177 @@
+# utils/interview_slots.py
+import datetime
+import os
+from flask import current_app
+from db import get_db_connection
+
+# Bookable interview times are materialized from CompanyInterviewSchedules into
+# InterviewSlots, one row per company and start time. A booking is a single
+# conditional UPDATE on that row, so concurrent candidates racing for the same
+# time cannot both win. An application holds at most one upcoming slot; past
+# slots keep their ApplicationID as history and do not block a later booking.
+INTERVIEW_SLOT_MINUTES = int(os.getenv('INTERVIEW_SLOT_MINUTES', 30))
+INTERVIEW_SLOT_HORIZON_DAYS = int(os.getenv('INTERVIEW_SLOT_HORIZON_DAYS', 14))
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS InterviewSlots (
+        SlotID BIGINT AUTO_INCREMENT PRIMARY KEY,
+        CompanyID INT NOT NULL,
+        SlotStart DATETIME NOT NULL,
+        ApplicationID INT NULL,
+        ReservedAt DATETIME NULL,
+        UNIQUE KEY uq_interview_slot (CompanyID, SlotStart),
+        KEY idx_interview_slot_application (ApplicationID, SlotStart),
+        KEY idx_interview_slot_open (CompanyID, ApplicationID, SlotStart)
+    )
+"""
+
+# Companies whose slot window this worker has already rolled forward today.
+_materialized_on = {}
+
+
+def ensure_interview_slots_table(conn):
+    cursor = conn.cursor()
+    cursor.execute(_CREATE_TABLE_SQL)
+    # Tables created before bookings were limited to upcoming slots carry a
+    # table-wide unique key that blocks rebooking after an old interview.
+    cursor.execute("""
+        SELECT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'InterviewSlots'
+          AND INDEX_NAME IN ('uq_interview_slot_application', 'idx_interview_slot_application')
+    """)
+    indexes = {row[0] for row in cursor.fetchall()}
+    if 'idx_interview_slot_application' not in indexes:
+        cursor.execute("ALTER TABLE InterviewSlots ADD KEY idx_interview_slot_application (ApplicationID, SlotStart)")
+    if 'uq_interview_slot_application' in indexes:
+        cursor.execute("ALTER TABLE InterviewSlots DROP INDEX uq_interview_slot_application")
+    conn.commit()
+    cursor.close()
+
+
+def _slot_times(schedules, start_date, days):
+    """Expands weekly schedule rows (DayOfWeek, StartTime/EndTime as timedelta) into slot datetimes."""
+    step = datetime.timedelta(minutes=INTERVIEW_SLOT_MINUTES)
+    by_day = {}
+    for schedule in schedules:
+        by_day.setdefault(schedule['DayOfWeek'], []).append(schedule)
+    slots = set()
+    for offset in range(days):
+        day = start_date + datetime.timedelta(days=offset)
+        for schedule in by_day.get(day.strftime('%A'), []):
+            midnight = datetime.datetime.combine(day, datetime.time())
+            slot_time, end_time = midnight + schedule['StartTime'], midnight + schedule['EndTime']
+            while slot_time < end_time:
+                slots.add(slot_time)
+                slot_time += step
+    return slots
+
+
+def regenerate_company_slots(conn, company_id):
+    """
+    Brings a company's open slots in line with its active schedules for the
+    next INTERVIEW_SLOT_HORIZON_DAYS days (starting tomorrow). Reserved slots
+    are never removed. Slots whose interview no longer exists are released.
+    Commits on `conn`.
+    """
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT DayOfWeek, StartTime, EndTime FROM CompanyInterviewSchedules WHERE CompanyID = %s AND IsActive = 1", (company_id,))
+    wanted = _slot_times(cursor.fetchall(), datetime.date.today() + datetime.timedelta(days=1), INTERVIEW_SLOT_HORIZON_DAYS)
+
+    cursor.execute("SELECT SlotStart FROM InterviewSlots WHERE CompanyID = %s AND SlotStart > NOW() AND ApplicationID IS NULL", (company_id,))
+    stale = [(company_id, row['SlotStart']) for row in cursor.fetchall() if row['SlotStart'] not in wanted]
+    if stale:
+        cursor.executemany("DELETE FROM InterviewSlots WHERE CompanyID = %s AND SlotStart = %s AND ApplicationID IS NULL", stale)
+    if wanted:
+        cursor.executemany("INSERT IGNORE INTO InterviewSlots (CompanyID, SlotStart) VALUES (%s, %s)",
+                           [(company_id, slot) for slot in sorted(wanted)])
+
+    # Interviews booked outside the inventory (or before it existed) hold their slot;
+    # reservations whose interview was removed are freed again.
+    cursor.execute("""
+        UPDATE IGNORE InterviewSlots s
+        JOIN Interviews i ON i.ScheduledDateTime = s.SlotStart
+        JOIN JobApplications ja ON i.ApplicationID = ja.ApplicationID
+        JOIN JobOffers jo ON ja.OfferID = jo.OfferID AND jo.CompanyID = s.CompanyID
+        SET s.ApplicationID = i.ApplicationID, s.ReservedAt = NOW()
+        WHERE s.CompanyID = %s AND s.SlotStart > NOW() AND s.ApplicationID IS NULL
+    """, (company_id,))
+    cursor.execute("""
+        UPDATE InterviewSlots s
+        LEFT JOIN Interviews i ON i.ApplicationID = s.ApplicationID AND i.ScheduledDateTime = s.SlotStart
+        SET s.ApplicationID = NULL, s.ReservedAt = NULL
+        WHERE s.CompanyID = %s AND s.SlotStart > NOW() AND s.ApplicationID IS NOT NULL AND i.InterviewID IS NULL
+    """, (company_id,))
+    conn.commit()
+    cursor.close()
+    _materialized_on[company_id] = datetime.date.today()
+
+
+def refresh_company_slots(company_id):
+    """Regenerates a company's slots after its schedule changed. Failures are logged, not raised."""
+    if not company_id:
+        return
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        regenerate_company_slots(conn, company_id)
+    except Exception as e:
+        conn.rollback()
+        _materialized_on.pop(company_id, None)
+        current_app.logger.error(f"Could not regenerate interview slots for CompanyID {company_id}: {e}", exc_info=True)
+    finally:
+        conn.close()
+
+
+def ensure_company_slots(conn, company_id):
+    """Rolls the slot window forward at most once a day per company and worker."""
+    if _materialized_on.get(company_id) != datetime.date.today():
+        regenerate_company_slots(conn, company_id)
+
+
+def get_available_slots(cursor, company_id, start, end):
+    """Open slot start times for a company in [start, end), never in the past."""
+    cursor.execute("""
+        SELECT SlotStart FROM InterviewSlots
+        WHERE CompanyID = %s AND ApplicationID IS NULL AND SlotStart >= GREATEST(%s, NOW()) AND SlotStart < %s
+        ORDER BY SlotStart
+    """, (company_id, start, end))
+    return [row['SlotStart'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+
+def has_upcoming_booking(cursor, application_id):
+    """True if the application already holds a slot that has not started yet."""
+    cursor.execute("SELECT 1 FROM InterviewSlots WHERE ApplicationID = %s AND SlotStart > NOW() LIMIT 1", (application_id,))
+    return cursor.fetchone() is not None
+
+
+def reserve_slot(cursor, company_id, slot_start, application_id):
+    """
+    Claims an open slot for an application inside the caller's transaction.
+    Returns False when the slot does not exist, somebody else got it first, or
+    the application already holds an upcoming slot. Callers lock the
+    application row first so two bookings for one application are serialized.
+    """
+    # The aggregate keeps the derived table materialized, which MySQL requires
+    # when an UPDATE reads the table it modifies.
+    cursor.execute("""
+        UPDATE InterviewSlots SET ApplicationID = %s, ReservedAt = NOW()
+        WHERE CompanyID = %s AND SlotStart = %s AND ApplicationID IS NULL AND SlotStart > NOW()
+          AND (SELECT held.n FROM (
+                  SELECT COUNT(*) AS n FROM InterviewSlots WHERE ApplicationID = %s AND SlotStart > NOW()
+               ) AS held) = 0
+    """, (application_id, company_id, slot_start, application_id))
+    return cursor.rowcount == 1
+
+
+def init_interview_slots(app):
+    """Creates the InterviewSlots table if needed."""
+    with app.app_context():
+        conn = get_db_connection()
+        if conn:
+            try:
+                ensure_interview_slots_table(conn)
+            except Exception as e:
+                app.logger.error(f"Could not create the interview slots table: {e}", exc_info=True)
+            finally:
+                conn.close()
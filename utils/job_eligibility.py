@@ -0,0 +1,225 @@
+# utils/job_eligibility.py
+import datetime
+import os
+import threading
+import time
+from flask import current_app
+from db import get_db_connection
+
+# The candidate job board filters open offers on gender, nationality, languages,
+# language level and education. Those predicates (FIND_IN_SET, CASE mappings)
+# cannot use an index, so each worker keeps the eligibility attributes of the
+# open offers as bitsets (Python ints, one bit per offer) and the board becomes
+# a handful of ANDs/ORs plus a primary-key fetch of the matching offers.
+JOB_INDEX_TTL = int(os.getenv('JOB_INDEX_TTL', 300))  # full rebuild interval, bounds cross-worker staleness
+
+LEVEL_VALUES = {'C2': 6, 'C1': 5, 'B2+': 4, 'B2': 3, 'B1+': 2, 'B1': 1}
+
+_OFFER_ATTRIBUTES_SQL = """
+    SELECT OfferID, Gender, Nationality, RequiredLanguages, RequiredLevel,
+           GraduationStatusRequirement, ClosingDate, DatePosted
+    FROM JobOffers
+    WHERE Status = 'Open' AND (ClosingDate IS NULL OR ClosingDate >= CURDATE())
+"""
+
+
+def _as_set(value):
+    """SET columns arrive as a Python set from mysql.connector, or as 'a,b' strings."""
+    if not value:
+        return set()
+    if isinstance(value, str):
+        return {part for part in value.split(',') if part}
+    return set(value)
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+
+class JobEligibilityIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._reset()
+
+    def _reset(self):
+        self._slot_of = {}        # OfferID -> bit position
+        self._offer_at = {}       # bit position -> OfferID
+        self._free_slots = []
+        self._next_slot = 0
+        self._meta = {}           # OfferID -> (closing_date, date_posted)
+        self._attributes = {}     # OfferID -> [(bitset_dict_name, key), ...] for removal
+        self._all = 0
+        self._gender = {}
+        self._nationality = {}
+        self._language = {}
+        self._level = {}
+        self._education = {}
+
+    # --- Maintenance (callers hold self._lock) ---
+    def _add(self, row):
+        offer_id = row['OfferID']
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = self._next_slot
+            self._next_slot += 1
+        bit = 1 << slot
+        self._slot_of[offer_id] = slot
+        self._offer_at[slot] = offer_id
+        self._meta[offer_id] = (_as_date(row.get('ClosingDate')), row.get('DatePosted'))
+        self._all |= bit
+
+        entries = [('_gender', row.get('Gender')),
+                   ('_nationality', row.get('Nationality')),
+                   ('_level', LEVEL_VALUES.get(row.get('RequiredLevel'), 0))]
+        entries += [('_language', lang) for lang in _as_set(row.get('RequiredLanguages'))]
+        entries += [('_education', status) for status in _as_set(row.get('GraduationStatusRequirement'))]
+        for name, key in entries:
+            bitsets = getattr(self, name)
+            bitsets[key] = bitsets.get(key, 0) | bit
+        self._attributes[offer_id] = entries
+
+    def _remove(self, offer_id):
+        slot = self._slot_of.pop(offer_id, None)
+        if slot is None:
+            return
+        bit = 1 << slot
+        self._all &= ~bit
+        for name, key in self._attributes.pop(offer_id, []):
+            bitsets = getattr(self, name)
+            remaining = bitsets.get(key, 0) & ~bit
+            if remaining:
+                bitsets[key] = remaining
+            else:
+                bitsets.pop(key, None)
+        del self._offer_at[slot]
+        self._meta.pop(offer_id, None)
+        self._free_slots.append(slot)
+
+    # --- Loading ---
+    def rebuild(self, cursor):
+        cursor.execute(_OFFER_ATTRIBUTES_SQL)
+        rows = cursor.fetchall()
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(row)
+            self._built_at = time.monotonic()
+        return len(rows)
+
+    def refresh_offer(self, cursor, offer_id):
+        cursor.execute(_OFFER_ATTRIBUTES_SQL + " AND OfferID = %s", (offer_id,))
+        row = cursor.fetchone()
+        with self._lock:
+            self._remove(offer_id)
+            if row:
+                self._add(row)
+
+    def is_stale(self):
+        return self._built_at is None or (time.monotonic() - self._built_at) >= JOB_INDEX_TTL
+
+    def mark_stale(self):
+        self._built_at = None
+
+    # --- Querying ---
+    def eligible_offer_ids(self, profile, today=None):
+        """
+        OfferIDs the candidate qualifies for, newest first. Mirrors the former
+        SQL filters of job_board_routes.job_offers_list.
+        """
+        today = today or datetime.date.today()
+        with self._lock:
+            candidates = self._all
+
+            gender = profile.get('Gender')
+            gender_ok = self._gender.get('Both', 0)
+            if gender in ('Male', 'Female'):
+                gender_ok |= self._gender.get(gender, 0)
+            candidates &= gender_ok
+
+            nationality = profile.get('Nationality')
+            if nationality == 'Egyptian':
+                candidates &= self._nationality.get('Egyptians Only', 0) | self._nationality.get('Foreigners & Egyptians', 0)
+            elif nationality == 'Foreigner':
+                candidates &= self._nationality.get('Foreigners & Egyptians', 0)
+
+            languages = _as_set(profile.get('Languages'))
+            if languages:
+                language_ok = 0
+                for lang in languages:
+                    language_ok |= self._language.get(lang, 0)
+                candidates &= language_ok
+
+            level = profile.get('LanguageLevel')
+            if level:
+                level_ok = 0
+                for value in range(LEVEL_VALUES.get(level, 0) + 1):
+                    level_ok |= self._level.get(value, 0)
+                candidates &= level_ok
+
+            education = profile.get('EducationalStatus')
+            if education:
+                candidates &= self._education.get(education, 0)
+
+            matches = []
+            while candidates:
+                low_bit = candidates & -candidates
+                offer_id = self._offer_at[low_bit.bit_length() - 1]
+                closing_date, date_posted = self._meta[offer_id]
+                if closing_date is None or closing_date >= today:
+                    matches.append((date_posted or datetime.datetime.min, offer_id))
+                candidates ^= low_bit
+
+        matches.sort(reverse=True)
+        return [offer_id for _, offer_id in matches]
+
+    def stats(self):
+        with self._lock:
+            return {'offers': len(self._slot_of), 'languages': len(self._language),
+                    'age_seconds': None if self._built_at is None else round(time.monotonic() - self._built_at, 1)}
+
+
+_index = JobEligibilityIndex()
+
+
+def get_eligible_offer_ids(profile, conn=None):
+    """Returns eligible open OfferIDs for a candidate profile, rebuilding the index when stale."""
+    if _index.is_stale():
+        own_conn = conn is None
+        conn = conn or get_db_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            count = _index.rebuild(cursor)
+            cursor.close()
+            current_app.logger.info(f"Job eligibility index rebuilt with {count} open offers.")
+        finally:
+            if own_conn and conn: conn.close()
+    return _index.eligible_offer_ids(profile)
+
+
+def refresh_job_offer(offer_id):
+    """
+    Re-reads one offer after it was created, edited, closed or deleted and
+    updates this worker's index. Other workers pick the change up on their
+    next rebuild (JOB_INDEX_TTL).
+    """
+    if not offer_id or _index.is_stale():
+        return  # the next read rebuilds everything anyway
+    conn = get_db_connection()
+    if not conn:
+        _index.mark_stale()
+        return
+    try:
+        cursor = conn.cursor(dictionary=True)
+        _index.refresh_offer(cursor, offer_id)
+        cursor.close()
+    except Exception as e:
+        _index.mark_stale()
+        current_app.logger.error(f"Could not refresh job eligibility index for OfferID {offer_id}: {e}", exc_info=True)
+    finally:
+        conn.close()
+
+
+def get_job_index_stats():
+    return _index.stats()
@@ -0,0 +1,384 @@
+# utils/leaderboard.py
+import datetime
+import os
+import random
+import threading
+import time
+import click
+from flask import current_app
+from db import get_db_connection
+
+# Per-staff referral/hire counters, kept in step with JobApplications so the
+# recruiter leaderboard is a read of one small row per staff member. Alongside
+# them, a staff x month x status rollup feeds the recruiter dashboards.
+LEADERBOARD_TABLE = 'StaffReferralLeaderboard'
+ROLLUP_TABLE = 'StaffReferralMonthly'
+LEADERBOARD_RECONCILE_INTERVAL = int(os.getenv('LEADERBOARD_RECONCILE_INTERVAL', 3600))  # seconds, 0 disables
+_RECONCILE_LOCK_NAME = 'mosla_leaderboard_reconcile'
+_table_ready = False  # set once CREATE TABLE IF NOT EXISTS has succeeded in this process
+_reconcile_thread_pid = None  # PID that started the reconciliation thread; threads do not survive fork()
+_reconcile_thread_lock = threading.Lock()
+
+_CREATE_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {LEADERBOARD_TABLE} (
+        StaffID INT NOT NULL PRIMARY KEY,
+        ReferralsAllTime INT NOT NULL DEFAULT 0,
+        HiresAllTime INT NOT NULL DEFAULT 0,
+        MonthStart DATE NOT NULL,
+        ReferralsMonth INT NOT NULL DEFAULT 0,
+        HiresMonth INT NOT NULL DEFAULT 0,
+        UpdatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_lb_referrals (ReferralsAllTime, HiresAllTime),
+        INDEX idx_lb_hires (HiresAllTime, ReferralsAllTime),
+        INDEX idx_lb_month (MonthStart, ReferralsMonth, HiresMonth)
+    )
+"""
+
+# MonthStart is the first day of the application's month; Status is its current status.
+_CREATE_ROLLUP_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+        StaffID INT NOT NULL,
+        MonthStart DATE NOT NULL,
+        Status VARCHAR(50) NOT NULL,
+        Applications INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (StaffID, MonthStart, Status),
+        INDEX idx_rollup_month (MonthStart)
+    )
+"""
+
+
+def _current_month_start():
+    return datetime.date.today().replace(day=1)
+
+
+def _month_of(value):
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return (value or datetime.date.today()).replace(day=1)
+
+
+def _bump_rollup(cursor, staff_id, month_start, status, delta):
+    cursor.execute(f"""
+        INSERT INTO {ROLLUP_TABLE} (StaffID, MonthStart, Status, Applications) VALUES (%s, %s, %s, GREATEST(%s, 0))
+        ON DUPLICATE KEY UPDATE Applications = GREATEST(Applications + %s, 0)
+    """, (staff_id, month_start, status, delta, delta))
+
+
+# --- Incremental Updates (called inside the caller's transaction) ---
+def record_application_created(conn, referring_staff_id, status, application_date):
+    """Counts a newly inserted application towards its referring staff member."""
+    # Without the table there is nothing to update; the next reconciliation catches up.
+    if not referring_staff_id or not _table_ready:
+        return
+    cursor = conn.cursor()
+    # Assignments run left to right, so the month counters are reset before MonthStart moves.
+    cursor.execute(f"""
+        INSERT INTO {LEADERBOARD_TABLE} (StaffID, ReferralsAllTime, HiresAllTime, MonthStart, ReferralsMonth, HiresMonth)
+        VALUES (%s, 1, 0, %s, 1, 0)
+        ON DUPLICATE KEY UPDATE
+            ReferralsAllTime = ReferralsAllTime + 1,
+            ReferralsMonth = IF(MonthStart = VALUES(MonthStart), ReferralsMonth + 1, 1),
+            HiresMonth = IF(MonthStart = VALUES(MonthStart), HiresMonth, 0),
+            MonthStart = VALUES(MonthStart)
+    """, (referring_staff_id, _current_month_start()))
+    if application_date is not None and status is not None:
+        _bump_rollup(cursor, referring_staff_id, _month_of(application_date), status, 1)
+    cursor.close()
+
+
+def record_application_status_change(conn, application_id, new_status):
+    """
+    Adjusts hire counters and the monthly rollup for an application whose
+    status is about to change. Must be called BEFORE the UPDATE on
+    JobApplications, in the same transaction.
+    """
+    if not _table_ready:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT ReferringStaffID, Status, ApplicationDate FROM JobApplications WHERE ApplicationID = %s FOR UPDATE", (application_id,))
+        row = cursor.fetchone()
+        if not row or not row[0]:
+            return
+        staff_id, old_status, application_date = row
+        if old_status == new_status:
+            return
+        # Applications without a date or status are not in the rollup (see _compute_rollup).
+        if application_date is not None and old_status is not None:
+            month_of_application = _month_of(application_date)
+            _bump_rollup(cursor, staff_id, month_of_application, old_status, -1)
+            _bump_rollup(cursor, staff_id, month_of_application, new_status, 1)
+
+        delta = (1 if new_status == 'Hired' else 0) - (1 if old_status == 'Hired' else 0)
+        if delta == 0:
+            return
+
+        month_start = _current_month_start()
+        # The monthly counter only tracks applications submitted this month.
+        cursor.execute(f"""
+            UPDATE {LEADERBOARD_TABLE}
+            SET HiresAllTime = GREATEST(HiresAllTime + %s, 0),
+                HiresMonth = IF(MonthStart = %s AND %s >= MonthStart, GREATEST(HiresMonth + %s, 0), HiresMonth)
+            WHERE StaffID = %s
+        """, (delta, month_start, application_date, delta, staff_id))
+    finally:
+        cursor.close()
+
+
+# --- Reads ---
+LEADERBOARD_SORTS = {
+    'referrals_all_time': "referrals_all_time DESC, hires_all_time DESC",
+    'hires_all_time': "hires_all_time DESC, referrals_all_time DESC",
+    'referrals_monthly': "referrals_monthly DESC, hires_monthly DESC",
+    'hires_monthly': "hires_monthly DESC, referrals_monthly DESC",
+}
+
+
+def get_leaderboard(cursor, roles, sort_by='referrals_all_time'):
+    """Returns leaderboard rows for active staff in `roles`. `cursor` must be a dictionary cursor."""
+    order_by = LEADERBOARD_SORTS.get(sort_by, LEADERBOARD_SORTS['referrals_all_time'])
+    role_placeholders = ', '.join(['%s'] * len(roles))
+    month_start = _current_month_start()
+    cursor.execute(f"""
+        SELECT s.StaffID, u.FirstName, u.LastName, u.ProfilePictureURL, s.Role,
+               COALESCE(lb.ReferralsAllTime, 0) AS referrals_all_time,
+               COALESCE(lb.HiresAllTime, 0) AS hires_all_time,
+               IF(lb.MonthStart = %s, lb.ReferralsMonth, 0) AS referrals_monthly,
+               IF(lb.MonthStart = %s, lb.HiresMonth, 0) AS hires_monthly
+        FROM Staff s
+        JOIN Users u ON s.UserID = u.UserID
+        LEFT JOIN {LEADERBOARD_TABLE} lb ON lb.StaffID = s.StaffID
+        WHERE s.Role IN ({role_placeholders}) AND u.IsActive = 1
+        ORDER BY {order_by}
+    """, (month_start, month_start, *roles))
+    return cursor.fetchall()
+
+
+def get_referral_rollup(cursor, scope_sql, scope_params, months=6):
+    """
+    Sums the monthly rollup over active staff matching `scope_sql`, a condition
+    on `Staff s` (e.g. "s.TeamID = %s"). Returns ({status: count} all-time,
+    [{'month', 'total_referrals', 'total_hires'}] for the last `months` months).
+    The work depends on staff and months in scope, not on application history.
+    `cursor` must be a dictionary cursor.
+    """
+    scope_from = f"""
+        FROM {ROLLUP_TABLE} r
+        JOIN Staff s ON s.StaffID = r.StaffID
+        JOIN Users u ON s.UserID = u.UserID
+        WHERE u.IsActive = 1 AND {scope_sql}
+    """
+    cursor.execute(f"SELECT r.Status, SUM(r.Applications) AS count {scope_from} GROUP BY r.Status", tuple(scope_params))
+    funnel = {row['Status']: int(row['count'] or 0) for row in cursor.fetchall() if row['count']}
+
+    first_month = _current_month_start()
+    for _ in range(months):
+        first_month = (first_month - datetime.timedelta(days=1)).replace(day=1)
+    cursor.execute(f"""
+        SELECT DATE_FORMAT(r.MonthStart, '%%Y-%%m') AS month,
+               SUM(r.Applications) AS total_referrals,
+               SUM(CASE WHEN r.Status = 'Hired' THEN r.Applications ELSE 0 END) AS total_hires
+        {scope_from} AND r.MonthStart >= %s
+        GROUP BY r.MonthStart HAVING total_referrals > 0 ORDER BY r.MonthStart ASC
+    """, (*scope_params, first_month))
+    return funnel, cursor.fetchall()
+
+
+# --- Full Reconciliation ---
+def ensure_leaderboard_table(conn):
+    """Creates the counter and rollup tables if needed. DDL commits implicitly, so never call this mid-transaction."""
+    global _table_ready
+    cursor = conn.cursor()
+    cursor.execute(_CREATE_TABLE_SQL)
+    cursor.execute(_CREATE_ROLLUP_SQL)
+    cursor.close()
+    _table_ready = True
+
+
+def _sync_table(conn, table, key_columns, value_columns, computed):
+    """
+    Makes `table` match `computed` ({key tuple: value tuple}) by writing only the
+    rows that differ, in one short transaction. An incremental update landing
+    between the aggregate read and this write may be overwritten with the
+    slightly older value; the next run corrects it. Returns the number of rows changed.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {', '.join(key_columns + value_columns)} FROM {table}")
+        width = len(key_columns)
+        current = {tuple(row[:width]): tuple(row[width:]) for row in cursor.fetchall()}
+        conn.rollback()  # end the read snapshot before writing
+
+        changed = [key + values for key, values in computed.items() if current.get(key) != values]
+        removed = [key for key in current if key not in computed]
+        if not changed and not removed:
+            return 0
+        columns = key_columns + value_columns
+        conn.start_transaction()
+        if changed:
+            cursor.executemany(f"""
+                INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})
+                ON DUPLICATE KEY UPDATE {', '.join(f'{column} = VALUES({column})' for column in value_columns)}
+            """, changed)
+        if removed:
+            key_match = ' AND '.join(f"{column} = %s" for column in key_columns)
+            cursor.executemany(f"DELETE FROM {table} WHERE {key_match}", removed)
+        conn.commit()
+        return len(changed) + len(removed)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _compute_counters(conn):
+    """Per-staff counters from JobApplications, read without locking: {(StaffID,): (all-time and month counters)}."""
+    month_start = _current_month_start()
+    cursor = conn.cursor()
+    conn.rollback()  # start from a fresh snapshot; a plain SELECT is a non-locking consistent read
+    cursor.execute("""
+        SELECT ReferringStaffID,
+               COUNT(*),
+               SUM(CASE WHEN Status = 'Hired' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN ApplicationDate >= %s THEN 1 ELSE 0 END),
+               SUM(CASE WHEN Status = 'Hired' AND ApplicationDate >= %s THEN 1 ELSE 0 END)
+        FROM JobApplications
+        WHERE ReferringStaffID IS NOT NULL
+        GROUP BY ReferringStaffID
+    """, (month_start, month_start))
+    computed = {(staff_id,): (int(referrals), int(hires or 0), month_start, int(referrals_month or 0), int(hires_month or 0))
+                for staff_id, referrals, hires, referrals_month, hires_month in cursor.fetchall()}
+    cursor.close()
+    conn.rollback()
+    return computed
+
+
+def _compute_rollup(conn):
+    """The staff x month x status rollup from JobApplications, read without locking: {(StaffID, MonthStart, Status): (count,)}."""
+    cursor = conn.cursor()
+    conn.rollback()
+    cursor.execute("""
+        SELECT ReferringStaffID, DATE_SUB(DATE(ApplicationDate), INTERVAL DAYOFMONTH(ApplicationDate) - 1 DAY) AS MonthStart,
+               Status, COUNT(*)
+        FROM JobApplications
+        WHERE ReferringStaffID IS NOT NULL AND ApplicationDate IS NOT NULL AND Status IS NOT NULL
+        GROUP BY ReferringStaffID, MonthStart, Status
+    """)
+    computed = {(staff_id, month_start, status): (int(count),) for staff_id, month_start, status, count in cursor.fetchall()}
+    cursor.close()
+    conn.rollback()
+    return computed
+
+
+def reconcile_leaderboard():
+    """
+    Rebuilds every counter and the monthly rollup from JobApplications. Guarded by a MySQL named lock so
+    only one worker runs it at a time. The aggregates are computed with plain
+    (non-locking) reads and only differing rows are written afterwards, so
+    application inserts and status updates are never blocked by the scan.
+    Returns the number of staff counted, or None if another process holds the
+    lock or the database is unavailable.
+    """
+    conn = get_db_connection()
+    if not conn:
+        current_app.logger.error("Leaderboard reconciliation skipped: database connection failed.")
+        return None
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (_RECONCILE_LOCK_NAME,))
+        if not cursor.fetchone()[0]:
+            return None
+        try:
+            ensure_leaderboard_table(conn)
+            counters = _compute_counters(conn)
+            counters_changed = _sync_table(conn, LEADERBOARD_TABLE, ['StaffID'],
+                                           ['ReferralsAllTime', 'HiresAllTime', 'MonthStart', 'ReferralsMonth', 'HiresMonth'], counters)
+            rollup = _compute_rollup(conn)
+            rollup_changed = _sync_table(conn, ROLLUP_TABLE, ['StaffID', 'MonthStart', 'Status'], ['Applications'], rollup)
+            current_app.logger.info(f"Leaderboard reconciled: {len(counters)} staff counted, "
+                                    f"{counters_changed} counter and {rollup_changed} rollup rows corrected.")
+            return len(counters)
+        except Exception as e:
+            conn.rollback()
+            current_app.logger.error(f"Leaderboard reconciliation failed: {e}", exc_info=True)
+            return None
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_RECONCILE_LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _is_leaderboard_empty():
+    conn = get_db_connection()
+    if not conn:
+        return False
+    try:
+        ensure_leaderboard_table(conn)
+        cursor = conn.cursor()
+        empty = False
+        for table in (LEADERBOARD_TABLE, ROLLUP_TABLE):
+            cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+            empty = empty or cursor.fetchone() is None
+        cursor.close()
+        return empty
+    finally:
+        conn.close()
+
+
+def _reconcile_loop(app):
+    with app.app_context():
+        try:
+            if _is_leaderboard_empty():
+                reconcile_leaderboard()
+        except Exception as e:
+            app.logger.error(f"Initial leaderboard check failed: {e}", exc_info=True)
+    while True:
+        # Jitter keeps the workers from all waking at the same moment.
+        time.sleep(LEADERBOARD_RECONCILE_INTERVAL + random.uniform(0, 60))
+        with app.app_context():
+            try:
+                reconcile_leaderboard()
+            except Exception as e:
+                app.logger.error(f"Periodic leaderboard reconciliation failed: {e}", exc_info=True)
+
+
+def _ensure_reconcile_thread(app):
+    """Starts the reconciliation thread once per process, on its first request (after gunicorn has forked)."""
+    global _reconcile_thread_pid
+    if _reconcile_thread_pid == os.getpid():
+        return
+    with _reconcile_thread_lock:
+        if _reconcile_thread_pid == os.getpid():
+            return
+        _reconcile_thread_pid = os.getpid()
+        threading.Thread(target=_reconcile_loop, args=(app,), name='leaderboard-reconcile', daemon=True).start()
+
+
+def init_leaderboard(app):
+    """
+    Creates the table, registers `flask reconcile-leaderboard` and arranges for
+    each worker to start the periodic reconciliation thread. No thread runs
+    during app creation, so a preloading master forks workers from a process
+    without one.
+    """
+    with app.app_context():
+        conn = get_db_connection()
+        if conn:
+            try:
+                ensure_leaderboard_table(conn)
+            except Exception as e:
+                app.logger.error(f"Could not create the leaderboard table: {e}", exc_info=True)
+            finally:
+                conn.close()
+
+    @app.cli.command('reconcile-leaderboard')
+    def reconcile_leaderboard_command():
+        """Rebuild the recruiter leaderboard counters and monthly referral rollup from JobApplications."""
+        rows = reconcile_leaderboard()
+        click.echo(f"Leaderboard reconciled ({rows} staff rows)." if rows is not None else "Reconciliation skipped or failed; see the log.")
+
+    if LEADERBOARD_RECONCILE_INTERVAL > 0:
+        app.before_request(lambda: _ensure_reconcile_thread(app))
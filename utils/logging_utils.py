@@ -1,10 +1,10 @@
 # utils/logging_utils.py
 from flask import request
 from flask_login import current_user
-from db import get_db_connection
+from utils.telemetry import record_audit
 
 def log_audit(action, target_entity_type=None, target_entity_id=None, details=""):
-    """Records an action to the AuditLog table."""
+    """Records an action to the AuditLog table (queued and written in batches)."""
     try:
         user_id = current_user.id if current_user.is_authenticated else None
         
@@ -16,21 +16,7 @@ def log_audit(action, target_entity_type=None, target_entity_id=None, details=""
             ip_address = request.remote_addr
         # --- END IP LOGIC ---
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        sql = """
-            INSERT INTO AuditLog 
-            (UserID, IPAddress, Action, TargetEntityType, TargetEntityID, Details)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        params = (user_id, ip_address, action, target_entity_type, target_entity_id, details)
-        
-        cursor.execute(sql, params)
-        conn.commit()
+        record_audit(user_id, ip_address, action, target_entity_type, target_entity_id, details)
     except Exception as e:
         from flask import current_app
         current_app.logger.error(f"Failed to write to AuditLog: {e}")
-    finally:
-        if 'conn' in locals() and conn.is_connected():
-            conn.close()
\ No newline at end of file
@@ -0,0 +1,172 @@
+# utils/media_worker.py
+import concurrent.futures
+import concurrent.futures.process
+import multiprocessing
+import os
+import threading
+import click
+from flask import current_app, url_for
+from utils.cache_utils import TTLCache
+
+# Uploaded images are served through fixed-size variants so list pages do not
+# download full-resolution photos and logos. After an image is stored, a
+# process pool renders each size in MEDIA_VARIANTS as WebP (plus a JPEG
+# fallback) next to the original: photo.<variant>.webp / photo.<variant>.jpg.
+# Variant names are derived from the source path, so templates resolve them
+# with the `media_url` helper without a database lookup and fall back to the
+# original until the worker has finished.
+MEDIA_VARIANTS = {'sm': 96, 'md': 192, 'lg': 480}  # longest side in pixels (2x the usual avatar/logo boxes)
+MEDIA_WORKERS = int(os.getenv('MEDIA_WORKERS', 2))  # processes per gunicorn worker, 0 renders inline
+MEDIA_WEBP_QUALITY = int(os.getenv('MEDIA_WEBP_QUALITY', 80))
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp'}
+
+_pool = None
+_pool_lock = threading.Lock()
+_variant_lookup = TTLCache(maxsize=4096, ttl=60)  # (source, variant) -> variant path, '' while not rendered
+
+
+def variant_paths(relative_path, variant):
+    """(webp, jpeg) paths of a variant, relative to the static folder."""
+    stem = relative_path.rsplit('.', 1)[0]
+    return f"{stem}.{variant}.webp", f"{stem}.{variant}.jpg"
+
+
+def _is_image(relative_path):
+    return bool(relative_path) and relative_path.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS
+
+
+def _render_variants(static_folder, relative_path, variants, webp_quality):
+    """Runs in a pool process. Renders every variant of one image; returns the paths written."""
+    from PIL import Image, ImageOps  # imported in the worker process only
+
+    source = os.path.join(static_folder, *relative_path.split('/'))
+    written = []
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ('RGBA', 'LA') or (original.mode == 'P' and 'transparency' in original.info)
+        for variant, size in variants.items():
+            image = original.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            webp_path, jpeg_path = variant_paths(relative_path, variant)
+            for target, fmt in ((webp_path, 'WEBP'), (jpeg_path, 'JPEG')):
+                rendered = image.convert('RGBA' if has_alpha and fmt == 'WEBP' else 'RGB')
+                destination = os.path.join(static_folder, *target.split('/'))
+                temp_destination = destination + '.part'
+                rendered.save(temp_destination, fmt, quality=webp_quality if fmt == 'WEBP' else 85, optimize=True)
+                os.replace(temp_destination, destination)
+                written.append(target)
+    return written
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn' keeps the children free of the parent's threads and DB pool.
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=MEDIA_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        broken, _pool = _pool, None
+    if broken is not None:
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _missing_variants(static_folder, relative_path):
+    return {variant: size for variant, size in MEDIA_VARIANTS.items()
+            if not os.path.exists(os.path.join(static_folder, *variant_paths(relative_path, variant)[0].split('/')))}
+
+
+def schedule_media_variants(relative_path):
+    """
+    Queues thumbnail rendering for a stored image (no-op for other files or
+    when every variant exists). Returns the Future, or None if nothing was queued.
+    With MEDIA_WORKERS=0 the variants are rendered before this returns.
+    """
+    if not _is_image(relative_path) or relative_path.startswith(('http://', 'https://', '/')):
+        return None
+    static_folder = current_app.static_folder
+    missing = _missing_variants(static_folder, relative_path)
+    if not missing:
+        return None
+    logger = current_app.logger
+    if MEDIA_WORKERS <= 0:
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(_render_variants(static_folder, relative_path, missing, MEDIA_WEBP_QUALITY))
+        except Exception as e:
+            future.set_exception(e)
+    else:
+        future = _get_pool().submit(_render_variants, static_folder, relative_path, missing, MEDIA_WEBP_QUALITY)
+
+    def _done(finished):
+        error = finished.exception()
+        if error:
+            if isinstance(error, concurrent.futures.process.BrokenProcessPool):
+                _discard_pool()  # a crashed child poisons the executor; start a fresh one next time
+            logger.error(f"Could not render media variants for {relative_path}: {error}")
+        else:
+            for variant in missing:
+                _variant_lookup.pop((relative_path, variant))
+    future.add_done_callback(_done)
+    return future
+
+
+def resolve_media_variant(relative_path, variant):
+    """The variant's path relative to static if it has been rendered, otherwise the original path."""
+    if variant not in MEDIA_VARIANTS or not _is_image(relative_path):
+        return relative_path
+    key = (relative_path, variant)
+    cached = _variant_lookup.get(key)
+    if cached is None:
+        webp_path = variant_paths(relative_path, variant)[0]
+        exists = os.path.exists(os.path.join(current_app.static_folder, *webp_path.split('/')))
+        cached = webp_path if exists else ''
+        _variant_lookup.set(key, cached)
+    return cached or relative_path
+
+
+def media_url(path, variant='md', default=None):
+    """
+    Template helper: URL of an uploaded image at a size variant ('sm', 'md',
+    'lg'), e.g. {{ media_url(user.ProfilePictureURL, 'sm', 'images/default-profile.png') }}.
+    Absolute URLs are returned unchanged; `default` is a static file used when path is empty.
+    """
+    if not path:
+        return url_for('static', filename=default) if default else ''
+    if path.startswith(('http://', 'https://', '/')):
+        return path
+    return url_for('static', filename=resolve_media_variant(path, variant))
+
+
+def generate_missing_variants(subfolder=''):
+    """Queues variants for every image under static/uploads/<subfolder>. Returns the number queued."""
+    static_folder = current_app.static_folder
+    root = os.path.join(static_folder, 'uploads', subfolder)
+    futures = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            stem = filename.rsplit('.', 1)[0]
+            if '.' in stem and stem.rsplit('.', 1)[-1] in MEDIA_VARIANTS:
+                continue  # a variant itself
+            relative_path = os.path.relpath(os.path.join(directory, filename), static_folder).replace(os.sep, '/')
+            future = schedule_media_variants(relative_path)
+            if future is not None:
+                futures.append(future)
+    concurrent.futures.wait(futures)
+    return len(futures)
+
+
+def init_media_worker(app):
+    """Registers the `media_url` template helper and `flask generate-media-variants`."""
+    app.jinja_env.globals['media_url'] = media_url
+
+    @app.cli.command('generate-media-variants')
+    @click.argument('subfolder', default='')
+    def generate_media_variants_command(subfolder):
+        """Render thumbnails for images uploaded before the media worker existed."""
+        count = generate_missing_variants(subfolder)
+        click.echo(f"Rendered variants for {count} image(s).")
@@ -0,0 +1,161 @@
+# utils/org_hierarchy.py
+import os
+import threading
+import time
+from db import get_db_connection
+
+# The reporting tree (Staff.ReportsToStaffID) is small and read on nearly every
+# AM and staff page for authorization, so each worker keeps it in memory and
+# answers ancestor/descendant questions without touching MySQL. Writers call
+# invalidate_org_hierarchy() after committing a leader or role change; other
+# workers reload once their copy is older than ORG_HIERARCHY_TTL, the same
+# bound the identity cache uses.
+ORG_HIERARCHY_TTL = int(os.getenv('ORG_HIERARCHY_TTL', 60))
+
+
+def _as_id(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+class OrgHierarchy:
+    """An immutable snapshot of the reporting tree."""
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.parent = {}
+        self.roles = {}
+        self.children = {}
+        for row in rows:
+            staff_id = row['StaffID']
+            self.parent[staff_id] = row['ReportsToStaffID']
+            self.roles[staff_id] = row['Role']
+        for staff_id, leader_id in self.parent.items():
+            if leader_id is not None:
+                self.children.setdefault(leader_id, []).append(staff_id)
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    def chain(self, staff_id):
+        """Leaders above staff_id, nearest first. Stops at a loop in bad data instead of spinning."""
+        cached = self._chains.get(staff_id)
+        if cached is not None:
+            return cached
+        chain, seen = [], {staff_id}
+        leader_id = self.parent.get(staff_id)
+        while leader_id is not None and leader_id not in seen:
+            chain.append(leader_id)
+            seen.add(leader_id)
+            leader_id = self.parent.get(leader_id)
+        result = (tuple(chain), frozenset(chain))
+        with self._lock:
+            self._chains[staff_id] = result
+        return result
+
+    def ancestors(self, staff_id):
+        return self.chain(staff_id)[0]
+
+    def is_ancestor(self, ancestor_id, staff_id):
+        """True if ancestor_id is somewhere above staff_id in the reporting chain."""
+        return ancestor_id in self.chain(staff_id)[1]
+
+    def descendants(self, staff_id):
+        """Everyone who reports to staff_id, directly or indirectly."""
+        found, stack = set(), list(self.children.get(staff_id, ()))
+        while stack:
+            current = stack.pop()
+            if current in found or current == staff_id:
+                continue
+            found.add(current)
+            stack.extend(self.children.get(current, ()))
+        return found
+
+    def would_create_cycle(self, staff_id, new_leader_id):
+        """True if making new_leader_id the leader of staff_id would close a reporting loop."""
+        if new_leader_id is None:
+            return False
+        return new_leader_id == staff_id or self.is_ancestor(staff_id, new_leader_id)
+
+
+class _HierarchyHolder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < ORG_HIERARCHY_TTL:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - snapshot.loaded_at < ORG_HIERARCHY_TTL:
+                return snapshot
+            version = self._version
+            conn = get_db_connection()
+            if not conn:
+                raise RuntimeError("Database connection failed while loading the org hierarchy.")
+            try:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("SELECT StaffID, ReportsToStaffID, Role FROM Staff")
+                snapshot = OrgHierarchy(cursor.fetchall(), version)
+                cursor.close()
+            finally:
+                conn.close()
+            if version == self._version:
+                self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+    @property
+    def version(self):
+        return self._version
+
+
+_holder = _HierarchyHolder()
+
+
+def get_org_hierarchy():
+    """The current snapshot, reloaded when invalidated or older than ORG_HIERARCHY_TTL."""
+    return _holder.get()
+
+
+def invalidate_org_hierarchy():
+    """Call after committing any change to Staff.ReportsToStaffID or Staff.Role, or adding/removing staff."""
+    _holder.invalidate()
+
+
+def get_org_version():
+    """Bumped by every invalidation in this worker."""
+    return _holder.version
+
+
+def is_ancestor(ancestor_staff_id, staff_id):
+    ancestor_staff_id, staff_id = _as_id(ancestor_staff_id), _as_id(staff_id)
+    if ancestor_staff_id is None or staff_id is None:
+        return False
+    return get_org_hierarchy().is_ancestor(ancestor_staff_id, staff_id)
+
+
+def manages_or_is(staff_id, target_staff_id):
+    """True if staff_id is target_staff_id or anywhere above it."""
+    staff_id, target_staff_id = _as_id(staff_id), _as_id(target_staff_id)
+    if staff_id is None or target_staff_id is None:
+        return False
+    return staff_id == target_staff_id or get_org_hierarchy().is_ancestor(staff_id, target_staff_id)
+
+
+def get_descendants(staff_id):
+    staff_id = _as_id(staff_id)
+    return get_org_hierarchy().descendants(staff_id) if staff_id is not None else set()
+
+
+def would_create_cycle(staff_id, new_leader_staff_id):
+    return get_org_hierarchy().would_create_cycle(_as_id(staff_id), _as_id(new_leader_staff_id))
@@ -0,0 +1,79 @@
+# utils/package_catalog.py
+import os
+from db import get_db_connection
+from utils.cache_utils import TTLCache
+
+# The public /courses page renders the whole package tree on every hit. The tree
+# is cached per worker; package edits clear it (bumping the catalog version) and
+# the TTL bounds how long other workers may serve the previous version.
+_catalog_cache = TTLCache(maxsize=4, ttl=int(os.getenv('PACKAGE_CATALOG_CACHE_TTL', 300)))
+
+
+def load_package_catalog(cursor, active_only=False):
+    """
+    Loads MainPackages with their 'languages' (list of names) and 'sub_packages'
+    (list of rows) in three queries instead of two per package.
+    `cursor` must be a dictionary cursor.
+    """
+    active_filter = " WHERE IsActive = TRUE" if active_only else ""
+    cursor.execute(f"SELECT * FROM MainPackages{active_filter} ORDER BY Name")
+    main_packages = cursor.fetchall()
+    if not main_packages:
+        return []
+
+    by_id = {}
+    for package in main_packages:
+        package['languages'] = []
+        package['sub_packages'] = []
+        by_id[package['PackageID']] = package
+
+    cursor.execute("""
+        SELECT mpl.PackageID, l.LanguageName
+        FROM MainPackageLanguages mpl
+        JOIN Languages l ON mpl.LanguageID = l.LanguageID
+    """)
+    for row in cursor.fetchall():
+        package = by_id.get(row['PackageID'])
+        if package is not None:
+            package['languages'].append(row['LanguageName'])
+
+    sub_filter = " WHERE IsActive = TRUE" if active_only else ""
+    cursor.execute(f"SELECT * FROM SubPackages{sub_filter} ORDER BY MainPackageID, DisplayOrder, Name")
+    for sub_package in cursor.fetchall():
+        package = by_id.get(sub_package['MainPackageID'])
+        if package is not None:
+            package['sub_packages'].append(sub_package)
+
+    return main_packages
+
+
+def get_public_package_catalog():
+    """
+    Returns the active package tree, from cache when possible. The returned list
+    is shared between requests and must be treated as read-only.
+    """
+    catalog = _catalog_cache.get('public')
+    if catalog is not None:
+        return catalog
+
+    version = _catalog_cache.version
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        catalog = load_package_catalog(cursor, active_only=True)
+        cursor.close()
+    finally:
+        if conn: conn.close()
+    # Skip caching if an edit invalidated the catalog while it was being loaded.
+    if _catalog_cache.version == version:
+        _catalog_cache.set('public', catalog)
+    return catalog
+
+
+def invalidate_package_catalog():
+    """Call after any change to MainPackages, SubPackages or MainPackageLanguages."""
+    _catalog_cache.clear()
+
+
+def get_package_catalog_version():
+    return _catalog_cache.version
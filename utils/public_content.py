@@ -0,0 +1,95 @@
+# utils/public_content.py
+import datetime
+import functools
+import hashlib
+import os
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from db import get_db_connection
+from utils.cache_utils import TTLCache
+
+# Anonymous traffic to the public pages (e.g. marketing bursts on '/') should
+# not translate into one database round trip per visit. Query results and, for
+# anonymous visitors, whole rendered pages are kept per worker. Job offer
+# writes clear both; the TTLs bound staleness in other workers and cover
+# offers that close by date.
+_content_cache = TTLCache(maxsize=32, ttl=int(os.getenv('PUBLIC_CONTENT_CACHE_TTL', 60)))
+_page_cache = TTLCache(maxsize=64, ttl=int(os.getenv('PUBLIC_PAGE_CACHE_TTL', 30)))
+PUBLIC_PAGE_CACHE_ENABLED = os.getenv('PUBLIC_PAGE_CACHE', 'True').lower() in ['true', '1', 't']
+
+_last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+
+def get_recent_open_offers(limit=3):
+    """Most recently posted open offers for the homepage, cached. Treat the result as read-only."""
+    key = ('recent_open_offers', limit)
+    offers = _content_cache.get(key)
+    if offers is not None:
+        return offers
+
+    version = _content_cache.version
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT
+                jo.OfferID, jo.Title, c.CompanyName, jo.Location
+            FROM JobOffers jo
+            JOIN Companies c ON jo.CompanyID = c.CompanyID
+            WHERE jo.Status = 'Open' AND (jo.ClosingDate IS NULL OR jo.ClosingDate >= CURDATE())
+            ORDER BY  jo.DatePosted DESC
+            LIMIT %s
+        """, (limit,))
+        offers = cursor.fetchall()
+        cursor.close()
+    finally:
+        if conn: conn.close()
+    if _content_cache.version == version:
+        _content_cache.set(key, offers)
+    return offers
+
+
+def invalidate_public_content():
+    """Call after creating, editing, closing or deleting a job offer."""
+    global _last_modified
+    _last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    _content_cache.clear()
+    _page_cache.clear()
+
+
+def skip_page_cache():
+    """Lets a view keep the current response out of the page cache, e.g. after a failed query."""
+    g.skip_public_page_cache = True
+
+
+def anonymous_page_cache(view):
+    """
+    Serves a cached copy of a public GET page to anonymous visitors, with an
+    ETag and Last-Modified so repeat visits can be answered with 304.
+    Logged-in users and requests with pending flash messages are always rendered.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if (not PUBLIC_PAGE_CACHE_ENABLED or request.method != 'GET'
+                or current_user.is_authenticated or session.get('_flashes')):
+            return view(*args, **kwargs)
+
+        key = (request.endpoint, request.full_path)
+        entry = _page_cache.get(key)
+        if entry is None:
+            version = _page_cache.version
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or g.get('skip_public_page_cache'):
+                return response
+            body = response.get_data()
+            entry = (body, response.mimetype, hashlib.sha1(body).hexdigest(), _last_modified)
+            if _page_cache.version == version:
+                _page_cache.set(key, entry)
+
+        body, mimetype, etag, last_modified = entry
+        response = current_app.response_class(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True  # browsers revalidate, which the ETag makes cheap
+        return response.make_conditional(request)
+    return wrapper
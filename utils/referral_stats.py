@@ -0,0 +1,38 @@
+# utils/referral_stats.py
+
+# Large IN lists are split so a single statement never grows unbounded.
+_CHUNK_SIZE = 500
+
+
+def get_referral_stats(cursor, staff_ids):
+    """
+    Returns all-time referral counts for many staff members at once:
+        {staff_id: {'hires': int, 'referrals': int}}
+    Every requested id is present in the result (zeros when nothing was referred).
+    `cursor` must be a dictionary cursor.
+    """
+    ids = sorted({int(staff_id) for staff_id in staff_ids if staff_id is not None})
+    stats = {staff_id: {'hires': 0, 'referrals': 0} for staff_id in ids}
+
+    for start in range(0, len(ids), _CHUNK_SIZE):
+        chunk = ids[start:start + _CHUNK_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f"""
+            SELECT ReferringStaffID,
+                   COUNT(*) AS referrals,
+                   SUM(CASE WHEN Status = 'Hired' THEN 1 ELSE 0 END) AS hires
+            FROM JobApplications
+            WHERE ReferringStaffID IN ({placeholders})
+            GROUP BY ReferringStaffID
+        """, tuple(chunk))
+        for row in cursor.fetchall():
+            stats[row['ReferringStaffID']] = {
+                'hires': int(row['hires'] or 0),
+                'referrals': int(row['referrals'] or 0)
+            }
+    return stats
+
+
+def get_staff_referral_stats(cursor, staff_id):
+    """Convenience wrapper for a single staff member."""
+    return get_referral_stats(cursor, [staff_id]).get(int(staff_id), {'hires': 0, 'referrals': 0})
@@ -0,0 +1,103 @@
+# utils/schema_options.py
+import os
+import re
+import threading
+import time
+from flask import current_app
+from db import get_db_connection
+
+# ENUM/SET definitions only change with a migration, so they are loaded for the
+# whole schema in a single INFORMATION_SCHEMA query and kept per process.
+SCHEMA_OPTIONS_TTL = int(os.getenv('SCHEMA_OPTIONS_TTL', 3600))
+
+_options = {}          # {(table_name, column_name): [values]}
+_loaded_at = None
+_version = 0
+_retry_after = 0       # after a failed load, wait before hitting the database again
+_lock = threading.Lock()
+
+
+def _parse_column_type(type_string):
+    """Turns "enum('A','B')" / "set('A','B')" into ['A', 'B']."""
+    if isinstance(type_string, (bytes, bytearray)):
+        type_string = type_string.decode('utf-8')
+    return re.findall(r"'(.*?)'", type_string or '')
+
+
+def load_schema_options(conn=None):
+    """
+    Loads every ENUM/SET column of the current database in one query.
+    Uses the given connection if provided, otherwise checks one out of the pool.
+    Returns True on success.
+    """
+    global _options, _loaded_at, _version, _retry_after
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+        if not conn:
+            _retry_after = time.monotonic() + 30
+            current_app.logger.error("Could not load schema options: database connection failed.")
+            return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND DATA_TYPE IN ('enum', 'set')
+        """)
+        loaded = {(row[0], row[1]): _parse_column_type(row[2]) for row in cursor.fetchall()}
+        cursor.close()
+        with _lock:
+            _options = loaded
+            _loaded_at = time.monotonic()
+            _version += 1
+        current_app.logger.info(f"Schema options loaded for {len(loaded)} ENUM/SET columns (version {_version}).")
+        return True
+    except Exception as e:
+        _retry_after = time.monotonic() + 30
+        current_app.logger.error(f"Could not load schema options: {e}", exc_info=True)
+        return False
+    finally:
+        if own_conn and conn and conn.is_connected(): conn.close()
+
+
+def _ensure_loaded(conn=None):
+    now = time.monotonic()
+    is_stale = _loaded_at is None or (now - _loaded_at) >= SCHEMA_OPTIONS_TTL
+    if is_stale and now >= _retry_after:
+        load_schema_options(conn)
+
+
+def get_column_options(table_name, column_name, conn=None):
+    """Returns the allowed values for an ENUM or SET column, loading the cache if needed."""
+    _ensure_loaded(conn)
+    values = _options.get((table_name, column_name))
+    if values is None:
+        current_app.logger.warning(f"No options found in schema for {table_name}.{column_name}. The column might not exist or is not an ENUM/SET.")
+        return []
+    return list(values)
+
+
+def get_table_options(table_name, column_names, conn=None):
+    """Returns {column_name: [values]} for several columns of one table."""
+    return {col: get_column_options(table_name, col, conn) for col in column_names}
+
+
+def invalidate_schema_options():
+    """Forces a reload on next access, e.g. after running a migration."""
+    global _loaded_at, _retry_after
+    with _lock:
+        _loaded_at = None
+        _retry_after = 0
+
+
+def get_schema_options_version():
+    return _version
+
+
+def init_schema_options(app):
+    """Warms the cache at startup. A failure is logged and the cache loads lazily later."""
+    if os.getenv('SCHEMA_OPTIONS_PRELOAD', 'True').lower() not in ['true', '1', 't']:
+        return
+    with app.app_context():
+        load_schema_options()
@@ -0,0 +1,292 @@
+# utils/search.py
+import bisect
+import os
+import re
+import threading
+import time
+import click
+from db import get_db_connection
+
+# One query API for free-text search. Each entity can be served by MySQL
+# FULLTEXT indexes (created with `flask create-search-indexes`) or, where those
+# are missing, by a per-worker inverted index with prefix matching. Both
+# return ids ranked by relevance; callers fetch the rows with `WHERE id IN`.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto').lower()          # 'auto', 'fulltext' or 'memory'
+SEARCH_INDEX_TTL = int(os.getenv('SEARCH_INDEX_TTL', 120))            # seconds before an in-memory index is rebuilt
+SEARCH_RESULT_LIMIT = int(os.getenv('SEARCH_RESULT_LIMIT', 500))
+SEARCH_MIN_PREFIX = 2  # shorter query tokens must match a whole word
+# InnoDB's defaults; configure() reads the server's actual settings.
+DEFAULT_FT_MIN_TOKEN_SIZE = 3
+DEFAULT_FT_STOPWORDS = frozenset('a about an are as at be by com de en for from how i in is it la of on or that '
+                                 'the this to was what when where who will with und www'.split())
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# 'documents' loads (id, field...) rows for the in-memory index; 'fields' gives
+# each field's weight. 'fulltext' lists the FULLTEXT-backed sources: the table
+# and columns to index and a query returning (id, score) for one MATCH clause.
+# With FULLTEXT every query word has to match within a single source.
+SEARCH_ENTITIES = {
+    'job_offers': {
+        'documents': """
+            SELECT jo.OfferID AS id, jo.Title, c.CompanyName
+            FROM JobOffers jo JOIN Companies c ON jo.CompanyID = c.CompanyID
+            WHERE jo.Status = 'Open'
+        """,
+        'fields': {'Title': 3, 'CompanyName': 1},
+        'fulltext': [
+            {'table': 'JobOffers', 'columns': ('Title',), 'weight': 3,
+             'sql': "SELECT OfferID AS id, {match} AS score FROM JobOffers WHERE Status = 'Open' AND {match}"},
+            {'table': 'Companies', 'columns': ('CompanyName',), 'weight': 1,
+             'sql': "SELECT jo.OfferID AS id, {match} AS score FROM Companies JOIN JobOffers jo ON jo.CompanyID = Companies.CompanyID WHERE jo.Status = 'Open' AND {match}"},
+        ],
+    },
+    'announcements': {
+        'documents': "SELECT AnnouncementID AS id, Title, Content FROM SystemAnnouncements WHERE IsActive = 1",
+        'fields': {'Title': 3, 'Content': 1},
+        'fulltext': [
+            {'table': 'SystemAnnouncements', 'columns': ('Title', 'Content'), 'weight': 1,
+             'sql': "SELECT AnnouncementID AS id, {match} AS score FROM SystemAnnouncements WHERE IsActive = 1 AND {match}"},
+        ],
+    },
+    'staff': {
+        'documents': """
+            SELECT s.StaffID AS id, u.FirstName, u.LastName, u.Email
+            FROM Staff s JOIN Users u ON s.UserID = u.UserID
+        """,
+        'fields': {'FirstName': 3, 'LastName': 3, 'Email': 1},
+        'fulltext': [
+            {'table': 'Users', 'columns': ('FirstName', 'LastName', 'Email'), 'weight': 1,
+             'sql': "SELECT s.StaffID AS id, {match} AS score FROM Users JOIN Staff s ON s.UserID = Users.UserID WHERE {match}"},
+        ],
+    },
+}
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(str(text).lower()) if text else []
+
+
+def _fulltext_index_name(source):
+    return f"ft_{source['table']}_{'_'.join(source['columns'])}".lower()
+
+
+class InvertedIndex:
+    """Token -> {id: weight} postings with a sorted vocabulary for prefix lookups."""
+
+    def __init__(self, rows, fields):
+        postings = {}
+        for row in rows:
+            doc_id = row['id']
+            for field, weight in fields.items():
+                for token in tokenize(row.get(field)):
+                    bucket = postings.setdefault(token, {})
+                    bucket[doc_id] = bucket.get(doc_id, 0) + weight
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+        self.documents = len(rows)
+        self.built_at = time.monotonic()
+
+    def _matches(self, token):
+        """Scores for every document containing a word that starts with `token` (exact words score double)."""
+        scores = dict((doc_id, weight * 2) for doc_id, weight in self.postings.get(token, {}).items())
+        if len(token) < SEARCH_MIN_PREFIX:
+            return scores
+        position = bisect.bisect_right(self.vocabulary, token)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(token):
+            for doc_id, weight in self.postings[self.vocabulary[position]].items():
+                scores[doc_id] = scores.get(doc_id, 0) + weight
+            position += 1
+        return scores
+
+    def search(self, tokens, limit):
+        totals = None
+        for token in tokens:  # every query word must match (AND)
+            matches = self._matches(token)
+            if totals is None:
+                totals = matches
+            else:
+                totals = {doc_id: score + matches[doc_id] for doc_id, score in totals.items() if doc_id in matches}
+            if not totals:
+                return []
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], -item[0]))  # ties: newest id first
+        return [doc_id for doc_id, _ in ranked[:limit]]
+
+
+class SearchService:
+    def __init__(self, entities):
+        self.entities = entities
+        self._backends = {}  # entity -> 'fulltext' | 'memory'
+        self._indexes = {}
+        self._lock = threading.Lock()
+        # Words InnoDB never indexes: shorter than innodb_ft_min_token_size, or stopwords.
+        self._ft_min_token_size = DEFAULT_FT_MIN_TOKEN_SIZE
+        self._ft_stopwords = DEFAULT_FT_STOPWORDS
+
+    def configure(self, cursor):
+        """Chooses a backend per entity from SEARCH_BACKEND and the FULLTEXT indexes that exist."""
+        cursor.execute("""
+            SELECT DISTINCT LOWER(INDEX_NAME) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND INDEX_TYPE = 'FULLTEXT'
+        """)
+        existing = {row[0] for row in cursor.fetchall()}
+        self._load_fulltext_limits(cursor)
+        for entity, spec in self.entities.items():
+            has_fulltext = all(_fulltext_index_name(source) in existing for source in spec['fulltext'])
+            if SEARCH_BACKEND == 'fulltext' or (SEARCH_BACKEND == 'auto' and has_fulltext):
+                self._backends[entity] = 'fulltext'
+            else:
+                self._backends[entity] = 'memory'
+        return dict(self._backends)
+
+    def _load_fulltext_limits(self, cursor):
+        """Reads the server's FULLTEXT token limits; the InnoDB defaults stay in place if they cannot be read."""
+        try:
+            self._read_fulltext_limits(cursor)
+        except Exception:
+            self._ft_min_token_size, self._ft_stopwords = DEFAULT_FT_MIN_TOKEN_SIZE, DEFAULT_FT_STOPWORDS
+
+    def _read_fulltext_limits(self, cursor):
+        cursor.execute("SELECT @@innodb_ft_min_token_size, @@innodb_ft_enable_stopword, @@innodb_ft_server_stopword_table")
+        min_token_size, stopwords_enabled, stopword_table = cursor.fetchone()
+        self._ft_min_token_size = int(min_token_size)
+        if not stopwords_enabled:
+            self._ft_stopwords = frozenset()
+            return
+        if stopword_table:  # 'db_name/table_name'
+            cursor.execute("SELECT value FROM `{}`.`{}`".format(*stopword_table.split('/', 1)))
+        else:
+            cursor.execute("SELECT value FROM information_schema.INNODB_FT_DEFAULT_STOPWORD")
+        self._ft_stopwords = frozenset(str(row[0]).lower() for row in cursor.fetchall())
+
+    def _fulltext_can_match(self, tokens):
+        """False if a token can never match through FULLTEXT (too short or a stopword)."""
+        return all(len(token) >= self._ft_min_token_size and token not in self._ft_stopwords for token in tokens)
+
+    def backend(self, entity):
+        return self._backends.get(entity, 'fulltext' if SEARCH_BACKEND == 'fulltext' else 'memory')
+
+    def search(self, entity, query, limit=SEARCH_RESULT_LIMIT, conn=None):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        own_conn = conn is None
+        conn = conn or get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed for search.")
+        try:
+            # Queries such as "QA" or an email's "com" go to the in-memory index, which matches them as whole words.
+            if self.backend(entity) == 'fulltext' and self._fulltext_can_match(tokens):
+                return self._search_fulltext(conn, entity, tokens, limit)
+            return self._memory_index(conn, entity).search(tokens, limit)
+        finally:
+            if own_conn: conn.close()
+
+    def _search_fulltext(self, conn, entity, tokens, limit):
+        # Boolean mode, every word required, each word as a prefix.
+        boolean_query = ' '.join(f"+{token}*" for token in tokens)
+        totals = {}
+        cursor = conn.cursor(dictionary=True)
+        for source in self.entities[entity]['fulltext']:
+            columns = ', '.join(f"{source['table']}.{column}" for column in source['columns'])
+            match = f"MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)"
+            cursor.execute(source['sql'].format(match=match), (boolean_query, boolean_query))
+            for row in cursor.fetchall():
+                totals[row['id']] = totals.get(row['id'], 0) + float(row['score']) * source['weight']
+        cursor.close()
+        ranked = sorted(totals.items(), key=lambda item: -item[1])
+        return [doc_id for doc_id, _ in ranked[:limit]]
+
+    def _memory_index(self, conn, entity):
+        index = self._indexes.get(entity)
+        if index is not None and time.monotonic() - index.built_at < SEARCH_INDEX_TTL:
+            return index
+        spec = self.entities[entity]
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(spec['documents'])
+        index = InvertedIndex(cursor.fetchall(), spec['fields'])
+        cursor.close()
+        with self._lock:
+            self._indexes[entity] = index
+        return index
+
+    def invalidate(self, entities=()):
+        with self._lock:
+            if not entities:
+                self._indexes.clear()
+            for entity in entities:
+                self._indexes.pop(entity, None)
+
+    def stats(self):
+        return {entity: {'backend': self.backend(entity),
+                         'documents': self._indexes[entity].documents if entity in self._indexes else None}
+                for entity in self.entities}
+
+
+_service = SearchService(SEARCH_ENTITIES)
+
+
+def search(entity, query, limit=SEARCH_RESULT_LIMIT, conn=None):
+    """Returns the ids of `entity` matching `query`, most relevant first. Reuses `conn` when given."""
+    return _service.search(entity, query, limit, conn)
+
+
+def invalidate_search(*entities):
+    """Drops this worker's in-memory indexes (all of them when none are named) so the next search rebuilds them."""
+    _service.invalidate(entities)
+
+
+def order_by_rank(rows, ranked_ids, key):
+    """Sorts rows fetched with `WHERE key IN (ranked_ids)` back into relevance order."""
+    rank = {doc_id: position for position, doc_id in enumerate(ranked_ids)}
+    return sorted(rows, key=lambda row: rank.get(row[key], len(rank)))
+
+
+def get_search_stats():
+    return _service.stats()
+
+
+def create_fulltext_indexes(conn):
+    """Adds the FULLTEXT indexes listed in SEARCH_ENTITIES that do not exist yet. Returns the names created."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT DISTINCT LOWER(INDEX_NAME) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND INDEX_TYPE = 'FULLTEXT'
+    """)
+    existing = {row[0] for row in cursor.fetchall()}
+    created = []
+    for spec in SEARCH_ENTITIES.values():
+        for source in spec['fulltext']:
+            name = _fulltext_index_name(source)
+            if name in existing or name in created:
+                continue
+            cursor.execute(f"ALTER TABLE {source['table']} ADD FULLTEXT INDEX {name} ({', '.join(source['columns'])})")
+            created.append(name)
+    cursor.close()
+    return created
+
+
+def init_search(app):
+    """Picks the search backend per entity and registers `flask create-search-indexes`."""
+    with app.app_context():
+        conn = get_db_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                backends = _service.configure(cursor)
+                cursor.close()
+                app.logger.info(f"Search backends: {backends}")
+            except Exception as e:
+                app.logger.error(f"Could not detect FULLTEXT indexes, using in-memory search: {e}", exc_info=True)
+            finally:
+                conn.close()
+
+    @app.cli.command('create-search-indexes')
+    def create_search_indexes_command():
+        """Add the MySQL FULLTEXT indexes used by search (run once, off-peak)."""
+        conn = get_db_connection()
+        try:
+            created = create_fulltext_indexes(conn)
+            click.echo(f"Created: {', '.join(created)}" if created else "All search indexes already exist.")
+        finally:
+            conn.close()
@@ -0,0 +1,166 @@
+# utils/static_assets.py
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import click
+from flask import current_app, request, send_from_directory
+
+# Build step + runtime for static files. `flask build-static` (or
+# `python -m utils.static_assets` in an image build) copies every static asset
+# to static/build/ under a content-hashed name, writes .gz and .br siblings for
+# text assets, and records the mapping in static/build/manifest.json. At
+# runtime url_for('static', filename=...) is rewritten through the manifest
+# and fingerprinted files are served with a one-year immutable Cache-Control,
+# preferring the precompressed sibling the browser accepts. Without a manifest
+# (local development) static files are served exactly as before.
+BUILD_SUBFOLDER = 'build'
+MANIFEST_NAME = 'manifest.json'
+SKIPPED_SUBFOLDERS = {BUILD_SUBFOLDER, 'uploads', 'src'}  # uploads are user content; src is the Tailwind input
+COMPRESSIBLE_EXTENSIONS = {'css', 'js', 'mjs', 'map', 'json', 'svg', 'txt', 'xml', 'html', 'ico', 'ttf', 'otf', 'eot'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Content-addressed uploads (utils/upload_storage.py) never change either.
+IMMUTABLE_PREFIXES = (f'{BUILD_SUBFOLDER}/', 'uploads/blobs/')
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip siblings are still written
+    brotli = None
+
+_manifest = {}
+_compressed = {}  # fingerprinted path -> {'br', 'gzip'} siblings that exist
+
+
+def _fingerprinted_name(relative_path, digest):
+    directory, filename = os.path.split(relative_path)
+    stem, dot, extension = filename.rpartition('.')
+    fingerprinted = f"{stem}.{digest}.{extension}" if dot else f"{filename}.{digest}"
+    return '/'.join(part for part in (BUILD_SUBFOLDER, directory.replace(os.sep, '/'), fingerprinted) if part)
+
+
+def build_static_manifest(static_folder):
+    """Fingerprints and precompresses every static asset. Returns the manifest written."""
+    build_root = os.path.join(static_folder, BUILD_SUBFOLDER)
+    staging_root = build_root + '.tmp'
+    shutil.rmtree(staging_root, ignore_errors=True)
+    manifest, compressed = {}, {}
+
+    for directory, subfolders, filenames in os.walk(static_folder):
+        if directory == static_folder:
+            subfolders[:] = [name for name in subfolders if name not in SKIPPED_SUBFOLDERS and not name.startswith('.')]
+        for filename in filenames:
+            if filename.startswith('.'):
+                continue
+            source = os.path.join(directory, filename)
+            relative_path = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as source_file:
+                content = source_file.read()
+            target = _fingerprinted_name(relative_path, hashlib.sha256(content).hexdigest()[:12])
+            target_on_disk = os.path.join(staging_root, *target.split('/')[1:])
+            os.makedirs(os.path.dirname(target_on_disk), exist_ok=True)
+            with open(target_on_disk, 'wb') as target_file:
+                target_file.write(content)
+            manifest[relative_path] = target
+
+            if filename.rsplit('.', 1)[-1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            siblings = []
+            gzipped = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(gzipped) < len(content):
+                with open(target_on_disk + '.gz', 'wb') as gz_file:
+                    gz_file.write(gzipped)
+                siblings.append('gzip')
+            if brotli is not None:
+                brotlied = brotli.compress(content, quality=11)
+                if len(brotlied) < len(content):
+                    with open(target_on_disk + '.br', 'wb') as br_file:
+                        br_file.write(brotlied)
+                    siblings.append('br')
+            if siblings:
+                compressed[target] = siblings
+
+    with open(os.path.join(staging_root, MANIFEST_NAME), 'w') as manifest_file:
+        json.dump({'assets': manifest, 'compressed': compressed}, manifest_file, indent=1, sort_keys=True)
+    # Swap the finished build in, so a running app never sees a half-written directory.
+    previous_root = build_root + '.old'
+    shutil.rmtree(previous_root, ignore_errors=True)
+    if os.path.exists(build_root):
+        os.replace(build_root, previous_root)
+    os.replace(staging_root, build_root)
+    shutil.rmtree(previous_root, ignore_errors=True)
+    return manifest
+
+
+def load_static_manifest(static_folder):
+    """Loads static/build/manifest.json into this process. Returns the number of assets mapped."""
+    global _manifest, _compressed
+    path = os.path.join(static_folder, BUILD_SUBFOLDER, MANIFEST_NAME)
+    if not os.path.exists(path):
+        _manifest, _compressed = {}, {}
+        return 0
+    with open(path) as manifest_file:
+        data = json.load(manifest_file)
+    _manifest = data.get('assets', {})
+    _compressed = {target: set(siblings) for target, siblings in data.get('compressed', {}).items()}
+    return len(_manifest)
+
+
+def _rewrite_static_url(endpoint, values):
+    """url_defaults hook: points url_for('static', filename=...) at the fingerprinted copy."""
+    if endpoint == 'static' and _manifest:
+        filename = values.get('filename')
+        if filename:
+            values['filename'] = _manifest.get(filename.lstrip('/'), filename)
+
+
+def _accepted_encoding(filename):
+    available = _compressed.get(filename)
+    if not available:
+        return None
+    accepted = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding in available and accepted[encoding]:
+            return encoding
+    return None
+
+
+def serve_static(filename):
+    """The app's static view: precompressed siblings for fingerprinted files, immutable caching where safe."""
+    static_folder = current_app.static_folder
+    encoding = _accepted_encoding(filename)
+    if encoding:
+        suffix = '.br' if encoding == 'br' else '.gz'
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(static_folder, filename + suffix, mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(static_folder, filename)
+    if filename in _compressed:
+        response.vary.add('Accept-Encoding')
+    if filename.startswith(IMMUTABLE_PREFIXES):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.expires = None
+    return response
+
+
+def init_static_assets(app):
+    """Loads the asset manifest, installs the url_for rewrite and static view, and registers `flask build-static`."""
+    count = load_static_manifest(app.static_folder)
+    app.logger.info(f"Static asset manifest: {count} fingerprinted file(s)." if count else
+                    "No static asset manifest found; serving static files unfingerprinted.")
+    app.url_defaults(_rewrite_static_url)
+    app.view_functions['static'] = serve_static
+
+    @app.cli.command('build-static')
+    def build_static_command():
+        """Fingerprint and precompress static assets into static/build/."""
+        manifest = build_static_manifest(app.static_folder)
+        click.echo(f"Built {len(manifest)} static asset(s) into static/{BUILD_SUBFOLDER}/.")
+
+
+if __name__ == '__main__':
+    # Image builds run this without creating the app (no database or secrets needed).
+    static_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+    print(f"Built {len(build_static_manifest(static_root))} static asset(s) into static/{BUILD_SUBFOLDER}/.")
@@ -0,0 +1,176 @@
+# utils/telemetry.py
+import atexit
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+from db import get_db_connection
+
+# Login history, audit and error rows are written behind the request: callers
+# enqueue a row and a background thread batches them into multi-row INSERTs.
+# The queue is bounded; when it is full new rows are dropped and counted
+# rather than slowing the request down.
+TELEMETRY_ASYNC = os.getenv('TELEMETRY_ASYNC', 'True').lower() in ['true', '1', 't']
+TELEMETRY_QUEUE_SIZE = int(os.getenv('TELEMETRY_QUEUE_SIZE', 10000))
+TELEMETRY_BATCH_SIZE = int(os.getenv('TELEMETRY_BATCH_SIZE', 200))
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv('TELEMETRY_FLUSH_INTERVAL', 2))  # seconds
+TELEMETRY_SHUTDOWN_TIMEOUT = float(os.getenv('TELEMETRY_SHUTDOWN_TIMEOUT', 5))  # seconds
+
+# Column order per table. The event timestamp is captured at enqueue time so
+# batching does not shift it.
+TELEMETRY_TABLES = {
+    'LoginHistory': ('UserID', 'EmailAttempt', 'IPAddress', 'UserAgent', 'Status', 'AttemptedAt'),
+    'AuditLog': ('UserID', 'IPAddress', 'Action', 'TargetEntityType', 'TargetEntityID', 'Details', 'Timestamp'),
+    'ErrorLog': ('UserID', 'IPAddress', 'Portal', 'Route', 'RequestMethod', 'RequestData', 'ErrorMessage', 'Traceback', 'Timestamp'),
+}
+
+_STOP = object()
+
+
+class TelemetrySink:
+    """Bounded queue plus one writer thread per worker process."""
+
+    def __init__(self, maxsize=TELEMETRY_QUEUE_SIZE, batch_size=TELEMETRY_BATCH_SIZE, flush_interval=TELEMETRY_FLUSH_INTERVAL):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._counters = {'enqueued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+        self._counter_lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            self._counters[name] += amount
+
+    def _ensure_started(self):
+        # Started lazily and per PID: a thread inherited across fork() is not running in the child.
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.maxsize)
+            self._thread = threading.Thread(target=self._run, name='telemetry-writer', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, table, row):
+        """Queues one row (a tuple in TELEMETRY_TABLES order). Never blocks."""
+        if not TELEMETRY_ASYNC:
+            self._write(table, [row])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((table, row))
+            self._count('enqueued')
+        except queue.Full:
+            self._count('dropped')
+
+    def _run(self):
+        pending = {}
+        pending_count = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(pending)
+                return
+            if item is not None:
+                table, row = item
+                pending.setdefault(table, []).append(row)
+                pending_count += 1
+
+            if pending_count >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(pending)
+                pending, pending_count = {}, 0
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, pending):
+        for table, rows in pending.items():
+            if rows:
+                self._write(table, rows)
+
+    def _write(self, table, rows):
+        columns = TELEMETRY_TABLES[table]
+        placeholders = ', '.join(['%s'] * len(columns))
+        # mysql.connector turns executemany() of a plain INSERT into one multi-row INSERT.
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        conn = None
+        try:
+            conn = get_db_connection()
+            if not conn:
+                raise RuntimeError("database connection failed")
+            cursor = conn.cursor()
+            cursor.executemany(sql, rows)
+            conn.commit()
+            cursor.close()
+            self._count('written', len(rows))
+            self._count('batches')
+        except Exception as e:
+            self._count('failed', len(rows))
+            self.logger.error(f"Failed to write {len(rows)} row(s) to {table}: {e}")
+        finally:
+            if conn: conn.close()
+
+    def shutdown(self, timeout=TELEMETRY_SHUTDOWN_TIMEOUT):
+        """Flushes whatever is queued and stops the writer thread."""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            self.logger.warning("Telemetry queue still full at shutdown; queued rows may be lost.")
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self._counters)
+        return dict(counters, pid=os.getpid(),
+                    queued=self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+                    maxsize=self.maxsize, async_enabled=TELEMETRY_ASYNC)
+
+
+_sink = TelemetrySink()
+atexit.register(_sink.shutdown)
+
+
+def _now():
+    return datetime.datetime.now()
+
+
+def record_login_attempt(user_id, email, ip_address, user_agent, status):
+    _sink.enqueue('LoginHistory', (user_id, email, ip_address, user_agent, status, _now()))
+
+
+def record_audit(user_id, ip_address, action, target_entity_type, target_entity_id, details):
+    _sink.enqueue('AuditLog', (user_id, ip_address, action, target_entity_type, target_entity_id, details, _now()))
+
+
+def record_error(user_id, ip_address, portal, route, request_method, request_data, error_message, traceback_text):
+    _sink.enqueue('ErrorLog', (user_id, ip_address, portal, route, request_method, request_data, error_message, traceback_text, _now()))
+
+
+def flush_telemetry(timeout=TELEMETRY_SHUTDOWN_TIMEOUT):
+    _sink.shutdown(timeout)
+
+
+def get_telemetry_stats():
+    return _sink.stats()
+
+
+def init_telemetry(app):
+    """Routes writer-thread errors to the application logger."""
+    _sink.logger = app.logger
@@ -0,0 +1,55 @@
+# utils/template_cache.py
+import os
+import time
+import click
+from jinja2 import FileSystemBytecodeCache
+
+# Templates are compiled lazily per worker, so after a deploy or worker recycle
+# the first hit on every page pays for parsing and compiling its template chain.
+# Compiled bytecode is kept in a FileSystemBytecodeCache shared by all workers
+# on the host (keyed by template name and source checksum, so edits invalidate
+# it), and `precompile_templates` loads every template into the environment
+# before the worker serves traffic.
+TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR')  # unset: Jinja's per-user directory under the system temp dir
+TEMPLATE_PRECOMPILE = os.getenv('TEMPLATE_PRECOMPILE', '1') == '1'
+
+
+def precompile_templates(app):
+    """
+    Compiles every template the app can load (app and blueprint folders) into
+    the environment's in-memory cache, reading and writing the bytecode cache.
+    Must run after all filters are registered, since Jinja resolves filter
+    names at compile time. Returns (compiled, failed).
+    """
+    env = app.jinja_env
+    started = time.perf_counter()
+    compiled, failed = 0, 0
+    for name in env.list_templates(filter_func=lambda name: name.endswith(('.html', '.txt', '.xml'))):
+        try:
+            env.get_template(name)
+            compiled += 1
+        except Exception as e:
+            failed += 1
+            app.logger.warning(f"Template precompilation failed for {name}: {e}")
+    app.logger.info(f"Precompiled {compiled} template(s) in {time.perf_counter() - started:.2f}s ({failed} failed).")
+    return compiled, failed
+
+
+def init_template_cache(app):
+    """Attaches the shared bytecode cache to the Jinja environment and registers `flask precompile-templates`."""
+    if TEMPLATE_CACHE_DIR:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    # The in-memory cache (400 templates by default) already holds every template, so only the bytecode cache is set.
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+
+    @app.cli.command('precompile-templates')
+    def precompile_templates_command():
+        """Compile all templates into the bytecode cache (e.g. as a deploy step)."""
+        compiled, failed = precompile_templates(app)
+        click.echo(f"Compiled {compiled} template(s), {failed} failed.")
+
+
+def warm_up_templates(app):
+    """Startup hook: precompiles all templates unless TEMPLATE_PRECOMPILE=0."""
+    if TEMPLATE_PRECOMPILE:
+        precompile_templates(app)
@@ -0,0 +1,240 @@
+# utils/upload_storage.py
+import hashlib
+import os
+import tempfile
+import click
+from flask import current_app
+from werkzeug.utils import secure_filename
+from db import get_db_connection
+from utils.media_worker import schedule_media_variants, MEDIA_VARIANTS, variant_paths
+
+# Uploads are stored once per distinct content. The request stream is copied to
+# a temp file while it is hashed, then moved to
+# uploads/blobs/<aa>/<bb>/<sha256>.<ext>; a second upload of the same bytes
+# reuses that file. UploadBlobs counts the database rows pointing at each blob:
+# save paths add a reference, deletes release one, and `flask gc-uploads`
+# removes blobs nobody references any more.
+BLOB_SUBFOLDER = 'blobs'
+UPLOAD_HASH_CHUNK_SIZE = 1024 * 1024
+UPLOAD_GC_GRACE_HOURS = int(os.getenv('UPLOAD_GC_GRACE_HOURS', 24))  # unreferenced blobs younger than this are kept
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS UploadBlobs (
+        RelativePath VARCHAR(255) NOT NULL PRIMARY KEY,
+        Sha256 CHAR(64) NOT NULL,
+        SizeBytes BIGINT NOT NULL,
+        Category VARCHAR(100) NULL,
+        RefCount INT NOT NULL DEFAULT 0,
+        CreatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        LastReferencedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_upload_blobs_gc (RefCount, LastReferencedAt)
+    )
+"""
+
+
+def ensure_upload_blobs_table(conn):
+    cursor = conn.cursor()
+    cursor.execute(_CREATE_TABLE_SQL)
+    conn.commit()
+    cursor.close()
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+
+def _stream_to_temp(file_storage, temp_dir):
+    """Copies the upload to a temp file in `temp_dir`, hashing as it goes. Returns (temp_path, sha256, size)."""
+    digest = hashlib.sha256()
+    size = 0
+    stream = file_storage.stream
+    if hasattr(stream, 'seek'):
+        stream.seek(0)
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(UPLOAD_HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp_file.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+    if hasattr(stream, 'seek'):
+        stream.seek(0)  # callers still read file size / mimetype from the FileStorage
+    return temp_path, digest.hexdigest(), size
+
+
+def _register_blob(cursor, relative_path, sha256, size, category):
+    """
+    Records the blob with no references yet; a fresh LastReferencedAt keeps
+    gc-uploads off it for the grace period. Existing rows are left alone: the
+    caller's own transaction may already hold a lock on them.
+    """
+    cursor.execute("SELECT 1 FROM UploadBlobs WHERE RelativePath = %s", (relative_path,))  # non-locking read
+    if cursor.fetchone():
+        return
+    cursor.execute("""
+        INSERT INTO UploadBlobs (RelativePath, Sha256, SizeBytes, Category, RefCount)
+        VALUES (%s, %s, %s, %s, 0)
+        ON DUPLICATE KEY UPDATE LastReferencedAt = NOW()
+    """, (relative_path, sha256, size, category))
+
+
+def _add_reference(cursor, relative_path):
+    """Returns False if the row is gone (gc-uploads removed it after it was registered)."""
+    cursor.execute("UPDATE UploadBlobs SET RefCount = RefCount + 1, LastReferencedAt = NOW() WHERE RelativePath = %s",
+                   (relative_path,))
+    return cursor.rowcount == 1
+
+
+def _with_connection(conn, work):
+    """Runs work(cursor) on the caller's connection (inside its transaction) or on a short-lived one that commits."""
+    if conn is not None:
+        cursor = conn.cursor()
+        try:
+            return work(cursor)
+        finally:
+            cursor.close()
+    own_conn = get_db_connection()
+    if not own_conn:
+        raise RuntimeError("Database connection failed while recording an upload reference.")
+    try:
+        cursor = own_conn.cursor()
+        result = work(cursor)
+        own_conn.commit()
+        cursor.close()
+        return result
+    finally:
+        own_conn.close()
+
+
+def store_upload(file_storage, category='general', allowed_extensions=None, conn=None):
+    """
+    Stores an upload content-addressed and returns its path relative to the
+    static folder (e.g. 'uploads/blobs/3f/a2/3fa2....pdf'), or None on failure.
+    The reference is recorded on `conn` when given, so it rolls back with the
+    caller's transaction; the blob row itself is committed first, so a rolled
+    back upload is left unreferenced and `flask gc-uploads` removes it.
+    Raises ValueError for a disallowed extension.
+    """
+    upload_folder_base = current_app.config.get('UPLOAD_FOLDER')
+    if not upload_folder_base:
+        current_app.logger.error("UPLOAD_FOLDER is not configured.")
+        return None
+    if not file_storage or not file_storage.filename:
+        current_app.logger.warning("No file or filename in the provided FileStorage object.")
+        return None
+
+    extension = _extension(secure_filename(file_storage.filename))
+    if allowed_extensions and extension not in allowed_extensions:
+        current_app.logger.error(f"File upload rejected: Extension '{extension}' is not in the allowed set {allowed_extensions}.")
+        raise ValueError(f"File type not allowed: {extension}")
+
+    blob_root = os.path.join(upload_folder_base, BLOB_SUBFOLDER)
+    temp_dir = os.path.join(blob_root, 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+
+    temp_path = None
+    try:
+        temp_path, sha256, size = _stream_to_temp(file_storage, temp_dir)
+        blob_name = f"{sha256}.{extension}" if extension else sha256
+        blob_dir = os.path.join(blob_root, sha256[:2], sha256[2:4])
+        blob_path = os.path.join(blob_dir, blob_name)
+        relative_path = '/'.join(['uploads', BLOB_SUBFOLDER, sha256[:2], sha256[2:4], blob_name])
+
+        # The blob row is committed on its own connection before the file is placed,
+        # and only the reference joins the caller's transaction. If gc-uploads removed
+        # an old unreferenced copy in between, the row and file are put back.
+        deduplicated = True
+        for _ in range(2):
+            _with_connection(None, lambda cursor: _register_blob(cursor, relative_path, sha256, size, category.split('/')[0]))
+            if not os.path.exists(blob_path):
+                os.makedirs(blob_dir, exist_ok=True)
+                try:
+                    os.link(temp_path, blob_path)  # atomic, and the temp copy stays for a retry
+                    deduplicated = False
+                except FileExistsError:
+                    pass  # a concurrent upload of the same bytes placed it first
+            if _with_connection(conn, lambda cursor: _add_reference(cursor, relative_path)):
+                break
+        else:
+            raise RuntimeError(f"Upload blob {relative_path} was collected while being stored.")
+        current_app.logger.info(f"Upload stored: {relative_path} ({size} bytes, {'deduplicated' if deduplicated else 'new blob'})")
+        schedule_media_variants(relative_path)
+        return relative_path
+    except Exception as e:
+        current_app.logger.error(f"Could not store upload {file_storage.filename}: {e}", exc_info=True)
+        return None
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def release_upload(relative_path, conn=None):
+    """
+    Drops one reference to a stored upload (call when the row pointing at it is
+    deleted). Paths written before content addressing are ignored. The file
+    itself is removed later by `flask gc-uploads`.
+    """
+    if not relative_path or not relative_path.startswith(f'uploads/{BLOB_SUBFOLDER}/'):
+        return
+    _with_connection(conn, lambda cursor: cursor.execute(
+        "UPDATE UploadBlobs SET RefCount = GREATEST(RefCount - 1, 0), LastReferencedAt = NOW() WHERE RelativePath = %s",
+        (relative_path,)))
+
+
+def collect_unreferenced_uploads():
+    """Deletes blobs with no references older than UPLOAD_GC_GRACE_HOURS. Returns (files_removed, bytes_freed)."""
+    static_folder = current_app.static_folder
+    conn = get_db_connection()
+    removed, freed = 0, 0
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT RelativePath, SizeBytes FROM UploadBlobs
+            WHERE RefCount = 0 AND LastReferencedAt < NOW() - INTERVAL %s HOUR
+        """, (UPLOAD_GC_GRACE_HOURS,))
+        for blob in cursor.fetchall():
+            # Re-check under the row lock so a concurrent re-upload keeps its blob.
+            cursor.execute("""
+                DELETE FROM UploadBlobs
+                WHERE RelativePath = %s AND RefCount = 0 AND LastReferencedAt < NOW() - INTERVAL %s HOUR
+            """, (blob['RelativePath'], UPLOAD_GC_GRACE_HOURS))
+            if cursor.rowcount != 1:
+                conn.rollback()
+                continue
+            doomed = [blob['RelativePath']] + [path for variant in MEDIA_VARIANTS for path in variant_paths(blob['RelativePath'], variant)]
+            for relative_path in doomed:
+                path_on_disk = os.path.join(static_folder, *relative_path.split('/'))
+                if os.path.exists(path_on_disk):
+                    os.unlink(path_on_disk)
+            conn.commit()
+            removed += 1
+            freed += blob['SizeBytes']
+        cursor.close()
+    finally:
+        conn.close()
+    return removed, freed
+
+
+def init_upload_storage(app):
+    """Creates the UploadBlobs table and registers `flask gc-uploads`."""
+    with app.app_context():
+        conn = get_db_connection()
+        if conn:
+            try:
+                ensure_upload_blobs_table(conn)
+            except Exception as e:
+                app.logger.error(f"Could not create the upload blobs table: {e}", exc_info=True)
+            finally:
+                conn.close()
+
+    @app.cli.command('gc-uploads')
+    def gc_uploads_command():
+        """Delete stored uploads that no database row references any more."""
+        removed, freed = collect_unreferenced_uploads()
+        click.echo(f"Removed {removed} unreferenced upload(s), freed {freed / (1024 * 1024):.1f} MB.")